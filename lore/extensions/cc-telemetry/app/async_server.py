@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+asyncio server for the cc-telemetry dashboard (`dashboard.py --async`).
+
+One event loop owns every connection, so idle keep-alive clients and
+/api/stream subscribers cost a coroutine rather than a thread. Queries run
+on a fixed-size thread pool, each worker checking a read-only connection
+out of the ReadPool, which bounds concurrent DB work however many clients
+are connected. Streamed listings (see dashboard.Rows) go out with chunked
+transfer encoding a chunk at a time, waiting for the socket to drain before
+the next one is read, so memory per request stays flat whatever the limit.
+
+Serves the same routes, ETags and gzip as the threaded server. GET only,
+HTTP/1.1 keep-alive; stdlib only.
+"""
+
+import gzip
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlparse, parse_qs
+
+import dashboard  # also puts daemon/ on sys.path
+import db
+from dashboard import ChangeFeed
+
+logger = logging.getLogger("cc_telemetry.dashboard")
+
+# Query threads, and the pooled connections they use
+ASYNC_WORKERS = 4
+
+# Request head size limit, and how long an idle keep-alive connection is kept
+MAX_HEAD_BYTES = 64 * 1024
+KEEPALIVE_TIMEOUT = 30.0
+
+_END = object()
+
+
+class BadRequest(Exception):
+    pass
+
+
+class AsyncDashboard:
+    def __init__(self, pool: db.ReadPool, workers: int = ASYNC_WORKERS):
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="cc-dashboard")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def serve(self, host: str, port: int, ready=None) -> None:
+        """Serve until cancelled; `ready` is called with the bound port."""
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        if ready:
+            ready(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Connections ---
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, b"", close=True)
+                    break
+                try:
+                    method, target, version, headers = self._parse(head)
+                except BadRequest:
+                    await self._respond(writer, 400, b"", close=True)
+                    break
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              if version == "HTTP/1.1"
+                              else headers.get("connection", "").lower() == "keep-alive")
+                if method != "GET":
+                    await self._respond(writer, 405, b"", {"Allow": "GET"}, close=not keep_alive)
+                elif not await self._dispatch(writer, target, headers, keep_alive):
+                    break
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass  # client went away
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse(head: bytes):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise BadRequest(lines[0])
+        if not version.startswith("HTTP/1."):
+            raise BadRequest(version)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, sep, value = line.partition(":")
+                if not sep:
+                    raise BadRequest(line)
+                headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def _dispatch(self, writer, target, headers, keep_alive) -> bool:
+        """Answer one request. False when the connection can't be reused."""
+        parsed = urlparse(target)
+        path = parsed.path.rstrip("/") or "/"
+        qs = parse_qs(parsed.query)
+        close = not keep_alive
+
+        if path == "/":
+            return await self._serve_index(writer, headers, close)
+        if path == "/api/stream":
+            await self._api_stream(writer, qs)
+            return False
+        fn = dashboard.api_route(path)
+        if fn is None:
+            await self._respond(writer, 404, b"", close=close)
+            return keep_alive
+
+        etag = dashboard.api_etag(await self._run(self.pool.data_version), target)
+        if dashboard.etag_matches(headers.get("if-none-match", ""), etag):
+            await self._respond(writer, 304, None, {"ETag": etag, "Cache-Control": "no-cache"},
+                                close=close)
+            return keep_alive
+        gzip_ok = dashboard.accepts_gzip(headers.get("accept-encoding", ""))
+        response = dashboard.run_api(self.pool, fn, qs)
+        try:
+            status, content_type, extra, body = await self._run(self._start, response, gzip_ok)
+            extra = {"Content-Type": content_type, "Vary": "Accept-Encoding", **extra}
+            if status == 200:
+                extra.update({"ETag": etag, "Cache-Control": "no-cache"})
+            if body is None:
+                return await self._respond_chunked(writer, status, response, extra, gzip_ok, close)
+            await self._respond(writer, status, body, extra, close=close)
+            return keep_alive
+        finally:
+            await self._run(response.close)
+
+    @staticmethod
+    def _start(response, gzip_ok: bool):
+        """First step of run_api's `response`, on a worker: (status,
+        content_type, headers, body), body None when it streams. A
+        buffered response is finished here, so its pooled connection is
+        back before the (slow, client-paced) write begins and a warm
+        connection serves the next request."""
+        status, content_type, headers, streamed = next(response)
+        if streamed:
+            return status, content_type, headers, None
+        body = next(response)
+        response.close()
+        if gzip_ok and len(body) >= dashboard.GZIP_MIN_BYTES:
+            body = gzip.compress(body, dashboard.GZIP_LEVEL, mtime=0)
+            headers = {**headers, "Content-Encoding": "gzip"}
+        return status, content_type, headers, body
+
+    # --- Responses ---
+
+    @staticmethod
+    def _head(status: int, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _respond(self, writer, status, body, headers=None, close=False) -> None:
+        """A complete response; `body` None sends no Content-Length (304)."""
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Length"] = len(body)
+        if close:
+            headers["Connection"] = "close"
+        writer.write(self._head(status, headers) + (body or b""))
+        await writer.drain()
+
+    async def _respond_chunked(self, writer, status, response, headers, gzip_ok, close) -> bool:
+        """Send the rest of run_api's `response` with chunked encoding, one
+        piece per chunk, pulling the next piece only once the last one has
+        been handed to the socket."""
+        pieces = dashboard.gzip_stream(response) if gzip_ok else response
+        if gzip_ok:
+            headers["Content-Encoding"] = "gzip"
+        headers["Transfer-Encoding"] = "chunked"
+        if close:
+            headers["Connection"] = "close"
+        writer.write(self._head(status, headers))
+        try:
+            while True:
+                piece = await self._run(next, pieces, _END)
+                if piece is _END:
+                    break
+                if piece:
+                    writer.write(b"%x\r\n%b\r\n" % (len(piece), piece))
+                    await writer.drain()
+        except Exception as e:
+            # No terminating chunk, so the client sees a truncated body
+            if not isinstance(e, ConnectionError):
+                logger.warning("Streamed response failed: %s", e)
+            return False
+        finally:
+            if pieces is not response:
+                await self._run(pieces.close)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return not close
+
+    async def _serve_index(self, writer, headers, close) -> bool:
+        extra = {"ETag": dashboard.INDEX_ETAG, "Cache-Control": "no-cache"}
+        if dashboard.etag_matches(headers.get("if-none-match", ""), dashboard.INDEX_ETAG):
+            await self._respond(writer, 304, None, extra, close=close)
+            return not close
+        body = dashboard.INDEX_BYTES
+        if dashboard.accepts_gzip(headers.get("accept-encoding", "")):
+            body = dashboard.INDEX_GZIP
+            extra["Content-Encoding"] = "gzip"
+        await self._respond(writer, 200, body, {
+            "Content-Type": "text/html; charset=utf-8", "Vary": "Accept-Encoding", **extra,
+        }, close=close)
+        return not close
+
+    async def _api_stream(self, writer, qs) -> None:
+        """Server-sent events, as DashboardHandler._api_stream. The connection
+        is closed when the client goes away or the server stops."""
+        session_id = qs.get("session_id", [None])[0]
+
+        def start():
+            with self.pool.connection() as conn:
+                return ChangeFeed(conn, session_id)
+
+        def poll(feed):
+            with self.pool.connection() as conn:
+                return feed.poll(conn)
+
+        def event(name, data=None):
+            writer.write(f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+
+        feed = await self._run(start)
+        writer.write(self._head(200, {"Content-Type": "text/event-stream",
+                                      "Cache-Control": "no-cache", "Connection": "close"}))
+        event("hello", {"poll_interval": dashboard.STREAM_POLL_INTERVAL})
+        await writer.drain()
+        version = await self._run(self.pool.data_version)
+        last_sent = time.monotonic()
+        while not writer.is_closing():
+            await asyncio.sleep(dashboard.STREAM_POLL_INTERVAL)
+            current = await self._run(self.pool.data_version)
+            if current != version:
+                version = current
+                for name, rows in await self._run(poll, feed):
+                    event(name, rows)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= dashboard.STREAM_KEEPALIVE:
+                writer.write(b": keep-alive\n\n")
+                last_sent = time.monotonic()
+            else:
+                continue
+            await writer.drain()
+
+
+def serve(pool: db.ReadPool, host: str, port: int, workers: int = ASYNC_WORKERS, ready=None) -> None:
+    """Run the asyncio server until interrupted."""
+    asyncio.run(AsyncDashboard(pool, workers).serve(host, port, ready))
@@ -3,18 +3,38 @@
 cc-telemetry Web Dashboard — self-contained HTTP server with embedded UI.
 
 Usage:
-    python3 dashboard.py [--port 7900] [--no-open]
+    python3 dashboard.py [--port 7900] [--no-open] [--async [--workers N]]
 
 Serves a dark-themed dashboard for browsing telemetry data (sessions,
 tool calls, errors, token usage, hook events) stored in the SQLite DB.
+
+/api/tools, /api/errors and /api/hook-events take since/until (epoch ms)
+and cursor; a full page carries an X-Next-Cursor header to pass as cursor
+for the next one. With format=ndjson, or a limit above STREAM_MIN_ROWS,
+they stream the rows as they are read instead (NDJSON or a JSON array), so
+an export of any size holds only a chunk in memory.
+/api/stream is a server-sent event stream of new tool calls, errors and
+session changes that the page applies in place (5s polling is the fallback).
+API responses carry an ETag that changes with the DB (If-None-Match gets a
+304 until something is committed), and large bodies are gzipped when the
+client accepts it.
+
+--async serves the same API from an asyncio event loop (app/async_server.py):
+queries run on a bounded thread pool and streams use chunked encoding.
 """
 
 import sys
 import os
 import json
+import gzip
+import time
+import zlib
+import hashlib
 import webbrowser
 import argparse
 import sqlite3
+from collections import OrderedDict
+from functools import partial
 from pathlib import Path
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
@@ -26,6 +46,14 @@ sys.path.insert(0, str(DAEMON_DIR))
 
 import db
 
+# Responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+# Part of every API ETag, so a restart (data_version starts over) never
+# matches a tag a browser kept from before it
+BOOT_ID = f"{os.getpid():x}.{int(time.time()):x}"
+
 
 # ---------------------------------------------------------------------------
 # Threaded HTTP server
@@ -35,181 +63,449 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
 
+# ---------------------------------------------------------------------------
+# Change feed (/api/stream)
+# ---------------------------------------------------------------------------
+#
+# Each stream client gets a ChangeFeed holding id high-water marks. Whenever
+# the pool's data_version moves, poll() reads what was committed past them
+# (new tool calls and errors, tool calls that completed since they were
+# sent, sessions that were touched) and the handler pushes it as
+# server-sent events. Between commits a stream costs one PRAGMA per tick.
+
+# Seconds between data_version checks, and between keep-alive comments
+STREAM_POLL_INTERVAL = 0.5
+STREAM_KEEPALIVE = 15.0
+
+# Rows per table per push; a bigger burst (e.g. a backfill) sends "reset"
+# and the page reloads instead
+STREAM_MAX_ROWS = 500
+
+# Incomplete tool calls a stream watches for their result
+STREAM_MAX_OPEN = 1000
+
+_STREAM_TOOL_COLUMNS = """tc.id, tc.session_id, tc.tool_use_id, tc.tool_name, tc.result_preview,
+    tc.result_is_error, tc.started_at, tc.started_at_ms, tc.completed_at, tc.duration_ms"""
+
+
+class ChangeFeed:
+    def __init__(self, conn: sqlite3.Connection, session_id=None):
+        self.session_id = session_id
+        self.open_ids: OrderedDict[int, None] = OrderedDict()
+        self.reset(conn)
+
+    def reset(self, conn: sqlite3.Connection) -> None:
+        """Start from what is in the DB now."""
+        self.tool_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM tool_calls").fetchone()[0]
+        self.error_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM errors").fetchone()[0]
+        self.session_ms = conn.execute(
+            "SELECT COALESCE(MAX(last_seen_at_ms), 0) FROM sessions").fetchone()[0]
+        self.open_ids.clear()
+
+    def _session_filter(self, alias):
+        if self.session_id:
+            return f"AND {alias}.session_id = ?", [self.session_id]
+        return "", []
+
+    def poll(self, conn: sqlite3.Connection) -> list[tuple[str, object]]:
+        """[(event, rows)] for everything committed since the last poll."""
+        where, params = self._session_filter("tc")
+        tools = conn.execute(f"""
+            SELECT {_STREAM_TOOL_COLUMNS} FROM tool_calls tc
+            WHERE tc.id > ? {where} ORDER BY tc.id LIMIT ?
+        """, [self.tool_id, *params, STREAM_MAX_ROWS + 1]).fetchall()
+        where, params = self._session_filter("e")
+        errors = conn.execute(f"""
+            SELECT e.id, e.session_id, e.tool_use_id, e.error_message, e.stack_trace,
+                   e.thinking_before, e.thinking_before_hash, e.ts, e.ts_ms, s.slug, tc.tool_name
+            FROM errors e
+            LEFT JOIN sessions s ON s.session_id = e.session_id
+            LEFT JOIN tool_calls tc ON tc.tool_use_id = e.tool_use_id
+            WHERE e.id > ? {where} ORDER BY e.id LIMIT ?
+        """, [self.error_id, *params, STREAM_MAX_ROWS + 1]).fetchall()
+        if len(tools) > STREAM_MAX_ROWS or len(errors) > STREAM_MAX_ROWS:
+            self.reset(conn)
+            return [("reset", None)]
+
+        completed = []
+        if self.open_ids:
+            marks = ",".join("?" * len(self.open_ids))
+            completed = conn.execute(f"""
+                SELECT {_STREAM_TOOL_COLUMNS} FROM tool_calls tc
+                WHERE tc.id IN ({marks}) AND tc.completed_at_ms IS NOT NULL
+            """, list(self.open_ids)).fetchall()
+            for r in completed:
+                self.open_ids.pop(r["id"], None)
+        for r in tools:
+            self.tool_id = r["id"]
+            if r["completed_at"] is None:
+                self.open_ids[r["id"]] = None
+        while len(self.open_ids) > STREAM_MAX_OPEN:
+            self.open_ids.popitem(last=False)
+        if errors:
+            self.error_id = errors[-1]["id"]
+
+        # Sessions whose row (last seen) or rollup (counts) changed
+        touched = {r["session_id"] for r in (*tools, *completed, *errors)}
+        touched.update(r[0] for r in conn.execute(
+            "SELECT session_id FROM sessions WHERE last_seen_at_ms > ?", (self.session_ms,)))
+        sessions = []
+        if touched:
+            sessions = db.query_sessions(conn, limit=len(touched), session_ids=sorted(touched))
+            self.session_ms = max([self.session_ms] + [
+                r["last_seen_at_ms"] or 0 for r in sessions])
+
+        events = [("tool_calls", [dict(r) for r in (*completed, *tools)]),
+                  ("errors", db.with_text(conn, "errors", errors)),
+                  ("sessions", sessions)]
+        return [(name, rows) for name, rows in events if rows] + [("change", None)]
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+#
+# Endpoints are plain functions of (conn, qs) shared by both servers. They
+# return JSON-able data, a Reply (for another status or extra headers), or
+# Rows, whose chunks are encoded and sent as they are read so a large
+# listing never sits in memory whole. run_api() drives one on a pooled
+# connection.
+
+# Listings longer than this (or asked for with format=ndjson) are streamed
+STREAM_MIN_ROWS = 1000
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Reply:
+    def __init__(self, data, status=200, headers=None):
+        self.data = data
+        self.status = status
+        self.headers = headers or {}
+
+
+class Rows:
+    """A streamed listing: an iterator of row lists, sent as one JSON array
+    or as NDJSON (a row per line)."""
+
+    def __init__(self, chunks, ndjson=False):
+        self.chunks = chunks
+        self.ndjson = ndjson
+
+    @property
+    def content_type(self) -> str:
+        return "application/x-ndjson" if self.ndjson else "application/json"
+
+    def encode(self):
+        """The body in pieces, one per chunk of rows."""
+        dumps = lambda r: json.dumps(r, default=str)
+        if self.ndjson:
+            for rows in self.chunks:
+                if rows:
+                    yield "".join(dumps(r) + "\n" for r in rows).encode()
+            return
+        sep = "["
+        for rows in self.chunks:
+            if rows:
+                yield (sep + ",".join(map(dumps, rows))).encode()
+                sep = ","
+        yield b"[]" if sep == "[" else b"]"
+
+
+def _param(qs, key, default=None):
+    return qs.get(key, [default])[0]
+
+
+def _int_param(qs, key, default):
+    try:
+        return int(qs.get(key, [default])[0])
+    except (TypeError, ValueError):
+        return default
+
+
+def _window(qs):
+    """since / until (epoch ms) and cursor query params for db.query_*."""
+    return {
+        "since": _int_param(qs, "since", None),
+        "until": _int_param(qs, "until", None),
+        "cursor": _param(qs, "cursor"),
+    }
+
+
+def _listing(qs, query, default_limit, ts_column="ts_ms"):
+    """A page of `query` (a db.query_* with its filters bound) with
+    X-Next-Cursor continuing after the last row, or Rows for format=ndjson
+    or a limit above STREAM_MIN_ROWS (or negative, i.e. none). Streamed
+    listings carry no header; the cursor of a row is
+    db.encode_cursor(row[ts_column], row["id"])."""
+    limit = _int_param(qs, "limit", default_limit)
+    ndjson = _param(qs, "format") == "ndjson"
+    if ndjson or limit > STREAM_MIN_ROWS or limit < 0:
+        return Rows(query(limit=limit, stream=True, **_window(qs)), ndjson)
+    rows = query(limit=limit, **_window(qs))
+    cursor = db.next_cursor(rows, limit, ts_column)
+    return Reply(rows, headers={"X-Next-Cursor": cursor} if cursor else None)
+
+
+def api_overview(conn, qs):
+    return db.query_overview(conn)
+
+
+def api_sessions(conn, qs):
+    return db.query_sessions(conn, limit=_int_param(qs, "limit", 50))
+
+
+def api_session_detail(conn, qs, session_id):
+    session = db.query_session_detail(conn, session_id)
+    if not session:
+        raise ApiError(404, "session not found")
+    return session
+
+
+def api_tools(conn, qs):
+    query = partial(db.query_tool_calls, conn, session_id=_param(qs, "session_id"))
+    return _listing(qs, query, 100, "started_at_ms")
+
+
+def api_errors(conn, qs):
+    query = partial(db.query_errors, conn, session_id=_param(qs, "session_id"))
+    return _listing(qs, query, 50)
+
+
+def api_token_usage(conn, qs):
+    rows = db.query_api_metadata(conn, session_id=_param(qs, "session_id"), limit=500,
+                                 since=_int_param(qs, "since", None),
+                                 until=_int_param(qs, "until", None))
+    totals = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
+    for r in rows:
+        for k in totals:
+            totals[k] += r.get(k) or 0
+    return {"totals": totals, "records": rows}
+
+
+def api_tool_breakdown(conn, qs):
+    return db.query_tool_breakdown(conn, session_id=_param(qs, "session_id"))
+
+
+def api_hook_events(conn, qs):
+    query = partial(db.query_hook_events, conn, session_id=_param(qs, "session_id"))
+    return _listing(qs, query, 100)
+
+
+API_ROUTES = {
+    "/api/overview": api_overview,
+    "/api/sessions": api_sessions,
+    "/api/tools": api_tools,
+    "/api/errors": api_errors,
+    "/api/token-usage": api_token_usage,
+    "/api/tool-breakdown": api_tool_breakdown,
+    "/api/hook-events": api_hook_events,
+}
+
+
+def api_route(path: str):
+    """The endpoint function for `path` (trailing slash stripped), or None."""
+    if path.startswith("/api/session/"):
+        return partial(api_session_detail, session_id=path[len("/api/session/"):])
+    return API_ROUTES.get(path)
+
+
+def api_etag(data_version: int, target: str) -> str:
+    # Every API response is a function of the DB contents and the URL, so
+    # it stays valid until the next commit: a refresh that finds nothing
+    # new is answered with a bodiless 304 before any query runs
+    return f'W/"{BOOT_ID}.{data_version:x}.{zlib.crc32(target.encode()):08x}"'
+
+
+def run_api(pool, fn, qs):
+    """
+    Run endpoint `fn` on a connection from `pool`. A generator: the first
+    item is (status, content_type, headers, streamed), then the body
+    follows as bytes, in a single piece unless streamed. The connection is
+    held until the generator is exhausted or closed.
+    """
+    with pool.connection() as conn:
+        try:
+            result = fn(conn, qs)
+        except ApiError as e:
+            result = Reply({"error": str(e)}, e.status)
+        except ValueError as e:
+            result = Reply({"error": str(e)}, 400)
+        except Exception as e:
+            result = Reply({"error": str(e)}, 500)
+        if isinstance(result, Rows):
+            yield 200, result.content_type, {}, True
+            # Headers are out: an error from here on propagates, and the
+            # server drops the connection rather than end the body cleanly
+            yield from result.encode()
+            return
+        if not isinstance(result, Reply):
+            result = Reply(result)
+        yield result.status, "application/json", result.headers, False
+        yield json.dumps(result.data, default=str).encode()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() == "gzip":
+            q = params.strip().removeprefix("q=")
+            try:
+                return not q or float(q) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = {t.strip() for t in if_none_match.split(",")}
+    return etag in tags or "*" in tags
+
+
+def gzip_stream(pieces):
+    """Gzip an iterator of byte pieces incrementally."""
+    z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for piece in pieces:
+        out = z.compress(piece)
+        if out:
+            yield out
+    yield z.flush()
+
+
 # ---------------------------------------------------------------------------
 # Request handler
 # ---------------------------------------------------------------------------
 
 class DashboardHandler(BaseHTTPRequestHandler):
-    conn: sqlite3.Connection = None  # set at startup
+    # Every request runs on its own thread (ThreadingMixIn) and checks a
+    # read-only connection out of the pool for its duration, so concurrent
+    # requests never share one.
+    pool: db.ReadPool = None  # set at startup
 
     def log_message(self, format, *args):
         pass  # silence request logs
 
-    def _json(self, data, status=200):
-        body = json.dumps(data, default=str).encode()
+    def _not_modified(self, etag) -> bool:
+        """True (and a 304 sent) when the client already has `etag`."""
+        if not etag_matches(self.headers.get("If-None-Match", ""), etag):
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return True
+
+    def _send(self, status, content_type, body, headers=None, gzipped=None):
+        """Send `body`, gzipped if large and accepted (`gzipped` is a
+        precompressed copy to use instead of compressing it here)."""
+        headers = dict(headers or {})
+        if (accepts_gzip(self.headers.get("Accept-Encoding", ""))
+                and (gzipped is not None or len(body) >= GZIP_MIN_BYTES)):
+            body = gzipped if gzipped is not None else gzip.compress(body, GZIP_LEVEL, mtime=0)
+            headers["Content-Encoding"] = "gzip"
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", len(body))
+        self.send_header("Vary", "Accept-Encoding")
+        for k, v in headers.items():
+            self.send_header(k, v)
         self.end_headers()
         self.wfile.write(body)
 
-    def _html(self, html):
-        body = html.encode()
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.send_header("Content-Length", len(body))
+    def _send_stream(self, status, content_type, pieces, headers=None):
+        """Send a body of unknown length piece by piece. The server speaks
+        HTTP/1.0, so it ends where the connection is closed."""
+        headers = dict(headers or {})
+        if accepts_gzip(self.headers.get("Accept-Encoding", "")):
+            pieces = gzip_stream(pieces)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Vary", "Accept-Encoding")
+        for k, v in headers.items():
+            self.send_header(k, v)
         self.end_headers()
-        self.wfile.write(body)
-
-    def _param(self, qs, key, default=None):
-        return qs.get(key, [default])[0]
-
-    def _int_param(self, qs, key, default):
-        try:
-            return int(qs.get(key, [default])[0])
-        except (TypeError, ValueError):
-            return default
+        for piece in pieces:
+            self.wfile.write(piece)
+        self.close_connection = True
 
     def do_GET(self):
         parsed = urlparse(self.path)
         path = parsed.path.rstrip("/") or "/"
         qs = parse_qs(parsed.query)
 
-        routes = {
-            "/": self._serve_index,
-            "/api/overview": self._api_overview,
-            "/api/sessions": self._api_sessions,
-            "/api/tools": self._api_tools,
-            "/api/errors": self._api_errors,
-            "/api/token-usage": self._api_token_usage,
-            "/api/tool-breakdown": self._api_tool_breakdown,
-            "/api/hook-events": self._api_hook_events,
-        }
-
-        # Check for /api/session/<id> pattern
-        if path.startswith("/api/session/"):
-            session_id = path[len("/api/session/"):]
-            return self._api_session_detail(session_id)
-
-        handler = routes.get(path)
-        if handler:
-            try:
-                if handler == self._serve_index:
-                    handler()
-                else:
-                    handler(qs)
-            except Exception as e:
-                self._json({"error": str(e)}, 500)
-        else:
-            self.send_error(404)
-
-    # --- API endpoints ---
-
-    def _api_overview(self, qs):
-        conn = self.conn
-        session_count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
-        tool_count = conn.execute("SELECT COUNT(*) FROM tool_calls").fetchone()[0]
-        error_count = conn.execute("SELECT COUNT(*) FROM tool_calls WHERE result_is_error=1").fetchone()[0]
-        avg_dur = conn.execute("SELECT AVG(duration_ms) FROM tool_calls WHERE duration_ms IS NOT NULL").fetchone()[0]
-        error_rate = (error_count / tool_count * 100) if tool_count > 0 else 0
-        self._json({
-            "sessions": session_count,
-            "tool_calls": tool_count,
-            "error_count": error_count,
-            "error_rate": round(error_rate, 1),
-            "avg_duration_ms": round(avg_dur, 1) if avg_dur else 0,
-        })
-
-    def _api_sessions(self, qs):
-        limit = self._int_param(qs, "limit", 50)
-        rows = db.query_sessions(self.conn, limit=limit)
-        self._json(rows)
-
-    def _api_session_detail(self, session_id):
-        conn = self.conn
-        row = conn.execute(
-            "SELECT * FROM sessions WHERE session_id=?", (session_id,)
-        ).fetchone()
-        if not row:
-            return self._json({"error": "session not found"}, 404)
-        session = dict(row)
-        tokens = conn.execute("""
-            SELECT COALESCE(SUM(input_tokens),0) as input_tokens,
-                   COALESCE(SUM(output_tokens),0) as output_tokens,
-                   COALESCE(SUM(cache_read_tokens),0) as cache_read_tokens,
-                   COALESCE(SUM(cache_write_tokens),0) as cache_write_tokens
-            FROM api_metadata WHERE session_id=?
-        """, (session_id,)).fetchone()
-        session["tokens"] = dict(tokens)
-        tool_count = conn.execute(
-            "SELECT COUNT(*) FROM tool_calls WHERE session_id=?", (session_id,)
-        ).fetchone()[0]
-        error_count = conn.execute(
-            "SELECT COUNT(*) FROM tool_calls WHERE session_id=? AND result_is_error=1", (session_id,)
-        ).fetchone()[0]
-        session["tool_call_count"] = tool_count
-        session["error_count"] = error_count
-        self._json(session)
-
-    def _api_tools(self, qs):
-        session_id = self._param(qs, "session_id")
-        limit = self._int_param(qs, "limit", 100)
-        rows = db.query_tool_calls(self.conn, session_id=session_id, limit=limit)
-        self._json(rows)
-
-    def _api_errors(self, qs):
-        session_id = self._param(qs, "session_id")
-        limit = self._int_param(qs, "limit", 50)
-        rows = db.query_errors(self.conn, session_id=session_id, limit=limit)
-        self._json(rows)
-
-    def _api_token_usage(self, qs):
-        session_id = self._param(qs, "session_id")
-        rows = db.query_api_metadata(self.conn, session_id=session_id, limit=500)
-        totals = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
-        for r in rows:
-            for k in totals:
-                totals[k] += r.get(k) or 0
-        self._json({"totals": totals, "records": rows})
-
-    def _api_tool_breakdown(self, qs):
-        session_id = self._param(qs, "session_id")
-        clauses, params = [], []
-        if session_id:
-            clauses.append("session_id = ?")
-            params.append(session_id)
-        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
-        rows = self.conn.execute(f"""
-            SELECT tool_name,
-                   COUNT(*) as count,
-                   COALESCE(AVG(duration_ms), 0) as avg_ms,
-                   SUM(result_is_error) as errors
-            FROM tool_calls {where}
-            GROUP BY tool_name
-            ORDER BY count DESC
-            LIMIT 30
-        """, params).fetchall()
-        self._json([dict(r) for r in rows])
-
-    def _api_hook_events(self, qs):
-        session_id = self._param(qs, "session_id")
-        limit = self._int_param(qs, "limit", 100)
-        clauses, params = [], []
-        if session_id:
-            clauses.append("session_id = ?")
-            params.append(session_id)
-        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
-        params.append(limit)
-        rows = self.conn.execute(f"""
-            SELECT * FROM hook_events {where}
-            ORDER BY ts DESC LIMIT ?
-        """, params).fetchall()
-        self._json([dict(r) for r in rows])
-
-    # --- Embedded HTML ---
+        if path == "/":
+            return self._serve_index()
+        if path == "/api/stream":
+            return self._api_stream(qs)
+        fn = api_route(path)
+        if fn is None:
+            return self.send_error(404)
+
+        etag = api_etag(self.pool.data_version(), self.path)
+        if self._not_modified(etag):
+            return
+        response = run_api(self.pool, fn, qs)
+        try:
+            status, content_type, headers, streamed = next(response)
+            if status == 200:
+                headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+            if streamed:
+                self._send_stream(status, content_type, response, headers)
+            else:
+                self._send(status, content_type, next(response), headers)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-body
+        finally:
+            response.close()
+
+    # --- Change feed ---
+
+    def _event(self, name, data=None):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+        self.wfile.flush()
+
+    def _api_stream(self, qs):
+        """Server-sent events: "hello" once, then tool_calls / errors /
+        sessions deltas and a "change" after every commit. Runs until the
+        client disconnects; a pooled connection is held only while polling."""
+        session_id = _param(qs, "session_id")
+        with self.pool.connection() as conn:
+            feed = ChangeFeed(conn, session_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            self._event("hello", {"poll_interval": STREAM_POLL_INTERVAL})
+            version = self.pool.data_version()
+            last_sent = time.monotonic()
+            while True:
+                time.sleep(STREAM_POLL_INTERVAL)
+                current = self.pool.data_version()
+                if current != version:
+                    version = current
+                    with self.pool.connection() as conn:
+                        events = feed.poll(conn)
+                    for name, rows in events:
+                        self._event(name, rows)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
 
     def _serve_index(self):
-        self._html(INDEX_HTML)
+        if self._not_modified(INDEX_ETAG):
+            return
+        self._send(200, "text/html; charset=utf-8", INDEX_BYTES,
+                   {"ETag": INDEX_ETAG, "Cache-Control": "no-cache"}, gzipped=INDEX_GZIP)
 
 
 # ---------------------------------------------------------------------------
@@ -509,6 +805,7 @@ tr.clickable { cursor: pointer; }
 let activeTab = 'overview';
 let activeSession = null;
 let refreshTimer = null;
+const etags = {};  // url -> ETag of the response last rendered from it
 
 // --- Tab switching ---
 document.querySelectorAll('.tab').forEach(tab => {
@@ -527,13 +824,17 @@ function setSessionFilter(id, label) {
   activeSession = id;
   document.getElementById('sessionFilterLabel').textContent = label;
   document.getElementById('sessionFilter').classList.add('active');
+  forgetEtags();
   loadTab(activeTab);
+  startStream();
 }
 
 function clearSessionFilter() {
   activeSession = null;
   document.getElementById('sessionFilter').classList.remove('active');
+  forgetEtags();
   loadTab(activeTab);
+  startStream();
 }
 
 // --- Helpers ---
@@ -568,16 +869,33 @@ function esc(s) {
   return d.innerHTML;
 }
 
+// Resolves to null when the server answers 304: what is on screen for this
+// URL is still current, so the caller can skip re-rendering
+async function getJson(url) {
+  const headers = etags[url] ? {'If-None-Match': etags[url]} : {};
+  const res = await fetch(url, {headers, cache: 'no-store'});
+  if (res.status === 304) return null;
+  const data = await res.json();
+  if (res.ok && res.headers.get('ETag')) etags[url] = res.headers.get('ETag');
+  return data;
+}
+
+// Sections hold whatever their last render showed; after the session
+// filter changes, a 304 for a URL no longer means that is on screen
+function forgetEtags() {
+  for (const url in etags) delete etags[url];
+}
+
 async function api(path) {
   const sep = path.includes('?') ? '&' : '?';
   const url = activeSession ? path + sep + 'session_id=' + encodeURIComponent(activeSession) : path;
-  const res = await fetch(url);
-  return res.json();
+  return getJson(url);
 }
 
 // --- Loaders ---
 async function loadOverview() {
   const data = await api('/api/overview');
+  if (!data) return;
   document.getElementById('overviewCards').innerHTML = `
     <div class="card"><div class="label">Sessions</div><div class="value">${fmtNum(data.sessions)}</div></div>
     <div class="card"><div class="label">Tool Calls</div><div class="value">${fmtNum(data.tool_calls)}</div></div>
@@ -587,11 +905,16 @@ async function loadOverview() {
 }
 
 async function loadSessions() {
-  const rows = await fetch('/api/sessions?limit=100').then(r => r.json());
+  const rows = await getJson('/api/sessions?limit=100');
+  if (!rows) return;
   const body = document.getElementById('sessionsBody');
   if (!rows.length) { body.innerHTML = '<tr><td colspan="6" class="empty-state">No sessions</td></tr>'; return; }
-  body.innerHTML = rows.map(r => `
-    <tr class="clickable" onclick="setSessionFilter('${esc(r.session_id)}', '${esc(r.slug || r.session_id.slice(0,8))}')">
+  body.innerHTML = rows.map(sessionRow).join('');
+}
+
+function sessionRow(r) {
+  return `
+    <tr class="clickable" data-key="${esc(r.session_id)}" onclick="setSessionFilter('${esc(r.session_id)}', '${esc(r.slug || r.session_id.slice(0,8))}')">
       <td>${esc(r.slug || r.session_id.slice(0,8))}</td>
       <td>${fmtTs(r.started_at)}</td>
       <td>${fmtTs(r.last_seen_at)}</td>
@@ -599,41 +922,53 @@ async function loadSessions() {
       <td${(r.error_count||0) > 0 ? ' style="color:var(--red)"' : ''}>${r.error_count || 0}</td>
       <td>${esc(truncate(r.cwd, 40))}</td>
     </tr>
-  `).join('');
+  `;
 }
 
 async function loadTools() {
   const rows = await api('/api/tools?limit=100');
+  if (!rows) return;
   const body = document.getElementById('toolsBody');
   if (!rows.length) { body.innerHTML = '<tr><td colspan="5" class="empty-state">No tool calls</td></tr>'; return; }
-  body.innerHTML = rows.map(r => `
-    <tr class="${r.result_is_error ? 'error-row' : ''}">
+  body.innerHTML = rows.map(toolRow).join('');
+}
+
+function toolRow(r) {
+  return `
+    <tr class="${r.result_is_error ? 'error-row' : ''}" data-key="${r.id}">
       <td>${fmtTs(r.started_at)}</td>
       <td>${esc(r.tool_name)}</td>
       <td>${fmtDur(r.duration_ms)}</td>
       <td>${r.result_is_error ? 'ERROR' : 'ok'}</td>
       <td title="${esc(r.result_preview || '')}">${esc(truncate(r.result_preview, 60))}</td>
     </tr>
-  `).join('');
+  `;
 }
 
 async function loadErrors() {
   const rows = await api('/api/errors?limit=50');
+  if (!rows) return;
   const body = document.getElementById('errorsBody');
   const details = document.getElementById('errorDetails');
   if (!rows.length) { body.innerHTML = '<tr><td colspan="4" class="empty-state">No errors</td></tr>'; details.innerHTML = ''; return; }
-  body.innerHTML = rows.map((r, i) => `
-    <tr class="error-row clickable" onclick="toggleError(${i})">
+  body.innerHTML = rows.map(errorRow).join('');
+  details.innerHTML = rows.map(errorDetail).join('');
+}
+
+function errorRow(r) {
+  return `
+    <tr class="error-row clickable" data-key="${r.id}" onclick="toggleError(${r.id})">
       <td>${fmtTs(r.ts)}</td>
       <td>${esc(r.tool_name || '—')}</td>
       <td title="${esc(r.error_message || '')}">${esc(truncate(r.error_message, 60))}</td>
       <td>${esc(r.slug || '')}</td>
     </tr>
-  `).join('');
-  // store for expand
-  window._errors = rows;
-  details.innerHTML = rows.map((r, i) => `
-    <div class="error-detail" id="errDetail${i}">
+  `;
+}
+
+function errorDetail(r) {
+  return `
+    <div class="error-detail" id="errDetail${r.id}">
 <strong>Error:</strong> ${esc(r.error_message || '')}
 
 <strong>Stack Trace:</strong>
@@ -642,16 +977,17 @@ ${esc(r.stack_trace || 'N/A')}
 <strong>Thinking Before:</strong>
 ${esc(truncate(r.thinking_before, 500) || 'N/A')}
     </div>
-  `).join('');
+  `;
 }
 
-function toggleError(idx) {
-  const el = document.getElementById('errDetail' + idx);
+function toggleError(id) {
+  const el = document.getElementById('errDetail' + id);
   if (el) el.classList.toggle('open');
 }
 
 async function loadTokens() {
   const data = await api('/api/token-usage');
+  if (!data) return;
   const t = data.totals;
   const total = t.input_tokens + t.output_tokens + t.cache_read_tokens + t.cache_write_tokens;
 
@@ -685,6 +1021,7 @@ async function loadTokens() {
 
 async function loadBreakdown() {
   const rows = await api('/api/tool-breakdown');
+  if (!rows) return;
   const chart = document.getElementById('breakdownChart');
   if (!rows.length) { chart.innerHTML = '<div class="empty-state">No data</div>'; return; }
   const maxCount = Math.max(...rows.map(r => r.count));
@@ -705,6 +1042,7 @@ async function loadBreakdown() {
 
 async function loadHooks() {
   const rows = await api('/api/hook-events?limit=100');
+  if (!rows) return;
   const body = document.getElementById('hooksBody');
   if (!rows.length) { body.innerHTML = '<tr><td colspan="5" class="empty-state">No hook events</td></tr>'; return; }
   body.innerHTML = rows.map(r => `
@@ -732,20 +1070,88 @@ function loadTab(tab) {
   if (loaders[tab]) loaders[tab]();
 }
 
-// --- Auto-refresh ---
+// --- Live updates ---
+// /api/stream pushes new and completed tool calls, errors and touched
+// sessions; they are patched into the visible table in place. Other tabs
+// reload (conditionally, see getJson) after each commit. Polling every 5s
+// is only the fallback while the stream is down.
+const DELTA_TABS = {
+  tools:    {body: 'toolsBody', render: toolRow, max: 100},
+  errors:   {body: 'errorsBody', render: errorRow, max: 50},
+  sessions: {body: 'sessionsBody', render: sessionRow, max: 100, toTop: true},  // by last seen
+};
+let stream = null;
+let reloadTimer = null;
+
 function startRefresh() {
-  if (refreshTimer) clearInterval(refreshTimer);
+  if (refreshTimer) return;
   refreshTimer = setInterval(() => loadTab(activeTab), 5000);
 }
 
+function stopRefresh() {
+  clearInterval(refreshTimer);
+  refreshTimer = null;
+}
+
+// Insert rows at the top (newest first) or replace them where they are
+// (toTop: move them to the top)
+function applyDelta(tab, rows, key) {
+  const spec = DELTA_TABS[tab];
+  if (activeTab !== tab || !rows.length) return;
+  const body = document.getElementById(spec.body);
+  const empty = body.querySelector('.empty-state');
+  if (empty) empty.parentElement.remove();
+  for (const r of rows) {
+    const html = spec.render(r).trim();
+    const old = body.querySelector(`tr[data-key="${CSS.escape(String(r[key]))}"]`);
+    if (old && !spec.toTop) { old.outerHTML = html; continue; }
+    if (old) old.remove();
+    body.insertAdjacentHTML('afterbegin', html);
+  }
+  while (body.rows.length > spec.max) body.deleteRow(-1);
+}
+
+function applyErrors(rows) {
+  if (activeTab !== 'errors') return;
+  const details = document.getElementById('errorDetails');
+  for (const r of rows) {
+    if (!document.getElementById('errDetail' + r.id)) details.insertAdjacentHTML('afterbegin', errorDetail(r));
+  }
+  applyDelta('errors', rows, 'id');
+}
+
+function scheduleReload() {
+  if (DELTA_TABS[activeTab] || reloadTimer) return;
+  reloadTimer = setTimeout(() => { reloadTimer = null; loadTab(activeTab); }, 1000);
+}
+
+function startStream() {
+  if (!window.EventSource) return startRefresh();
+  if (stream) stream.close();
+  stream = new EventSource('/api/stream' + (activeSession ? '?session_id=' + encodeURIComponent(activeSession) : ''));
+  // Sent on every (re)connect: catch up once, then rely on pushes
+  stream.addEventListener('hello', () => { stopRefresh(); loadTab(activeTab); });
+  stream.addEventListener('tool_calls', e => applyDelta('tools', JSON.parse(e.data), 'id'));
+  stream.addEventListener('errors', e => applyErrors(JSON.parse(e.data)));
+  stream.addEventListener('sessions', e => applyDelta('sessions', JSON.parse(e.data), 'session_id'));
+  stream.addEventListener('change', scheduleReload);
+  stream.addEventListener('reset', () => loadTab(activeTab));
+  // EventSource reconnects by itself; poll until it does
+  stream.onerror = startRefresh;
+}
+
 // --- Init ---
 loadTab('overview');
-startRefresh();
+startStream();
 </script>
 </body>
 </html>
 """
 
+INDEX_BYTES = INDEX_HTML.encode()
+INDEX_GZIP = gzip.compress(INDEX_BYTES, 9, mtime=0)
+INDEX_ETAG = f'"{hashlib.blake2b(INDEX_BYTES, digest_size=8).hexdigest()}"'
+
 
 # ---------------------------------------------------------------------------
 # CLI
@@ -753,27 +1159,46 @@ startRefresh();
 
 def main():
     parser = argparse.ArgumentParser(description="cc-telemetry web dashboard")
-    parser.add_argument("--port", type=int, default=7900, help="Port (default: 7900)")
+    parser.add_argument("--port", type=int, default=7900, help="Port (default: 7900; 0 picks a free one)")
     parser.add_argument("--no-open", action="store_true", help="Don't auto-open browser")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Serve from an asyncio event loop with a bounded query pool")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Query threads in --async mode (default: 4)")
     args = parser.parse_args()
 
-    conn = db.open_db()
-    DashboardHandler.conn = conn
+    db.open_db().close()  # create / migrate the schema before going read-only
 
-    server = ThreadedHTTPServer(("127.0.0.1", args.port), DashboardHandler)
-    url = f"http://127.0.0.1:{args.port}"
-    print(f"cc-telemetry dashboard running at {url}")
+    def ready(port):
+        url = f"http://127.0.0.1:{port}"
+        print(f"cc-telemetry dashboard running at {url}", flush=True)
+        if not args.no_open:
+            webbrowser.open(url)
+
+    if args.use_async:
+        import async_server
+        workers = args.workers or async_server.ASYNC_WORKERS
+        pool = db.ReadPool(max_idle=workers)
+        try:
+            async_server.serve(pool, "127.0.0.1", args.port, workers, ready)
+        except KeyboardInterrupt:
+            print("\nShutting down.")
+        finally:
+            pool.close()
+        return
 
-    if not args.no_open:
-        webbrowser.open(url)
+    pool = db.ReadPool()
+    DashboardHandler.pool = pool
+
+    server = ThreadedHTTPServer(("127.0.0.1", args.port), DashboardHandler)
+    ready(server.server_port)
 
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down.")
         server.shutdown()
-        conn.close()
-
+        pool.close()
 
 if __name__ == "__main__":
     main()
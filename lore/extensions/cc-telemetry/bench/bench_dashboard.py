@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Dashboard concurrency benchmark: requests/sec with N parallel clients, one
+shared connection (how the dashboard used to run) vs the ReadPool.
+
+Usage:
+  python3 bench/bench_dashboard.py --db ~/.claude/telemetry/telemetry.db
+  python3 bench/bench_dashboard.py --db /tmp/big.db --clients 8 --seconds 10
+
+The server runs in-process on an ephemeral port; clients cycle through the
+dashboard's API endpoints. Nothing is written to the DB.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import http.client
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "daemon"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import db
+from dashboard import DashboardHandler, ThreadedHTTPServer
+
+ENDPOINTS = [
+    "/api/overview",
+    "/api/sessions?limit=50",
+    "/api/tools?limit=200",
+    "/api/errors?limit=100",
+    "/api/tool-breakdown",
+    "/api/token-usage",
+    "/api/hook-events",
+]
+
+
+class SharedConnection:
+    """Stand-in for the old setup: every request uses the same connection."""
+
+    def __init__(self, path: Path):
+        self.conn = db.open_db(path)
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    def data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _client(port: int, offset: int, deadline: float, counts: list, latencies: list) -> None:
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    i = offset
+    while time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        c.request("GET", ENDPOINTS[i % len(ENDPOINTS)])
+        resp = c.getresponse()
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"{ENDPOINTS[i % len(ENDPOINTS)]}: HTTP {resp.status}")
+        latencies.append(time.perf_counter() - t0)
+        counts[offset] += 1
+        i += 1
+    c.close()
+
+
+def run(pool, clients: int, seconds: float) -> tuple[float, float]:
+    """Returns (requests/sec, p95 latency ms)."""
+    DashboardHandler.pool = pool
+    server = ThreadedHTTPServer(("127.0.0.1", 0), DashboardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    counts = [0] * clients
+    latencies: list[float] = []
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=_client, args=(server.server_port, i, deadline, counts, latencies))
+               for i in range(clients)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    server.shutdown()
+    server.server_close()
+    pool.close()
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    return sum(counts) / elapsed, p95
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark dashboard throughput under parallel clients")
+    ap.add_argument("--db", default=str(db.get_db_path()), help="DB to serve (read only)")
+    ap.add_argument("--clients", type=int, default=8, help="Parallel clients")
+    ap.add_argument("--seconds", type=float, default=10.0, help="Duration per configuration")
+    args = ap.parse_args()
+
+    path = Path(os.path.expanduser(args.db))
+    db.open_db(path).close()  # migrate first so both runs see the same schema
+    print(f"{path} ({path.stat().st_size / 1e6:.0f} MB), {args.clients} clients, {args.seconds:.0f}s each")
+
+    configs = [("shared connection", lambda: SharedConnection(path)),
+               ("ReadPool", lambda: db.ReadPool(path))]
+    baseline = None
+    for label, make in configs:
+        rate, p95 = run(make(), args.clients, args.seconds)
+        baseline = baseline or rate
+        print(f"  {label:<20} {rate:>8,.1f} req/sec  p95 {p95:>7.1f} ms  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
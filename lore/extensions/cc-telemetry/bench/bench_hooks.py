@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Hook latency benchmark: wall time of one hook event end to end, one
+process per handler script (the old hooks.json) vs hooks/dispatch.py; and
+the cost of logger.write_event appending to the JSONL file vs sending to
+the daemon's socket (daemon/hook_socket.py).
+
+Usage:
+  python3 bench/bench_hooks.py
+  python3 bench/bench_hooks.py --runs 50 --events PostToolUse,Stop
+
+Per-script processes are started together and waited for, as Claude Code
+runs the hooks matching an event in parallel. Everything is written under
+a temporary HOME / CLAUDE_TELEMETRY_DIR / DB, so real telemetry is untouched.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+HOOKS_DIR = Path(__file__).resolve().parent.parent / "hooks"
+
+sys.path.insert(0, str(HOOKS_DIR))
+
+import logger
+from dispatch import HANDLERS
+
+PAYLOADS = {
+    "SessionStart": {"hook_event_name": "SessionStart", "cwd": "/work/project",
+                     "permission_mode": "default"},
+    "PreToolUse": {"hook_event_name": "PreToolUse", "tool_name": "Bash", "cwd": "/work/project",
+                   "tool_input": {"command": "ls -la " + "x" * 200, "description": "List files"}},
+    "PostToolUse": {"hook_event_name": "PostToolUse", "tool_name": "Bash",
+                    "tool_input": {"command": "ls -la"},
+                    "tool_result": "Error: no such file\n" + "output line\n" * 200},
+    "UserPromptSubmit": {"hook_event_name": "UserPromptSubmit",
+                         "user_prompt": "/review please look at the parser changes"},
+    "Stop": {"hook_event_name": "Stop", "stop_reason": "end_turn"},
+}
+
+
+def fire_separate(event: str, payload: bytes, env: dict) -> None:
+    procs = [subprocess.Popen([sys.executable, str(HOOKS_DIR / f"{name}.py")], env=env,
+                              stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+             for name in HANDLERS[event]]
+    for p in procs:
+        p.stdin.write(payload)
+        p.stdin.close()
+    for p in procs:
+        p.wait()
+
+
+def fire_dispatch(event: str, payload: bytes, env: dict) -> None:
+    subprocess.run([sys.executable, str(HOOKS_DIR / "dispatch.py"), event], env=env,
+                   input=payload, stdout=subprocess.DEVNULL, check=True)
+
+
+def measure(fire, event: str, runs: int, env: dict) -> tuple[float, float]:
+    """Returns (median ms, p95 ms) over `runs` firings."""
+    payload = json.dumps(PAYLOADS[event]).encode()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fire(event, payload, env)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[min(int(len(times) * 0.95), len(times) - 1)]
+
+
+LISTENER = f"""
+import sys
+from pathlib import Path
+sys.path.insert(0, {str(HOOKS_DIR.parent / "daemon")!r})
+import db
+from hook_socket import HookListener
+db.DB_PATH = Path(sys.argv[2]) / "telemetry.db"
+listener = HookListener(sys.argv[1], Path(sys.argv[2]) / "telemetry")
+listener.start()
+print("ready", flush=True)
+sys.stdin.read()
+listener.stop()
+print(listener.stored)
+"""
+
+
+def write_latency(tmp: str, runs: int) -> None:
+    """logger.write_event in-process, JSONL append vs daemon socket: the
+    log write alone, and the whole call including the session counters."""
+    os.environ["CLAUDE_TELEMETRY_DIR"] = os.path.join(tmp, "telemetry")
+    os.environ["CLAUDE_SESSION_ID"] = "bench-session"
+    socket_path = os.path.join(tmp, "telemetry", "hooks.sock")
+    events = [logger.make_event("PostToolUse", tool="Bash", meta={"result_preview": "x" * 200})
+              for _ in range(runs)]
+    lines = [(json.dumps(ev) + "\n").encode() for ev in events]
+
+    def append(line: bytes) -> None:  # write_event's fallback path
+        with open(logger.get_log_path(), "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def per_call_us(fn, items) -> float:
+        """Median per call. Hook events are sparse, so each call is timed
+        alone, after a pause that lets the listener go idle."""
+        times = []
+        for item in items:
+            time.sleep(0.001)
+            t0 = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        return times[len(times) // 2] * 1e6
+
+    os.environ["CC_TELEMETRY_HOOK_SOCKET"] = ""
+    file_write = per_call_us(append, lines)
+    file_call = per_call_us(logger.write_event, events)
+    # The listener runs in its own process, as in the daemon
+    daemon = subprocess.Popen([sys.executable, "-c", LISTENER, socket_path, tmp],
+                              stdout=subprocess.PIPE, stdin=subprocess.PIPE, text=True)
+    daemon.stdout.readline()
+    os.environ["CC_TELEMETRY_HOOK_SOCKET"] = socket_path
+    try:
+        sock_write = per_call_us(logger.send_event, lines)
+        sock_call = per_call_us(logger.write_event, events)
+    finally:
+        stored = daemon.communicate("")[0].strip()
+    print(f"\nlogger.write_event, {runs} events, median; daemon stored {stored}")
+    print(f"  log write       JSONL append {file_write:>7.1f} us   socket {sock_write:>7.1f} us"
+          f"  ({file_write / sock_write:.2f}x)")
+    print(f"  whole call      JSONL append {file_call:>7.1f} us   socket {sock_call:>7.1f} us"
+          f"  ({file_call / sock_call:.2f}x)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark hook latency per event")
+    ap.add_argument("--runs", type=int, default=30, help="Firings per event and setup")
+    ap.add_argument("--events", default=",".join(HANDLERS), help="Comma-separated hook events")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cc-hooks-bench-") as tmp:
+        env = dict(os.environ, HOME=tmp, CLAUDE_TELEMETRY_DIR=os.path.join(tmp, "telemetry"),
+                   CLAUDE_SESSION_ID="bench-session")
+        print(f"{args.runs} firings per event; median / p95 wall time")
+        for event in args.events.split(","):
+            n = len(HANDLERS[event])
+            sep_med, sep_p95 = measure(fire_separate, event, args.runs, env)
+            dis_med, dis_p95 = measure(fire_dispatch, event, args.runs, env)
+            print(f"  {event:<17} {n} handler(s)  separate {sep_med:>6.1f} / {sep_p95:>6.1f} ms"
+                  f"   dispatch {dis_med:>6.1f} / {dis_p95:>6.1f} ms  ({sep_med / dis_med:.2f}x)")
+        write_latency(tmp, args.runs * 20)
+
+
+if __name__ == "__main__":
+    main()
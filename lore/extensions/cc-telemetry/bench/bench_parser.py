@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Parser throughput benchmark: lines/sec of TranscriptParser on a mixed
+transcript, with and without the pre-decode classifier and the accelerated
+JSON decoder.
+
+Usage:
+  python3 bench/bench_parser.py                     # synthetic transcript
+  python3 bench/bench_parser.py --lines 50000
+  python3 bench/bench_parser.py --file ~/.claude/projects/<proj>/<session>.jsonl
+
+Rows are queued on a WriteBatch and dropped, so only parsing is measured.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "daemon"))
+
+import db
+import parser as transcript_parser
+from parser import TranscriptParser
+
+
+def _ts(i: int) -> str:
+    t = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i)
+    return t.isoformat().replace("+00:00", "Z")
+
+
+def synthetic_lines(n: int, seed: int = 1) -> list[str]:
+    """A transcript mix close to real sessions: every tool call brings hook
+    progress, a burst of bash/agent progress and a file-history snapshot."""
+    rnd = random.Random(seed)
+    sid = "bench-session"
+    common = {"parentUuid": None, "isSidechain": False, "userType": "external",
+              "cwd": "/work/project", "sessionId": sid, "version": "2.0.0",
+              "gitBranch": "main", "slug": "bench-slug"}
+    out = []
+    i = 0
+    while len(out) < n:
+        i += 1
+        tid = f"toolu_{i:08d}"
+        out.append({**common, "message": {
+            "model": "claude-x", "id": f"msg_{i}", "type": "message", "role": "assistant",
+            "content": [
+                {"type": "thinking", "thinking": "considering the next step " * rnd.randint(5, 40)},
+                {"type": "tool_use", "id": tid, "name": rnd.choice(["Bash", "Read", "Edit", "Grep"]),
+                 "input": {"command": "ls -la " + "x" * rnd.randint(10, 200)}},
+            ],
+            "usage": {"input_tokens": 10, "output_tokens": 50,
+                      "cache_read_input_tokens": 1000, "cache_creation_input_tokens": 20},
+        }, "requestId": f"req_{i}", "type": "assistant", "uuid": f"a{i}", "timestamp": _ts(2 * i)})
+        out.append({**common, "type": "progress",
+                    "data": {"type": "hook_progress", "hookEvent": "PreToolUse",
+                             "hookName": "PreToolUse:Bash", "command": "python3 hook.py"},
+                    "toolUseID": tid, "uuid": f"h{i}", "timestamp": _ts(2 * i)})
+        for k in range(rnd.randint(2, 8)):
+            out.append({**common, "type": "progress",
+                        "data": {"type": rnd.choice(["bash_progress", "agent_progress"]),
+                                 "output": "line of output\n" * rnd.randint(5, 80),
+                                 "elapsedTimeSeconds": k},
+                        "toolUseID": tid, "uuid": f"p{i}.{k}", "timestamp": _ts(2 * i)})
+        out.append({**common, "type": "user", "message": {"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": tid, "content": "ok " * rnd.randint(10, 300),
+             "is_error": i % 13 == 0}]},
+            "uuid": f"u{i}", "timestamp": _ts(2 * i + 1), "toolUseResult": {"success": True}})
+        out.append({"type": "file-history-snapshot", "messageId": f"a{i}", "snapshot": {
+            "trackedFileBackups": {f"src/file{j}.py": {"backupFileName": "b" * 40, "version": j}
+                                   for j in range(rnd.randint(5, 60))},
+            "timestamp": _ts(2 * i)}, "isSnapshotUpdate": False})
+    return [json.dumps(o) for o in out[:n]]
+
+
+def run(lines: list[str], classify: bool, loads) -> float:
+    """Parse every line once; returns lines/sec."""
+    saved = transcript_parser.needs_decode, transcript_parser._loads
+    if not classify:
+        transcript_parser.needs_decode = lambda line: True
+    transcript_parser._loads = loads
+    try:
+        batch = db.WriteBatch()
+        p = TranscriptParser(batch, "/bench/transcript.jsonl")
+        t0 = time.perf_counter()
+        for n, line in enumerate(lines):
+            p.process_line(line)
+            if n % 1000 == 0:
+                batch.clear()
+        elapsed = time.perf_counter() - t0
+    finally:
+        transcript_parser.needs_decode, transcript_parser._loads = saved
+    return len(lines) / elapsed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark transcript parsing throughput")
+    ap.add_argument("--file", help="Benchmark a real transcript instead of synthetic data")
+    ap.add_argument("--lines", type=int, default=20000, help="Synthetic transcript size")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is kept)")
+    args = ap.parse_args()
+
+    if args.file:
+        with open(os.path.expanduser(args.file), encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    else:
+        lines = synthetic_lines(args.lines)
+    skipped = sum(not transcript_parser.needs_decode(line) for line in lines)
+    mb = sum(len(line) for line in lines) / 1e6
+    print(f"{len(lines)} lines, {mb:.1f} MB; classifier skips {skipped} "
+          f"({100 * skipped / max(len(lines), 1):.0f}%)")
+
+    configs = [("json.loads, every line", False, json.loads),
+               ("json.loads + classifier", True, json.loads)]
+    if transcript_parser.DECODER != "json":
+        configs.append((f"{transcript_parser.DECODER} + classifier", True, transcript_parser._loads))
+
+    baseline = None
+    for label, classify, loads in configs:
+        rate = max(run(lines, classify, loads) for _ in range(args.repeat))
+        baseline = baseline or rate
+        print(f"  {label:<28} {rate:>10,.0f} lines/sec  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
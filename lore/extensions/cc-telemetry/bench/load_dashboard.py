@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Dashboard load test: latency under concurrent clients and peak server
+memory for large exports, threaded server vs `dashboard.py --async`.
+
+Usage:
+  python3 bench/load_dashboard.py --db ~/.claude/telemetry/telemetry.db
+  python3 bench/load_dashboard.py --db /tmp/big.db --clients 32 --seconds 10
+  python3 bench/load_dashboard.py --db /tmp/big.db --limits 1000,100000,1000000
+
+Each configuration runs the dashboard as a subprocess on a free port.
+Latency: clients on keep-alive connections cycle through the page's API
+endpoints (distinct URLs, so ETags don't turn them into 304s). Memory: a
+fresh server streams /api/tools?limit=N once while its anonymous RSS is
+sampled (Linux only); pages of the memory-mapped DB are page cache shared
+with every reader, so they are left out. Nothing is written to the DB.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "daemon"))
+
+import db
+
+DASHBOARD = Path(__file__).resolve().parent.parent / "app" / "dashboard.py"
+
+ENDPOINTS = [
+    "/api/overview",
+    "/api/sessions?limit=50",
+    "/api/tools?limit=100",
+    "/api/errors?limit=50",
+    "/api/tool-breakdown",
+    "/api/token-usage",
+    "/api/hook-events?limit=100",
+]
+
+MODES = [("threaded", []), ("async", ["--async"])]
+
+
+class Server:
+    def __init__(self, path: Path, flags: list):
+        env = dict(os.environ, CC_TELEMETRY_DB=str(path))
+        self.proc = subprocess.Popen(
+            [sys.executable, str(DASHBOARD), "--port", "0", "--no-open", *flags],
+            env=env, stdout=subprocess.PIPE, text=True)
+        line = self.proc.stdout.readline()
+        if "running at" not in line:
+            self.proc.kill()
+            raise RuntimeError(f"dashboard did not start: {line!r}")
+        self.port = int(line.rsplit(":", 1)[1])
+
+    def status(self, field: str) -> float:
+        """A VmRSS / RssAnon style field of /proc/<pid>/status, in MB."""
+        with open(f"/proc/{self.proc.pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def _client(port: int, offset: int, deadline: float, latencies: list) -> None:
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    i = offset
+    while time.monotonic() < deadline:
+        # A distinct query string per request defeats the ETag shortcut
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        url = f"{endpoint}{'&' if '?' in endpoint else '?'}n={i}"
+        t0 = time.perf_counter()
+        c.request("GET", url, headers={"Accept-Encoding": "gzip"})
+        resp = c.getresponse()
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"{url}: HTTP {resp.status}")
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+    c.close()
+
+
+def latency(path: Path, flags: list, clients: int, seconds: float) -> tuple[float, float, float]:
+    """Returns (requests/sec, p50 ms, p95 ms)."""
+    server = Server(path, flags)
+    try:
+        latencies: list[float] = []
+        deadline = time.monotonic() + seconds
+        threads = [threading.Thread(target=_client, args=(server.port, i, deadline, latencies))
+                   for i in range(clients)]
+        t0 = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - t0
+    finally:
+        server.stop()
+    latencies.sort()
+    pct = lambda p: latencies[int(len(latencies) * p)] * 1000 if latencies else 0.0
+    return len(latencies) / elapsed, pct(0.50), pct(0.95)
+
+
+def export_memory(path: Path, flags: list, limit: int) -> tuple[float, int, float]:
+    """Stream /api/tools?limit=`limit` from a fresh server. Returns (peak
+    anonymous RSS growth MB, bytes received, seconds)."""
+    server = Server(path, flags)
+    done = threading.Event()
+    peak = [0.0]
+
+    def sample():
+        while not done.wait(0.02):
+            peak[0] = max(peak[0], server.status("RssAnon"))
+
+    try:
+        c = http.client.HTTPConnection("127.0.0.1", server.port, timeout=600)
+        c.request("GET", "/api/tools?limit=1")  # warm up: first query, pooled connection
+        c.getresponse().read()
+        base = server.status("RssAnon")
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        t0 = time.perf_counter()
+        c.request("GET", f"/api/tools?limit={limit}&format=ndjson")
+        resp = c.getresponse()
+        received = 0
+        while chunk := resp.read(1 << 16):
+            received += len(chunk)
+        elapsed = time.perf_counter() - t0
+        done.set()
+        sampler.join()
+        c.close()
+    finally:
+        done.set()
+        server.stop()
+    return max(peak[0] - base, 0.0), received, elapsed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load-test the dashboard servers")
+    ap.add_argument("--db", default=str(db.get_db_path()), help="DB to serve (read only)")
+    ap.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    ap.add_argument("--seconds", type=float, default=10.0, help="Duration per server")
+    ap.add_argument("--limits", default="1000,100000,1000000",
+                    help="Comma-separated export sizes for the memory test")
+    args = ap.parse_args()
+
+    path = Path(os.path.expanduser(args.db))
+    db.open_db(path).close()  # migrate first so the servers start read-only
+    print(f"{path} ({path.stat().st_size / 1e6:.0f} MB)")
+
+    print(f"\nLatency, {args.clients} clients, {args.seconds:.0f}s each")
+    for label, flags in MODES:
+        rate, p50, p95 = latency(path, flags, args.clients, args.seconds)
+        print(f"  {label:<10} {rate:>8,.1f} req/sec  p50 {p50:>7.1f} ms  p95 {p95:>7.1f} ms")
+
+    if not os.path.exists("/proc/self/status"):
+        return
+    print("\nPeak server memory streaming /api/tools as NDJSON")
+    for label, flags in MODES:
+        for limit in (int(n) for n in args.limits.split(",")):
+            grown, received, elapsed = export_memory(path, flags, limit)
+            print(f"  {label:<10} limit {limit:>9,}  {received / 1e6:>8.1f} MB sent in {elapsed:>5.1f}s  "
+                  f"peak heap +{grown:>6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Historical backfill for the cc-telemetry daemon (`daemon.py --backfill`).
+
+Live tailing skips whatever was already on disk when the daemon first saw a
+transcript. Backfill imports that history with a process pool: each task
+parses one file with TranscriptParser into its worker's staging DB, and the
+staging DBs are merged into the main DB in bulk once the pool is done.
+
+Hand-off with live tailing goes through the checkpoint `origin`, the offset
+tailing of the file's inode started from. Backfill imports [0, origin) and
+the live daemon owns everything after it, so no line is read twice:
+
+  - a file with a checkpoint is imported up to its origin;
+  - a file without one gets a checkpoint at its current size before any work
+    starts, so a daemon started later resumes from there;
+  - files recorded in `backfill_files` continue from where the last run
+    stopped, so re-running is cheap and never duplicates rows.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import db
+from parser import TranscriptParser
+from watcher import CC_PROJECTS_DIR
+
+logger = logging.getLogger("cc_telemetry.backfill")
+
+# Files without a checkpoint that changed more recently than this are left
+# alone: a running daemon may be reading them from byte 0 right now.
+SETTLE_SECONDS = 10.0
+
+# Seconds between progress log lines
+PROGRESS_INTERVAL = 5.0
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_staging_path: Optional[Path] = None
+_staging_conn: Optional[sqlite3.Connection] = None
+
+
+def _init_worker(staging_dir: str) -> None:
+    """Pool initializer: give each worker process its own staging DB."""
+    global _staging_path, _staging_conn
+    _staging_path = Path(staging_dir) / f"worker-{os.getpid()}.db"
+    _staging_conn = db.open_db(_staging_path)
+    db.drop_search_triggers(_staging_conn)
+
+
+def _import_file(task: tuple[str, int, int, int]) -> dict:
+    """Parse bytes [start, end) of one transcript into the staging DB."""
+    path, inode, start, end = task
+    batch = db.WriteBatch()
+    parser = TranscriptParser(batch, path)
+    lines = errors = 0
+
+    # One transaction per file: a file that fails halfway leaves nothing
+    # behind in staging and is simply retried on the next run.
+    with db.transaction(_staging_conn):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_ino != inode:
+                raise RuntimeError("file was replaced during backfill")
+            f.seek(start)
+            pos = start
+            for raw in f:
+                pos += len(raw)
+                if pos > end:
+                    break  # line crosses into the live-tailed range
+                line = raw.decode("utf-8", errors="replace").strip()
+                if line:
+                    lines += 1
+                    try:
+                        parser.process_line(line)
+                    except Exception as e:
+                        errors += 1
+                        logger.debug("parse error in %s: %s", path, e)
+                if batch.due():
+                    batch.flush(_staging_conn)
+                if pos == end:
+                    break
+        batch.flush(_staging_conn)
+
+    return {
+        "path": path, "inode": inode, "offset": end,
+        "lines": lines, "errors": errors, "bytes": end - start,
+        "staging": str(_staging_path),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+def plan(conn: sqlite3.Connection, since: Optional[float] = None) -> list[tuple[str, int, int, int]]:
+    """
+    Work out the byte range each transcript still needs, as
+    (path, inode, start, end) tasks, largest first. Files without a
+    checkpoint are checkpointed at their current size as a side effect.
+    """
+    if not CC_PROJECTS_DIR.exists():
+        logger.warning("CC projects dir not found: %s", CC_PROJECTS_DIR)
+        return []
+
+    checkpoints = db.load_checkpoints(conn)
+    done = db.load_backfilled(conn)
+    now = time.time()
+    tasks = []
+
+    with db.transaction(conn):
+        for jsonl_path in CC_PROJECTS_DIR.rglob("*.jsonl"):
+            path_str = str(jsonl_path)
+            try:
+                stat = jsonl_path.stat()
+            except OSError:
+                continue
+            if since is not None and stat.st_mtime < since:
+                continue
+
+            saved = checkpoints.get(path_str)
+            if saved is None:
+                if now - stat.st_mtime < SETTLE_SECONDS:
+                    logger.debug("Skipping active, untracked %s", jsonl_path.name)
+                    continue
+                end = stat.st_size
+                db.save_checkpoint(conn, path_str, stat.st_ino, end, None, origin=end)
+            elif saved["inode"] != stat.st_ino:
+                # Replaced since the daemon last saw it; the daemon re-reads
+                # the new file from byte 0 itself.
+                continue
+            else:
+                end = saved["origin"]
+
+            prev = done.get(path_str)
+            start = prev[1] if prev and prev[0] == stat.st_ino else 0
+            if end > start:
+                tasks.append((path_str, stat.st_ino, start, end))
+
+    tasks.sort(key=lambda t: t[3] - t[2], reverse=True)
+    return tasks
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def parse_since(value: str) -> float:
+    """Parse a --since DATE (ISO date or datetime, local time) to a timestamp."""
+    return datetime.fromisoformat(value).timestamp()
+
+
+def run_backfill(conn: sqlite3.Connection, since: Optional[float] = None,
+                 jobs: Optional[int] = None) -> dict:
+    """Import historical transcript content. Returns a summary dict."""
+    jobs = jobs or os.cpu_count() or 1
+    tasks = plan(conn, since)
+    summary = {"files": 0, "failed": 0, "lines": 0, "bytes": 0,
+               "rows": 0, "parse_seconds": 0.0, "merge_seconds": 0.0}
+    if not tasks:
+        logger.info("Backfill: nothing to import")
+        return summary
+
+    total_bytes = sum(t[3] - t[2] for t in tasks)
+    logger.info("Backfill: %d file(s), %.1f MB with %d worker(s)",
+                len(tasks), total_bytes / 1e6, jobs)
+
+    staging_dir = tempfile.mkdtemp(prefix="backfill-", dir=str(db.get_db_path().parent))
+    by_staging: dict[str, list[tuple[str, int, int, int]]] = {}
+    try:
+        t0 = time.monotonic()
+        last_progress = t0
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(staging_dir,)) as pool:
+            futures = {pool.submit(_import_file, t): t for t in tasks}
+            for fut in as_completed(futures):
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    summary["failed"] += 1
+                    logger.error("Backfill of %s failed: %s", futures[fut][0], e)
+                    continue
+                summary["files"] += 1
+                summary["lines"] += res["lines"]
+                summary["bytes"] += res["bytes"]
+                by_staging.setdefault(res["staging"], []).append(
+                    (res["path"], res["inode"], res["offset"], res["lines"]))
+
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    elapsed = last_progress - t0
+                    logger.info("Backfill: %d/%d files, %d lines (%.0f lines/sec)",
+                                summary["files"] + summary["failed"], len(tasks),
+                                summary["lines"], summary["lines"] / elapsed)
+        summary["parse_seconds"] = time.monotonic() - t0
+
+        t1 = time.monotonic()
+        for staging_path, files in by_staging.items():
+            summary["rows"] += db.merge_staging(conn, Path(staging_path), files)
+        summary["merge_seconds"] = time.monotonic() - t1
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    elapsed = summary["parse_seconds"] + summary["merge_seconds"]
+    summary["lines_per_sec"] = summary["lines"] / elapsed if elapsed else 0.0
+    logger.info(
+        "Backfill done: %d file(s), %d lines, %d rows in %.1fs "
+        "(parse %.1fs, merge %.1fs): %.0f lines/sec%s",
+        summary["files"], summary["lines"], summary["rows"], elapsed,
+        summary["parse_seconds"], summary["merge_seconds"], summary["lines_per_sec"],
+        f", {summary['failed']} file(s) failed" if summary["failed"] else "",
+    )
+    return summary
@@ -3,27 +3,49 @@
 cc-telemetry daemon.
 
 Watches ~/.claude/projects/**/*.jsonl in real-time, parses Claude Code
-transcript events, and writes structured telemetry to SQLite.
+transcript events, and writes structured telemetry to SQLite. Read positions
+are checkpointed in the same DB, so a restart resumes where it stopped.
 
 Usage:
   python3 daemon.py              # run until interrupted
   python3 daemon.py --once       # poll once and exit (for testing)
   python3 daemon.py --status     # print DB stats and exit
+  python3 daemon.py --pipeline [--workers N]
+                                 # parse on worker threads, write on a
+                                 # dedicated writer thread (see pipeline.py)
+  python3 daemon.py --backfill [--since DATE] [--jobs N]
+                                 # import existing transcript history and exit
+                                 # (see backfill.py)
+
+While running, expired rows are archived and pruned every
+CC_TELEMETRY_GC_INTERVAL seconds on a background thread (see retention.py),
+and events from the plugin's hooks are received on a Unix socket and
+stored in hook_log (see hook_socket.py). The hooks' daily JSONL logs are
+tailed into hook_log as well, pairing PreToolUse/PostToolUse events into
+tool_spans (see hook_tail.py).
 """
 
 import sys
 import os
 import logging
+import json
 import signal
 import argparse
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 
 # Add daemon dir to path so sibling imports work
 sys.path.insert(0, os.path.dirname(__file__))
 
 import db
-from watcher import TranscriptWatcher
+from watcher import TranscriptWatcher, CheckpointStore
 from parser import TranscriptParser
+from pipeline import Pipeline
+import backfill
+from retention import RetentionScheduler
+from hook_socket import HookListener
+from hook_tail import HookLogTailer
 
 # ---------------------------------------------------------------------------
 # Logging setup
@@ -32,6 +54,9 @@ from parser import TranscriptParser
 LOG_FILE = Path(os.path.expanduser("~/.claude/telemetry/daemon.log"))
 LOG_LEVEL = os.environ.get("CC_TELEMETRY_LOG_LEVEL", "INFO").upper()
 
+# Pipeline counters, refreshed while the daemon runs in --pipeline mode
+STATUS_FILE = Path(os.path.expanduser("~/.claude/telemetry/daemon-status.json"))
+
 
 def setup_logging(verbose: bool = False) -> None:
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -52,22 +77,106 @@ def setup_logging(verbose: bool = False) -> None:
 # Per-file parser cache
 # ---------------------------------------------------------------------------
 
-class DaemonState:
-    """Holds one TranscriptParser per transcript file (to maintain pending state)."""
+class DaemonState(CheckpointStore):
+    """
+    Holds one TranscriptParser per transcript file (to maintain pending state)
+    and persists read positions plus parser state as DB checkpoints, committed
+    in the same transaction as the rows they cover.
+
+    Parsers queue rows on a shared db.WriteBatch, which is flushed when its
+    size/age thresholds are hit at the end of a poll cycle (and on shutdown).
+    """
 
     def __init__(self, conn):
         self.conn = conn
+        self.writes = db.WriteBatch()
         self._parsers: dict[str, TranscriptParser] = {}
+        self._checkpoints: dict[str, dict] = db.load_checkpoints(conn)
 
     def get_parser(self, transcript_path: str) -> TranscriptParser:
         if transcript_path not in self._parsers:
-            self._parsers[transcript_path] = TranscriptParser(self.conn, transcript_path)
+            parser = TranscriptParser(self.writes, transcript_path)
+            saved = self._checkpoints.get(transcript_path)
+            if saved and saved.get("parser_state"):
+                parser.load_state(saved["parser_state"])
+            self._parsers[transcript_path] = parser
         return self._parsers[transcript_path]
 
     def process_line(self, transcript_path: str, line: str) -> None:
         parser = self.get_parser(transcript_path)
         parser.process_line(line)
 
+    # --- CheckpointStore ---
+
+    def load(self, path: str) -> Optional[tuple[int, int]]:
+        saved = self._checkpoints.get(path)
+        return (saved["inode"], saved["offset"]) if saved else None
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns the number of rows written."""
+        try:
+            return self.writes.flush(self.conn)
+        except Exception:
+            # Parsers may have moved past rows that were just rolled back;
+            # rebuild them from the last committed checkpoints.
+            self.writes.clear()
+            self._parsers.clear()
+            self._checkpoints = db.load_checkpoints(self.conn)
+            raise
+
+    @contextmanager
+    def batch(self):
+        yield
+        if self.writes.due():
+            self.flush()
+
+    def save(self, path: str, inode: int, offset: int, origin: int = 0) -> None:
+        parser = self._parsers.get(path)
+        if parser is not None:
+            parser_state = parser.dump_state()
+        else:
+            parser_state = (self._checkpoints.get(path) or {}).get("parser_state")
+        self.writes.save_checkpoint(path, inode, offset, parser_state, origin)
+        self._checkpoints[path] = {
+            "inode": inode, "offset": offset, "origin": origin, "parser_state": parser_state,
+        }
+        # Large catch-up reads save per chunk; write as we go rather than
+        # holding a whole file's rows until the end of the round.
+        if self.writes.due():
+            self.flush()
+
+    def discard(self, path: str) -> None:
+        self._parsers.pop(path, None)
+        self._checkpoints.pop(path, None)
+
+    def close(self) -> None:
+        self.flush()
+
+
+def print_pipeline_status() -> None:
+    """Print the counters a running --pipeline daemon last wrote, if any."""
+    try:
+        status = json.loads(STATUS_FILE.read_text())
+    except (OSError, ValueError):
+        return
+    try:
+        os.kill(status["pid"], 0)
+        running = "running"
+    except (OSError, KeyError):
+        running = "not running"
+    print(f"\nPipeline (PID {status.get('pid')}, {running}, updated {status.get('updated_at')}):")
+    print(f"  Parse queue depth:  {status['parse_queue_depth']} / {status['queue_size']} "
+          f"x {status['workers']} worker(s)")
+    print(f"  Write queue depth:  {status['write_queue_depth']} / {status['queue_size']} "
+          f"(max seen {status['write_queue_max']})")
+    print(f"  Queue waits:        {status['puts_blocked']} of {status['puts']} puts blocked, "
+          f"total {status['put_wait_total_ms']} ms, max {status['put_wait_max_ms']} ms")
+    print(f"  Lines parsed:       {status['lines_parsed']}")
+    print(f"  Peak RSS:           {status.get('peak_rss_mb')} MB")
+    print(f"  Flushes:            {status['flushes']} ({status['rows_written']} rows, "
+          f"avg {status['flush_ms_avg']} ms, max {status['flush_ms_max']} ms, "
+          f"{status['flush_failures']} failed)")
+
 
 # ---------------------------------------------------------------------------
 # Main
@@ -79,6 +188,16 @@ def main() -> None:
                     help="Poll once and exit (for testing)")
     ap.add_argument("--status", action="store_true",
                     help="Print DB stats and exit")
+    ap.add_argument("--pipeline", action="store_true",
+                    help="Parse on worker threads and write on a dedicated writer thread")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Parser worker threads in --pipeline mode (default: 1)")
+    ap.add_argument("--backfill", action="store_true",
+                    help="Import transcript history that live tailing skipped, then exit")
+    ap.add_argument("--since", metavar="DATE",
+                    help="With --backfill: only transcripts modified on or after DATE (YYYY-MM-DD)")
+    ap.add_argument("--jobs", "-j", type=int, default=None,
+                    help="With --backfill: worker processes (default: CPU count)")
     ap.add_argument("--verbose", "-v", action="store_true",
                     help="Debug logging")
     args = ap.parse_args()
@@ -101,14 +220,27 @@ def main() -> None:
             print(f"  {s['slug'] or s['session_id'][:8]}  "
                   f"calls={s['tool_call_count']}  errors={s['error_count'] or 0}  "
                   f"last={s['last_seen_at']}")
+        print_pipeline_status()
+        return
+
+    if args.backfill:
+        since = backfill.parse_since(args.since) if args.since else None
+        backfill.run_backfill(conn, since=since, jobs=args.jobs)
         return
 
-    state = DaemonState(conn)
+    if args.pipeline:
+        state = Pipeline(conn, workers=args.workers, status_path=STATUS_FILE)
+        state.start()
+    else:
+        state = DaemonState(conn)
 
     def on_line(path: str, line: str) -> None:
         state.process_line(path, line)
 
-    watcher = TranscriptWatcher(line_callback=on_line)
+    watcher = TranscriptWatcher(line_callback=on_line, checkpoints=state)
+    gc = RetentionScheduler()
+    hooks = HookListener()
+    hook_logs = HookLogTailer()
 
     def _shutdown(signum, frame):
         log.info("Shutting down (signal %s)…", signum)
@@ -119,14 +251,24 @@ def main() -> None:
 
     if args.once:
         watcher.scan_existing()
-        watcher._poll_once()
+        watcher.catch_up()
+        state.close()
+        hook_logs.run_once()
         log.info("--once complete.")
         return
 
+    gc.start()
+    hooks.start()
+    hook_logs.start()
     try:
         watcher.run_forever()
     except KeyboardInterrupt:
         pass
+    finally:
+        hooks.stop()
+        hook_logs.stop()
+        gc.stop()
+        state.close()
 
     log.info("cc-telemetry daemon stopped.")
 
@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
 """
 SQLite database layer for cc-telemetry.
-Schema: sessions, tool_calls, hook_events, messages.
+Schema: sessions, tool_calls, hook_events, messages, ingest_checkpoints,
+backfill_files, blobs, hook_log, tool_spans.
 """
 
 import sqlite3
 import os
 import json
+import time
+import zlib
+import queue
+import hashlib
+import logging
+import threading
+from functools import lru_cache, wraps
 from pathlib import Path
 from datetime import datetime, timezone
 from contextlib import contextmanager
 from typing import Optional
 
+logger = logging.getLogger("cc_telemetry.db")
 
 DB_PATH = Path(os.environ.get(
     "CC_TELEMETRY_DB",
@@ -23,17 +32,173 @@ def get_db_path() -> Path:
     return DB_PATH
 
 
+@lru_cache(maxsize=4096)
+def ts_ms(ts: Optional[str]) -> Optional[int]:
+    """ISO-8601 timestamp -> integer epoch milliseconds (naive means UTC).
+    Cached: one transcript line yields several rows with the same ts."""
+    if not ts:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3.Connection plus the per-connection result memo of @memoized."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.memo: dict = {}
+        self.memo_state: Optional[tuple[int, int]] = None
+
+
 def open_db(path: Path = None) -> sqlite3.Connection:
     p = path or DB_PATH
     p.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(p), check_same_thread=False)
+    conn = sqlite3.connect(str(p), check_same_thread=False, factory=Connection)
     conn.row_factory = sqlite3.Row
+    # Only takes effect on a new file; `cc-telemetry storage --vacuum`
+    # converts an existing one (retention relies on incremental_vacuum)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA synchronous=NORMAL")
+    conn.create_function("iso_ms", 1, ts_ms, deterministic=True)
+    conn.create_function("inflate", 1, inflate, deterministic=True)
     _init_schema(conn)
+    migrate(conn)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Read-only connections
+# ---------------------------------------------------------------------------
+#
+# Readers (dashboard request threads, CLI) never share a connection: a
+# sqlite3.Connection serializes every call on its own mutex, and cursors of
+# concurrent requests would interleave on it. ReadPool hands each thread a
+# read-only connection of its own for the duration of a `with` block and
+# keeps it for reuse; under WAL they all read alongside the daemon's writer.
+
+# Page cache per read connection (KiB) and bytes memory-mapped
+READ_CACHE_KB = 16384
+READ_MMAP_BYTES = 256 * 1024 * 1024
+
+
+def open_readonly(path: Path = None) -> sqlite3.Connection:
+    """Read-only connection (mode=ro, query_only). The schema must exist:
+    call open_db() once first to create or migrate it."""
+    p = Path(path or DB_PATH).resolve()
+    conn = sqlite3.connect(f"{p.as_uri()}?mode=ro", uri=True, check_same_thread=False,
+                           factory=Connection)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA cache_size=-{READ_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size={READ_MMAP_BYTES}")
+    conn.create_function("iso_ms", 1, ts_ms, deterministic=True)
+    conn.create_function("inflate", 1, inflate, deterministic=True)
     return conn
 
 
+class ReadPool:
+    """
+    Pool of read-only connections. `with pool.connection() as conn:` checks
+    one out for the calling thread (opening a new one if none is idle) and
+    returns it afterwards; at most `max_idle` are kept open between uses.
+    """
+
+    def __init__(self, path: Path = None, max_idle: int = 8):
+        self.path = path or DB_PATH
+        self.max_idle = max_idle
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self.opened = 0
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_lock = threading.Lock()
+
+    def data_version(self) -> int:
+        """
+        A counter that moves whenever another connection commits. Read on
+        one dedicated connection: PRAGMA data_version values of different
+        connections are not comparable, and this one never writes itself.
+        """
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = open_readonly(self.path)
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = open_readonly(self.path)
+            self.opened += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # don't pin an old WAL snapshot while idle
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    def close(self) -> None:
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ---------------------------------------------------------------------------
+# Memoized aggregates
+# ---------------------------------------------------------------------------
+#
+# Aggregates over whole tables (stats, overview, breakdowns) are polled by
+# every open dashboard tab but only change when rows are written. @memoized
+# keeps their results on the connection, keyed by arguments, and drops them
+# all as soon as the DB has changed: PRAGMA data_version moves when another
+# connection (the daemon) commits, total_changes when this one writes (e.g.
+# rebuild_rollups from the CLI). Checking both is one cheap pragma, so an
+# idle dashboard costs next to nothing. Cached results are shared: callers
+# must not mutate them.
+
+# Results kept per connection (oldest evicted first)
+MEMO_MAX_ENTRIES = 64
+
+
+def memoized(fn):
+    @wraps(fn)
+    def wrapper(conn: sqlite3.Connection, *args, **kwargs):
+        memo = getattr(conn, "memo", None)
+        try:
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            memo = None  # unhashable arguments: just run it
+        if memo is None:
+            return fn(conn, *args, **kwargs)
+        state = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        if state != conn.memo_state:
+            memo.clear()
+            conn.memo_state = state
+        if key in memo:
+            return memo[key]
+        result = memo[key] = fn(conn, *args, **kwargs)
+        if len(memo) > MEMO_MAX_ENTRIES:
+            del memo[next(iter(memo))]
+        return result
+    return wrapper
+
+
 def _init_schema(conn: sqlite3.Connection) -> None:
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS sessions (
@@ -131,35 +296,725 @@ def _init_schema(conn: sqlite3.Connection) -> None:
             FOREIGN KEY(session_id) REFERENCES sessions(session_id)
         );
 
-        CREATE INDEX IF NOT EXISTS idx_tc_session  ON tool_calls(session_id);
-        CREATE INDEX IF NOT EXISTS idx_tc_name     ON tool_calls(tool_name);
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            transcript_path TEXT PRIMARY KEY,
+            inode           INTEGER NOT NULL,
+            offset          INTEGER NOT NULL,
+            origin          INTEGER NOT NULL DEFAULT 0,
+            parser_state    TEXT,
+            updated_at      TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS backfill_files (
+            transcript_path TEXT PRIMARY KEY,
+            inode           INTEGER NOT NULL,
+            offset          INTEGER NOT NULL,
+            lines           INTEGER,
+            imported_at     TEXT
+        );
+
         CREATE INDEX IF NOT EXISTS idx_tc_started  ON tool_calls(started_at);
-        CREATE INDEX IF NOT EXISTS idx_he_session  ON hook_events(session_id);
         CREATE INDEX IF NOT EXISTS idx_msg_session ON messages(session_id);
-        CREATE INDEX IF NOT EXISTS idx_err_session ON errors(session_id);
         CREATE INDEX IF NOT EXISTS idx_err_tool    ON errors(tool_use_id);
-        CREATE INDEX IF NOT EXISTS idx_think_session ON thinking_blocks(session_id);
-        CREATE INDEX IF NOT EXISTS idx_sysmsg_session ON system_messages(session_id);
-        CREATE INDEX IF NOT EXISTS idx_api_session ON api_metadata(session_id);
         CREATE INDEX IF NOT EXISTS idx_api_request ON api_metadata(request_id);
     """)
     conn.commit()
 
 
+def _meta_get(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _meta_set(conn: sqlite3.Connection, key: str, value) -> None:
+    conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", (key, str(value)))
+
+
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
+#
+# _init_schema() creates the version-0 tables; MIGRATIONS[n] upgrades a DB
+# from version n to n + 1, tracked in PRAGMA user_version. Each step must be
+# safe to re-run after an interruption: guard DDL and keep row-by-row work
+# resumable (see _backfill_column).
+
+# Rows updated per transaction when backfilling a new column
+MIGRATION_CHUNK = 50_000
+
+# (table, ISO column) pairs that get an integer <column>_ms twin
+_MS_COLUMNS = (
+    ("sessions", "started_at"),
+    ("sessions", "last_seen_at"),
+    ("tool_calls", "started_at"),
+    ("tool_calls", "completed_at"),
+    ("hook_events", "ts"),
+    ("messages", "ts"),
+    ("errors", "ts"),
+    ("thinking_blocks", "ts"),
+    ("system_messages", "ts"),
+    ("api_metadata", "ts"),
+)
+
+
+def _db_size(conn: sqlite3.Connection) -> int:
+    """Bytes in use by the main DB file (page_count * page_size)."""
+    (pages,) = conn.execute("PRAGMA page_count").fetchone()
+    (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+    return pages * page_size
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                        (name,)).fetchone() is not None
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _backfill_column(conn: sqlite3.Connection, key: str, table: str,
+                     column: str, expr: str) -> None:
+    """
+    Set `column` = `expr` for existing rows in rowid chunks of
+    MIGRATION_CHUNK, one transaction each. The rowid reached is stored in
+    meta under `key` with every chunk, so an interrupted run resumes there.
+    """
+    (max_rowid,) = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+    cursor = int(_meta_get(conn, key) or 0)
+    if max_rowid is None or cursor >= max_rowid:
+        return
+    t0 = time.monotonic()
+    last_report = t0
+    while cursor < max_rowid:
+        upto = min(cursor + MIGRATION_CHUNK, max_rowid)
+        with transaction(conn):
+            conn.execute(f"UPDATE {table} SET {column} = {expr} WHERE rowid > ? AND rowid <= ?",
+                         (cursor, upto))
+            _meta_set(conn, key, upto)
+        cursor = upto
+        if time.monotonic() - last_report >= 2.0 or cursor >= max_rowid:
+            last_report = time.monotonic()
+            logger.info("  %s.%s: %d/%d rows (%.0f%%, %.1fs)", table, column,
+                        cursor, max_rowid, 100.0 * cursor / max_rowid, last_report - t0)
+
+
+def _migrate_epoch_ms(conn: sqlite3.Connection) -> None:
+    """Add indexed integer epoch-millisecond columns for every timestamp."""
+    for table, col in _MS_COLUMNS:
+        _add_column(conn, table, f"{col}_ms", "INTEGER")
+    conn.commit()
+    for table, col in _MS_COLUMNS:
+        _backfill_column(conn, f"migration.1.{table}.{col}", table, f"{col}_ms", f"iso_ms({col})")
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_sess_last_seen_ms ON sessions(last_seen_at_ms);
+        CREATE INDEX IF NOT EXISTS idx_tc_started_ms     ON tool_calls(started_at_ms);
+        CREATE INDEX IF NOT EXISTS idx_he_ts_ms          ON hook_events(ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_msg_ts_ms         ON messages(ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_err_ts_ms         ON errors(ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_think_ts_ms       ON thinking_blocks(ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_sysmsg_ts_ms      ON system_messages(ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_api_ts_ms         ON api_metadata(ts_ms);
+    """)
+
+
+def _migrate_session_stats(conn: sqlite3.Connection) -> None:
+    """Add the session_stats rollup table and build it from existing rows."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS session_stats (
+            session_id          TEXT PRIMARY KEY,
+            tool_calls          INTEGER NOT NULL DEFAULT 0,
+            errors              INTEGER NOT NULL DEFAULT 0,
+            total_duration_ms   INTEGER NOT NULL DEFAULT 0,
+            max_duration_ms     INTEGER,
+            input_tokens        INTEGER NOT NULL DEFAULT 0,
+            output_tokens       INTEGER NOT NULL DEFAULT 0,
+            cache_read_tokens   INTEGER NOT NULL DEFAULT 0,
+            cache_write_tokens  INTEGER NOT NULL DEFAULT 0,
+            first_ts_ms         INTEGER,
+            last_ts_ms          INTEGER,
+            models              TEXT NOT NULL DEFAULT '[]'
+        );
+    """)
+    rebuild_rollups(conn)
+
+
+def _migrate_latency_hist(conn: sqlite3.Connection) -> None:
+    """Add per-tool hourly latency histograms and fill them from tool_calls."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS latency_hist (
+            tool_name TEXT NOT NULL,
+            hour_ms   INTEGER NOT NULL,
+            bucket    INTEGER NOT NULL,
+            count     INTEGER NOT NULL,
+            PRIMARY KEY (tool_name, hour_ms, bucket)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_lh_hour ON latency_hist(hour_ms);
+    """)
+    rebuild_latency_hist(conn)
+
+
+def _migrate_search(conn: sqlite3.Connection) -> None:
+    """Add FTS5 search indexes over errors, thinking, messages and system messages."""
+    for table, columns, _ in SEARCH_KINDS.values():
+        _create_search_index(conn, table, columns)
+    rebuild_search_index(conn)
+
+
+def _convert_to_blobs(conn: sqlite3.Connection, key: str, table: str, column: str) -> None:
+    """Move long `column` values of existing rows into blobs, in resumable
+    rowid chunks like _backfill_column."""
+    (max_rowid,) = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+    cursor = int(_meta_get(conn, key) or 0)
+    t0 = last_report = time.monotonic()
+    while max_rowid is not None and cursor < max_rowid:
+        upto = min(cursor + MIGRATION_CHUNK, max_rowid)
+        with transaction(conn):
+            rows = conn.execute(f"""
+                SELECT rowid, {column} FROM {table}
+                WHERE rowid > ? AND rowid <= ? AND length({column}) >= ?
+            """, (cursor, upto, BLOB_MIN_CHARS)).fetchall()
+            texts = {}
+            updates = []
+            for rowid, value in rows:
+                h = text_hash(value)
+                texts[h] = value
+                updates.append((h, rowid))
+            put_blobs(conn, texts)
+            conn.executemany(f"UPDATE {table} SET {column} = NULL, {column}_hash = ? WHERE rowid = ?",
+                             updates)
+            _meta_set(conn, key, upto)
+        cursor = upto
+        if time.monotonic() - last_report >= 2.0 or cursor >= max_rowid:
+            last_report = time.monotonic()
+            logger.info("  %s.%s: %d/%d rows (%.0f%%, %.1fs)", table, column,
+                        cursor, max_rowid, 100.0 * cursor / max_rowid, last_report - t0)
+
+
+def _migrate_blobs(conn: sqlite3.Connection) -> None:
+    """Move large text columns into compressed, content-addressed blobs."""
+    size_before = _db_size(conn)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash BLOB PRIMARY KEY,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    for table, columns in BLOB_COLUMNS.items():
+        for c in columns:
+            _add_column(conn, table, f"{c}_hash", "BLOB")
+    # The search triggers would re-index every converted row; the affected
+    # indexes are rebuilt over the <table>_text views instead
+    indexed = [(t, cols, tuple(c for c in cols if c in BLOB_COLUMNS.get(t, ())))
+               for t, cols, _ in SEARCH_KINDS.values()]
+    indexed = [i for i in indexed if i[2]]
+    for table, _, _ in indexed:
+        _drop_search_triggers(conn, table)
+    conn.commit()
+
+    for table, columns in BLOB_COLUMNS.items():
+        for c in columns:
+            _convert_to_blobs(conn, f"migration.5.{table}.{c}", table, c)
+
+    for table, columns in BLOB_COLUMNS.items():
+        exprs = ", ".join(f"{text_sql(c)} AS {c}" for c in columns)
+        conn.execute(f"CREATE VIEW IF NOT EXISTS {table}_text AS SELECT id, {exprs} FROM {table}")
+    for table, columns, blob_columns in indexed:
+        conn.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        _create_search_index(conn, table, columns, blob_columns)
+        with transaction(conn):
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+    stats = blob_stats(conn)
+    if stats["refs"]:
+        logger.info("  %d blob(s) for %d row value(s): %.1f MB of text stored in %.1f MB "
+                    "(%.1f MB saved; run `cc-telemetry storage --vacuum` to shrink the "
+                    "%.1f MB file)", stats["blobs"], stats["refs"], stats["referenced_bytes"] / 1e6,
+                    stats["stored_bytes"] / 1e6, stats["saved_bytes"] / 1e6, size_before / 1e6)
+
+
+def _migrate_blob_refs(conn: sqlite3.Connection) -> None:
+    """Index blob references so retention can find unreferenced blobs."""
+    for table, columns in BLOB_COLUMNS.items():
+        for c in columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{c}_hash "
+                         f"ON {table}({c}_hash) WHERE {c}_hash IS NOT NULL")
+
+
+# (index, table, columns) replacing the single-column session_id / tool_name
+# indexes: a filter plus newest-first order is one index range scan, and
+# since the rowid (id) ends every index entry they also serve the (ts, id)
+# keyset order of the query_* functions
+_KEYSET_INDEXES = (
+    ("idx_tc_session_started", "tool_calls", "session_id, started_at_ms"),
+    ("idx_tc_name_started", "tool_calls", "tool_name, started_at_ms"),
+    ("idx_err_session_ts", "errors", "session_id, ts_ms"),
+    ("idx_think_session_ts", "thinking_blocks", "session_id, ts_ms"),
+    ("idx_sysmsg_session_ts", "system_messages", "session_id, ts_ms"),
+    ("idx_api_session_ts", "api_metadata", "session_id, ts_ms"),
+    ("idx_he_session_ts", "hook_events", "session_id, ts_ms"),
+)
+
+
+def _migrate_keyset_indexes(conn: sqlite3.Connection) -> None:
+    """Composite (filter, timestamp) indexes for keyset pagination."""
+    for name, table, columns in _KEYSET_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    conn.executescript("""
+        DROP INDEX IF EXISTS idx_tc_session;
+        DROP INDEX IF EXISTS idx_tc_name;
+        DROP INDEX IF EXISTS idx_err_session;
+        DROP INDEX IF EXISTS idx_think_session;
+        DROP INDEX IF EXISTS idx_sysmsg_session;
+        DROP INDEX IF EXISTS idx_api_session;
+    """)
+
+
+def _migrate_hook_log(conn: sqlite3.Connection) -> None:
+    """Add hook_log: events reported by the plugin's own hooks."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS hook_log (
+            id              INTEGER PRIMARY KEY,
+            event_id        TEXT UNIQUE,
+            session_id      TEXT,
+            event           TEXT NOT NULL,
+            tool            TEXT,
+            skill           TEXT,
+            status          TEXT,
+            duration_ms     INTEGER,
+            agent_name      TEXT,
+            span_id         TEXT,
+            parent_span_id  TEXT,
+            meta            TEXT,
+            ts              TEXT,
+            ts_ms           INTEGER,
+            source          TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_hl_session_ts ON hook_log(session_id, ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_hl_ts_ms      ON hook_log(ts_ms);
+    """)
+
+
+def _migrate_tool_spans(conn: sqlite3.Connection) -> None:
+    """Add tool_spans (PreToolUse -> PostToolUse pairs) and hook_log.tool_use_id."""
+    _add_column(conn, "hook_log", "tool_use_id", "TEXT")
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_hl_tool_use ON hook_log(tool_use_id)
+            WHERE tool_use_id IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS tool_spans (
+            id          INTEGER PRIMARY KEY,
+            session_id  TEXT,
+            tool        TEXT,
+            tool_use_id TEXT,
+            pre_id      INTEGER UNIQUE,
+            post_id     INTEGER UNIQUE,
+            started_ms  INTEGER,
+            ended_ms    INTEGER,
+            duration_ms INTEGER,
+            status      TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_span_session_started ON tool_spans(session_id, started_ms);
+        CREATE INDEX IF NOT EXISTS idx_span_tool_started    ON tool_spans(tool, started_ms);
+        CREATE INDEX IF NOT EXISTS idx_span_started         ON tool_spans(started_ms);
+    """)
+    pair_tool_spans(conn)
+
+
+def _migrate_hook_events_keyset(conn: sqlite3.Connection) -> None:
+    """The hook_events keyset index (added to _KEYSET_INDEXES after that
+    migration had run on existing DBs)."""
+    _migrate_keyset_indexes(conn)
+    conn.execute("DROP INDEX IF EXISTS idx_he_session")
+
+
+def _migrate_hook_log_ids(conn: sqlite3.Connection) -> None:
+    """Never reuse hook_log ids (AUTOINCREMENT): tool_spans, kept longer,
+    refers to them by id, and retention can empty the table."""
+    cols = ", ".join(r["name"] for r in conn.execute("PRAGMA table_info(hook_log)"))
+    conn.executescript(f"""
+        BEGIN;
+        CREATE TABLE hook_log_new (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id        TEXT UNIQUE,
+            session_id      TEXT,
+            event           TEXT NOT NULL,
+            tool            TEXT,
+            skill           TEXT,
+            status          TEXT,
+            duration_ms     INTEGER,
+            agent_name      TEXT,
+            span_id         TEXT,
+            parent_span_id  TEXT,
+            meta            TEXT,
+            ts              TEXT,
+            ts_ms           INTEGER,
+            source          TEXT NOT NULL,
+            tool_use_id     TEXT
+        );
+        INSERT INTO hook_log_new({cols}) SELECT {cols} FROM hook_log ORDER BY id;
+        DROP TABLE hook_log;
+        ALTER TABLE hook_log_new RENAME TO hook_log;
+        CREATE INDEX idx_hl_session_ts ON hook_log(session_id, ts_ms);
+        CREATE INDEX idx_hl_ts_ms      ON hook_log(ts_ms);
+        CREATE INDEX idx_hl_tool_use   ON hook_log(tool_use_id) WHERE tool_use_id IS NOT NULL;
+
+        -- Ids of rows already pruned may live on in tool_spans: start above them
+        INSERT INTO sqlite_sequence(name, seq)
+            SELECT 'hook_log', 0 WHERE NOT EXISTS
+                (SELECT 1 FROM sqlite_sequence WHERE name = 'hook_log');
+        UPDATE sqlite_sequence SET seq = MAX(seq,
+            (SELECT COALESCE(MAX(pre_id), 0) FROM tool_spans),
+            (SELECT COALESCE(MAX(post_id), 0) FROM tool_spans))
+        WHERE name = 'hook_log';
+        COMMIT;
+    """)
+
+
+MIGRATIONS = [
+    _migrate_epoch_ms,
+    _migrate_session_stats,
+    _migrate_latency_hist,
+    _migrate_search,
+    _migrate_blobs,
+    _migrate_blob_refs,
+    _migrate_keyset_indexes,
+    _migrate_hook_log,
+    _migrate_tool_spans,
+    _migrate_hook_events_keyset,
+    _migrate_hook_log_ids,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to SCHEMA_VERSION, one recorded step at a time."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for n in range(version, SCHEMA_VERSION):
+        step = MIGRATIONS[n]
+        logger.info("Migrating DB schema to version %d: %s", n + 1,
+                    (step.__doc__ or step.__name__).strip().splitlines()[0])
+        t0 = time.monotonic()
+        step(conn)
+        conn.execute("DELETE FROM meta WHERE key LIKE ?", (f"migration.{n + 1}.%",))
+        conn.execute(f"PRAGMA user_version = {n + 1}")
+        conn.commit()
+        logger.info("Schema version %d ready (%.1fs)", n + 1, time.monotonic() - t0)
+
+
+# ---------------------------------------------------------------------------
+# Transactions
+# ---------------------------------------------------------------------------
+
+# Open transaction depth per connection (keyed by id(conn)). While a
+# connection is inside transaction(), the write helpers below skip their
+# per-row commit so everything lands atomically.
+_txn_depth: dict[int, int] = {}
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Group writes into one atomic commit. Nested blocks join the outer one."""
+    key = id(conn)
+    depth = _txn_depth.get(key, 0)
+    _txn_depth[key] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    else:
+        if depth == 0:
+            conn.commit()
+    finally:
+        if depth == 0:
+            _txn_depth.pop(key, None)
+        else:
+            _txn_depth[key] = depth
+
+
+def _commit(conn: sqlite3.Connection) -> None:
+    if not _txn_depth.get(id(conn)):
+        conn.commit()
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed text
+# ---------------------------------------------------------------------------
+#
+# Large, often repeated text (thinking, tool inputs, skill-load messages) is
+# stored once in `blobs`, zlib-compressed and keyed by its BLAKE2b-128 hash.
+# The row keeps NULL in the text column and the hash in <column>_hash; short
+# values stay inline. query_* functions return the text transparently, and
+# the <table>_text views (id + text columns) do the same for SQL run on a
+# connection from open_db()/open_readonly(), which register inflate().
+
+# Text columns that may live in blobs
+BLOB_COLUMNS = {
+    "tool_calls": ("input_json",),
+    "errors": ("tool_input_full", "thinking_before"),
+    "thinking_blocks": ("thinking_content",),
+    "system_messages": ("content",),
+}
+
+# Values shorter than this (in characters) are kept inline
+BLOB_MIN_CHARS = 256
+
+BLOB_COMPRESS_LEVEL = 6
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def inflate(data: Optional[bytes]) -> Optional[str]:
+    """Decompress a blobs.data value (also registered as SQL inflate())."""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode("utf-8")
+
+
+def text_sql(column: str, alias: str = "") -> str:
+    """SQL expression for the full text of a blob-backed column."""
+    a = f"{alias}." if alias else ""
+    return (f"COALESCE({a}{column}, "
+            f"(SELECT inflate(data) FROM blobs WHERE hash = {a}{column}_hash))")
+
+
+def put_blobs(conn: sqlite3.Connection, texts: dict[bytes, str]) -> int:
+    """Store {hash: text}; only texts not already present are compressed.
+    Returns the number of new blobs."""
+    missing = set(texts)
+    keys = list(texts)
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        missing.difference_update(
+            r[0] for r in conn.execute(f"SELECT hash FROM blobs WHERE hash IN ({marks})", chunk))
+    rows = []
+    for h in missing:
+        raw = texts[h].encode("utf-8")
+        rows.append((h, len(raw), zlib.compress(raw, BLOB_COMPRESS_LEVEL)))
+    conn.executemany("INSERT OR IGNORE INTO blobs(hash, size, data) VALUES(?, ?, ?)", rows)
+    return len(rows)
+
+
+def load_blobs(conn: sqlite3.Connection, hashes) -> dict[bytes, str]:
+    """{hash: text} for the given hashes."""
+    keys = list(hashes)
+    out = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for h, data in conn.execute(f"SELECT hash, data FROM blobs WHERE hash IN ({marks})", chunk):
+            out[h] = inflate(data)
+    return out
+
+
+def _stash_blobs(conn: sqlite3.Connection, table: str, rows: list[tuple]) -> list[tuple]:
+    """
+    Move long values out of insert parameter tuples into blobs. Each value
+    at a position in _BLOB_PARAMS[table] is replaced by NULL if stored, and
+    the hashes (or NULL) are appended to the tuple in the same order.
+    """
+    positions = _BLOB_PARAMS[table]
+    texts: dict[bytes, str] = {}
+    out = []
+    for row in rows:
+        row = list(row)
+        hashes = []
+        for i in positions:
+            value = row[i]
+            if value is not None and len(value) >= BLOB_MIN_CHARS:
+                h = text_hash(value)
+                texts[h] = value
+                row[i] = None
+                hashes.append(h)
+            else:
+                hashes.append(None)
+        out.append((*row, *hashes))
+    if texts:
+        put_blobs(conn, texts)
+    return out
+
+
+def with_text(conn: sqlite3.Connection, table: str, rows) -> list[dict]:
+    """Rows as dicts with blob-backed columns filled in and *_hash dropped."""
+    out = [dict(r) for r in rows]
+    columns = BLOB_COLUMNS.get(table, ())
+    hashes = {r[f"{c}_hash"] for r in out for c in columns if r.get(f"{c}_hash")}
+    texts = load_blobs(conn, hashes) if hashes else {}
+    for r in out:
+        for c in columns:
+            h = r.pop(f"{c}_hash", None)
+            if h is not None:
+                r[c] = texts.get(h)
+    return out
+
+
+def drop_unreferenced_blobs(conn: sqlite3.Connection, hashes) -> int:
+    """Delete those of `hashes` that no row references any more."""
+    refs = " OR ".join(
+        f"EXISTS (SELECT 1 FROM {t} WHERE {c}_hash = blobs.hash)"
+        for t, cols in BLOB_COLUMNS.items() for c in cols
+    )
+    keys = list(hashes)
+    dropped = 0
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        dropped += conn.execute(
+            f"DELETE FROM blobs WHERE hash IN ({marks}) AND NOT ({refs})", chunk).rowcount
+    return dropped
+
+
+def blob_stats(conn: sqlite3.Connection) -> dict:
+    """
+    Space used by blob-backed text: `referenced_bytes` is what the rows
+    would hold inline (duplicates counted each time), `unique_bytes` the
+    distinct texts and `stored_bytes` their compressed size.
+    """
+    blobs, unique_bytes, stored_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0) FROM blobs"
+    ).fetchone()
+    refs = referenced = 0
+    columns = {}
+    for table, cols in BLOB_COLUMNS.items():
+        for c in cols:
+            n, size = conn.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM(b.size), 0)
+                FROM {table} t JOIN blobs b ON b.hash = t.{c}_hash
+            """).fetchone()
+            columns[f"{table}.{c}"] = {"refs": n, "bytes": size}
+            refs += n
+            referenced += size
+    return {
+        "blobs": blobs,
+        "refs": refs,
+        "referenced_bytes": referenced,
+        "unique_bytes": unique_bytes,
+        "stored_bytes": stored_bytes,
+        "saved_bytes": referenced - stored_bytes,
+        "columns": columns,
+    }
+
+
 # ---------------------------------------------------------------------------
 # Write operations
 # ---------------------------------------------------------------------------
 
-def upsert_session(conn: sqlite3.Connection, entry: dict) -> None:
+# Timestamps are written twice: the ISO string as received and an integer
+# epoch-millisecond *_ms column (computed by iso_ms(), see open_db) that
+# queries filter, sort and bucket on.
+
+_SQL_UPSERT_SESSION = """
+    INSERT INTO sessions(session_id, slug, project_hash, transcript_path, cwd,
+                         started_at, last_seen_at, version, started_at_ms, last_seen_at_ms)
+    VALUES(?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, iso_ms(?6), iso_ms(?7))
+    ON CONFLICT(session_id) DO UPDATE SET
+        slug=COALESCE(sessions.slug, excluded.slug),
+        project_hash=COALESCE(sessions.project_hash, excluded.project_hash),
+        transcript_path=COALESCE(sessions.transcript_path, excluded.transcript_path),
+        cwd=COALESCE(sessions.cwd, excluded.cwd),
+        version=COALESCE(sessions.version, excluded.version),
+        started_at=CASE WHEN excluded.started_at_ms < COALESCE(sessions.started_at_ms, excluded.started_at_ms + 1)
+                        THEN excluded.started_at ELSE COALESCE(sessions.started_at, excluded.started_at) END,
+        started_at_ms=MIN(COALESCE(sessions.started_at_ms, excluded.started_at_ms),
+                          COALESCE(excluded.started_at_ms, sessions.started_at_ms)),
+        last_seen_at=CASE WHEN excluded.last_seen_at_ms > COALESCE(sessions.last_seen_at_ms, -1)
+                          THEN excluded.last_seen_at ELSE sessions.last_seen_at END,
+        last_seen_at_ms=MAX(COALESCE(sessions.last_seen_at_ms, excluded.last_seen_at_ms),
+                            COALESCE(excluded.last_seen_at_ms, sessions.last_seen_at_ms))
+"""
+
+_SQL_INSERT_TOOL_CALL = """
+    INSERT OR IGNORE INTO tool_calls(session_id, tool_use_id, tool_name, input_json,
+                                     started_at, started_at_ms, input_json_hash)
+    VALUES(?1, ?2, ?3, ?4, ?5, iso_ms(?5), ?6)
+"""
+
+_SQL_COMPLETE_TOOL_CALL = """
+    UPDATE tool_calls
+    SET result_preview=?1, result_is_error=?2, completed_at=?3, completed_at_ms=iso_ms(?3),
+        duration_ms=?4
+    WHERE tool_use_id=?5
+"""
+
+_SQL_INSERT_HOOK_EVENT = """
+    INSERT INTO hook_events(session_id, tool_use_id, hook_event, hook_name, command, ts, ts_ms)
+    VALUES(?1, ?2, ?3, ?4, ?5, ?6, iso_ms(?6))
+"""
+
+_SQL_INSERT_MESSAGE = """
+    INSERT OR IGNORE INTO messages(session_id, uuid, role, content_type, text_preview, ts, ts_ms)
+    VALUES(?1, ?2, ?3, ?4, ?5, ?6, iso_ms(?6))
+"""
+
+_SQL_INSERT_ERROR = """
+    INSERT INTO errors(
+        session_id, tool_use_id, error_message, stack_trace,
+        tool_input_full, context_tool_calls, thinking_before,
+        recovery_attempted, ts, ts_ms, tool_input_full_hash, thinking_before_hash
+    ) VALUES(?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, iso_ms(?9), ?10, ?11)
+"""
+
+_SQL_INSERT_THINKING_BLOCK = """
+    INSERT INTO thinking_blocks(
+        session_id, message_uuid, thinking_content, tokens, led_to_error, ts, ts_ms,
+        thinking_content_hash
+    ) VALUES(?1, ?2, ?3, ?4, ?5, ?6, iso_ms(?6), ?7)
+"""
+
+_SQL_INSERT_SYSTEM_MESSAGE = """
+    INSERT INTO system_messages(session_id, message_uuid, message_type, content, ts, ts_ms,
+                                content_hash)
+    VALUES(?1, ?2, ?3, ?4, ?5, iso_ms(?5), ?6)
+"""
+
+# Parameter positions of BLOB_COLUMNS in the insert tuples above; their
+# hashes are bound after the other parameters (see _stash_blobs)
+_BLOB_PARAMS = {
+    "tool_calls": (3,),
+    "errors": (4, 6),
+    "thinking_blocks": (2,),
+    "system_messages": (3,),
+}
+
+_SQL_INSERT_API_METADATA = """
+    INSERT INTO api_metadata(
+        session_id, message_uuid, request_id, model,
+        input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, ts, ts_ms
+    ) VALUES(?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, iso_ms(?9))
+"""
+
+# origin only moves when the file was replaced: it marks where live tailing
+# of this inode began, and backfill never imports past it.
+_SQL_SAVE_CHECKPOINT = """
+    INSERT INTO ingest_checkpoints(transcript_path, inode, offset, origin, parser_state, updated_at)
+    VALUES(?, ?, ?, ?, ?, ?)
+    ON CONFLICT(transcript_path) DO UPDATE SET
+        origin=CASE WHEN ingest_checkpoints.inode = excluded.inode
+                    THEN ingest_checkpoints.origin ELSE excluded.origin END,
+        inode=excluded.inode, offset=excluded.offset,
+        parser_state=excluded.parser_state, updated_at=excluded.updated_at
+"""
+
+
+def _session_params(entry: dict) -> Optional[tuple]:
     session_id = entry.get("sessionId")
     if not session_id:
-        return
+        return None
     ts = entry.get("timestamp")
-    conn.execute("""
-        INSERT INTO sessions(session_id, slug, project_hash, transcript_path, cwd, started_at, last_seen_at, version)
-        VALUES(?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(session_id) DO UPDATE SET last_seen_at=excluded.last_seen_at
-    """, (
+    return (
         session_id,
         entry.get("slug"),
         entry.get("project_hash"),
@@ -168,8 +1023,29 @@ def upsert_session(conn: sqlite3.Connection, entry: dict) -> None:
         ts,
         ts,
         entry.get("version"),
-    ))
-    conn.commit()
+    )
+
+
+def _merge_session(row: list, params: tuple) -> None:
+    """Fold a later sighting of a session into its queued row: fill fields
+    still unknown and widen started_at/last_seen_at."""
+    for i in (1, 2, 3, 4, 7):  # slug, project_hash, transcript_path, cwd, version
+        if row[i] is None:
+            row[i] = params[i]
+    started, first = ts_ms(params[5]), ts_ms(row[5])
+    if started is not None and (first is None or started < first):
+        row[5] = params[5]
+    seen, last = ts_ms(params[6]), ts_ms(row[6])
+    if seen is not None and (last is None or seen > last):
+        row[6] = params[6]
+
+
+def upsert_session(conn: sqlite3.Connection, entry: dict) -> None:
+    params = _session_params(entry)
+    if params is None:
+        return
+    conn.execute(_SQL_UPSERT_SESSION, params)
+    _commit(conn)
 
 
 def insert_tool_call(
@@ -180,11 +1056,9 @@ def insert_tool_call(
     input_json: str,
     started_at: str,
 ) -> None:
-    conn.execute("""
-        INSERT OR IGNORE INTO tool_calls(session_id, tool_use_id, tool_name, input_json, started_at)
-        VALUES(?, ?, ?, ?, ?)
-    """, (session_id, tool_use_id, tool_name, input_json, started_at))
-    conn.commit()
+    conn.execute(_SQL_INSERT_TOOL_CALL, *_stash_blobs(conn, "tool_calls", [
+        (session_id, tool_use_id, tool_name, input_json, started_at)]))
+    _commit(conn)
 
 
 def complete_tool_call(
@@ -195,12 +1069,9 @@ def complete_tool_call(
     completed_at: str,
     duration_ms: Optional[int],
 ) -> None:
-    conn.execute("""
-        UPDATE tool_calls
-        SET result_preview=?, result_is_error=?, completed_at=?, duration_ms=?
-        WHERE tool_use_id=?
-    """, (result_preview, 1 if is_error else 0, completed_at, duration_ms, tool_use_id))
-    conn.commit()
+    conn.execute(_SQL_COMPLETE_TOOL_CALL,
+                 (result_preview, 1 if is_error else 0, completed_at, duration_ms, tool_use_id))
+    _commit(conn)
 
 
 def insert_hook_event(
@@ -212,11 +1083,9 @@ def insert_hook_event(
     command: Optional[str],
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT INTO hook_events(session_id, tool_use_id, hook_event, hook_name, command, ts)
-        VALUES(?, ?, ?, ?, ?, ?)
-    """, (session_id, tool_use_id, hook_event, hook_name, command, ts))
-    conn.commit()
+    conn.execute(_SQL_INSERT_HOOK_EVENT,
+                 (session_id, tool_use_id, hook_event, hook_name, command, ts))
+    _commit(conn)
 
 
 def insert_message(
@@ -228,11 +1097,9 @@ def insert_message(
     text_preview: Optional[str],
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT OR IGNORE INTO messages(session_id, uuid, role, content_type, text_preview, ts)
-        VALUES(?, ?, ?, ?, ?, ?)
-    """, (session_id, uuid, role, content_type, text_preview, ts))
-    conn.commit()
+    conn.execute(_SQL_INSERT_MESSAGE,
+                 (session_id, uuid, role, content_type, text_preview, ts))
+    _commit(conn)
 
 
 def insert_error(
@@ -247,18 +1114,12 @@ def insert_error(
     recovery_attempted: bool,
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT INTO errors(
-            session_id, tool_use_id, error_message, stack_trace,
-            tool_input_full, context_tool_calls, thinking_before,
-            recovery_attempted, ts
-        ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    conn.execute(_SQL_INSERT_ERROR, *_stash_blobs(conn, "errors", [(
         session_id, tool_use_id, error_message, stack_trace,
         tool_input_full, context_tool_calls, thinking_before,
         1 if recovery_attempted else 0, ts
-    ))
-    conn.commit()
+    )]))
+    _commit(conn)
 
 
 def insert_thinking_block(
@@ -270,12 +1131,9 @@ def insert_thinking_block(
     led_to_error: bool,
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT INTO thinking_blocks(
-            session_id, message_uuid, thinking_content, tokens, led_to_error, ts
-        ) VALUES(?, ?, ?, ?, ?, ?)
-    """, (session_id, message_uuid, thinking_content, tokens, 1 if led_to_error else 0, ts))
-    conn.commit()
+    conn.execute(_SQL_INSERT_THINKING_BLOCK, *_stash_blobs(conn, "thinking_blocks", [
+        (session_id, message_uuid, thinking_content, tokens, 1 if led_to_error else 0, ts)]))
+    _commit(conn)
 
 
 def insert_system_message(
@@ -286,11 +1144,9 @@ def insert_system_message(
     content: str,
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT INTO system_messages(session_id, message_uuid, message_type, content, ts)
-        VALUES(?, ?, ?, ?, ?)
-    """, (session_id, message_uuid, message_type, content, ts))
-    conn.commit()
+    conn.execute(_SQL_INSERT_SYSTEM_MESSAGE, *_stash_blobs(conn, "system_messages", [
+        (session_id, message_uuid, message_type, content, ts)]))
+    _commit(conn)
 
 
 def insert_api_metadata(
@@ -305,43 +1161,1078 @@ def insert_api_metadata(
     cache_write_tokens: Optional[int],
     ts: str,
 ) -> None:
-    conn.execute("""
-        INSERT INTO api_metadata(
-            session_id, message_uuid, request_id, model,
-            input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, ts
-        ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    conn.execute(_SQL_INSERT_API_METADATA, (
         session_id, message_uuid, request_id, model,
         input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, ts
     ))
+    _commit(conn)
+
+
+def save_checkpoint(
+    conn: sqlite3.Connection,
+    transcript_path: str,
+    inode: int,
+    offset: int,
+    parser_state: Optional[str],
+    origin: int = 0,
+) -> None:
+    """Record how far a transcript has been ingested (see load_checkpoints)."""
+    conn.execute(_SQL_SAVE_CHECKPOINT, (transcript_path, inode, offset, origin, parser_state,
+                                        datetime.now(timezone.utc).isoformat()))
+    _commit(conn)
+
+
+def delete_checkpoint(conn: sqlite3.Connection, transcript_path: str) -> None:
+    conn.execute("DELETE FROM ingest_checkpoints WHERE transcript_path=?", (transcript_path,))
+    _commit(conn)
+
+
+# ---------------------------------------------------------------------------
+# Session rollups
+# ---------------------------------------------------------------------------
+#
+# session_stats holds per-session aggregates so listings don't scan
+# tool_calls/api_metadata. WriteBatch.flush() applies deltas in the same
+# transaction as the rows; rebuild_rollups() recomputes from scratch.
+#
+# Retention deletes raw rows the rollups still count. Each table's GC
+# watermark (meta gc.<table>.watermark, the newest timestamp retention has
+# deleted) marks where recounting stops being possible: the rebuilds leave
+# sessions and latency_hist hours reaching back to it as they are.
+
+
+def gc_watermark(conn: sqlite3.Connection, table: str) -> Optional[int]:
+    """Newest timestamp retention has deleted from `table`, if any."""
+    value = _meta_get(conn, f"gc.{table}.watermark")
+    return int(value) if value is not None else None
+
+
+def record_gc_watermark(conn: sqlite3.Connection, table: str, ts: int) -> None:
+    """Advance `table`'s GC watermark to `ts` (call in the deleting transaction)."""
+    current = gc_watermark(conn, table)
+    if current is None or ts > current:
+        _meta_set(conn, f"gc.{table}.watermark", ts)
+
+_SQL_APPLY_ROLLUP = """
+    INSERT INTO session_stats(session_id, tool_calls, errors, total_duration_ms, max_duration_ms,
+                              input_tokens, output_tokens, cache_read_tokens, cache_write_tokens,
+                              first_ts_ms, last_ts_ms, models)
+    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        tool_calls=tool_calls + excluded.tool_calls,
+        errors=errors + excluded.errors,
+        total_duration_ms=total_duration_ms + excluded.total_duration_ms,
+        max_duration_ms=MAX(COALESCE(session_stats.max_duration_ms, excluded.max_duration_ms),
+                            COALESCE(excluded.max_duration_ms, session_stats.max_duration_ms)),
+        input_tokens=input_tokens + excluded.input_tokens,
+        output_tokens=output_tokens + excluded.output_tokens,
+        cache_read_tokens=cache_read_tokens + excluded.cache_read_tokens,
+        cache_write_tokens=cache_write_tokens + excluded.cache_write_tokens,
+        first_ts_ms=MIN(COALESCE(session_stats.first_ts_ms, excluded.first_ts_ms),
+                        COALESCE(excluded.first_ts_ms, session_stats.first_ts_ms)),
+        last_ts_ms=MAX(COALESCE(session_stats.last_ts_ms, excluded.last_ts_ms),
+                       COALESCE(excluded.last_ts_ms, session_stats.last_ts_ms)),
+        models=CASE WHEN excluded.models = '[]' THEN session_stats.models ELSE (
+            SELECT json_group_array(value) FROM (
+                SELECT value FROM json_each(session_stats.models)
+                UNION SELECT value FROM json_each(excluded.models)
+            )
+        ) END
+"""
+
+_SQL_REBUILD_ROLLUPS = """
+    INSERT INTO session_stats(session_id, tool_calls, errors, total_duration_ms, max_duration_ms,
+                              input_tokens, output_tokens, cache_read_tokens, cache_write_tokens,
+                              first_ts_ms, last_ts_ms, models)
+    SELECT s.session_id,
+           COALESCE(tc.n, 0), COALESCE(tc.errors, 0), COALESCE(tc.total_ms, 0), tc.max_ms,
+           COALESCE(am.input_tokens, 0), COALESCE(am.output_tokens, 0),
+           COALESCE(am.cache_read_tokens, 0), COALESCE(am.cache_write_tokens, 0),
+           s.started_at_ms, s.last_seen_at_ms, COALESCE(am.models, '[]')
+    FROM sessions s
+    LEFT JOIN (
+        SELECT session_id, COUNT(*) AS n, SUM(result_is_error) AS errors,
+               SUM(COALESCE(duration_ms, 0)) AS total_ms, MAX(duration_ms) AS max_ms
+        FROM tool_calls {where} GROUP BY session_id
+    ) tc ON tc.session_id = s.session_id
+    LEFT JOIN (
+        SELECT session_id,
+               SUM(COALESCE(input_tokens, 0)) AS input_tokens,
+               SUM(COALESCE(output_tokens, 0)) AS output_tokens,
+               SUM(COALESCE(cache_read_tokens, 0)) AS cache_read_tokens,
+               SUM(COALESCE(cache_write_tokens, 0)) AS cache_write_tokens,
+               json_group_array(DISTINCT model) FILTER (WHERE model IS NOT NULL) AS models
+        FROM api_metadata {where} GROUP BY session_id
+    ) am ON am.session_id = s.session_id
+    {s_where}
+"""
+
+
+def rebuild_rollups(conn: sqlite3.Connection, session_ids: Optional[list[str]] = None) -> int:
+    """
+    Recompute session_stats from the base tables, for `session_ids` or for
+    every session (which also rebuilds latency_hist). Returns the number of
+    sessions rebuilt.
+
+    Sessions that started by the tool_calls or api_metadata GC
+    watermark and already have a rollup keep it: their pruned rows can no
+    longer be recounted.
+    """
+    watermarks = [w for w in (gc_watermark(conn, "tool_calls"),
+                              gc_watermark(conn, "api_metadata")) if w is not None]
+    frozen = []
+    if watermarks:
+        frozen = [r[0] for r in conn.execute("""
+            SELECT st.session_id FROM session_stats st JOIN sessions s USING(session_id)
+            WHERE COALESCE(s.started_at_ms, 0) <= ?
+        """, (max(watermarks),)) if session_ids is None or r[0] in session_ids]
+    params = {"ids": json.dumps(list(session_ids or [])), "frozen": json.dumps(frozen)}
+    clauses = ["session_id NOT IN (SELECT value FROM json_each(:frozen))"]
+    if session_ids is not None:
+        clauses.append("session_id IN (SELECT value FROM json_each(:ids))")
+    where = ("WHERE session_id IN (SELECT value FROM json_each(:ids))"
+             if session_ids is not None else "")
+    s_where = "WHERE " + " AND ".join(f"s.{c}" for c in clauses)
+    with transaction(conn):
+        conn.execute(f"DELETE FROM session_stats WHERE {' AND '.join(clauses)}", params)
+        cur = conn.execute(_SQL_REBUILD_ROLLUPS.format(where=where, s_where=s_where), params)
+        if session_ids is None and _table_exists(conn, "latency_hist"):
+            rebuild_latency_hist(conn)
+    if frozen:
+        logger.info("Kept the rollups of %d session(s) with rows removed by retention",
+                    len(frozen))
+    return cur.rowcount
+
+
+class _RollupDelta:
+    """Per-session increments for one WriteBatch flush."""
+
+    def __init__(self):
+        self.sessions: dict[str, list] = {}
+        self.latency: dict[tuple, int] = {}  # latency_hist key -> count
+        self._calls: dict[str, str] = {}  # tool_use_id -> session_id, for completions
+
+    def _row(self, session_id: str) -> list:
+        row = self.sessions.get(session_id)
+        if row is None:
+            # tool_calls, errors, total_ms, max_ms, in, out, cache_read, cache_write,
+            # first_ts_ms, last_ts_ms, models
+            row = self.sessions[session_id] = [0, 0, 0, None, 0, 0, 0, 0, None, None, set()]
+        return row
+
+    def add_sessions(self, session_rows) -> None:
+        for r in session_rows:
+            row = self._row(r[0])
+            first, last = ts_ms(r[5]), ts_ms(r[6])
+            if first is not None and (row[8] is None or first < row[8]):
+                row[8] = first
+            if last is not None and (row[9] is None or last > row[9]):
+                row[9] = last
+
+    def add_tool_calls(self, conn: sqlite3.Connection, rows: list[tuple]) -> None:
+        """Count calls that are not in the DB yet (run before the INSERT OR IGNORE)."""
+        if not rows:
+            return
+        ids = [r[1] for r in rows]
+        existing = {r[0] for r in conn.execute(
+            "SELECT tool_use_id FROM tool_calls WHERE tool_use_id IN "
+            "(SELECT value FROM json_each(?))", (json.dumps(ids),))}
+        for r in rows:
+            if r[1] in existing or r[1] in self._calls:
+                continue
+            self._calls[r[1]] = r[0]
+            self._row(r[0])[0] += 1
+
+    def add_completions(self, conn: sqlite3.Connection, rows: list[tuple]) -> None:
+        """Count first completions only (run after the tool-call INSERT, before the UPDATE)."""
+        if not rows:
+            return
+        ids = [r[4] for r in rows]
+        open_calls = {r[0]: (r[1], r[2]) for r in conn.execute(
+            "SELECT tool_use_id, session_id, tool_name FROM tool_calls WHERE completed_at IS NULL "
+            "AND tool_use_id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))}
+        for _, is_error, completed_at, duration_ms, tool_use_id in rows:
+            call = open_calls.pop(tool_use_id, None)
+            if call is None:
+                continue
+            session_id, tool_name = call
+            row = self._row(session_id)
+            row[1] += is_error
+            if duration_ms is not None:
+                row[2] += duration_ms
+                row[3] = duration_ms if row[3] is None else max(row[3], duration_ms)
+                key = _hist_key(tool_name, completed_at, duration_ms)
+                self.latency[key] = self.latency.get(key, 0) + 1
+
+    def add_api_metadata(self, rows: list[tuple]) -> None:
+        for session_id, _, _, model, inp, out, cache_read, cache_write, _ in rows:
+            row = self._row(session_id)
+            row[4] += inp or 0
+            row[5] += out or 0
+            row[6] += cache_read or 0
+            row[7] += cache_write or 0
+            if model:
+                row[10].add(model)
+
+    def write(self, conn: sqlite3.Connection) -> None:
+        if self.sessions:
+            conn.executemany(_SQL_APPLY_ROLLUP, [
+                (sid, *row[:10], json.dumps(sorted(row[10])))
+                for sid, row in self.sessions.items()
+            ])
+        if self.latency:
+            conn.executemany(_SQL_ADD_LATENCY, [(*k, n) for k, n in self.latency.items()])
+
+
+# ---------------------------------------------------------------------------
+# Latency histograms
+# ---------------------------------------------------------------------------
+#
+# latency_hist counts completed tool calls per (tool, hour, bucket). Buckets
+# are log-linear (HDR-style): each power of two is split into
+# HIST_SUB_BUCKETS equal steps, so any duration is placed within ~6% of its
+# value and percentiles over any hour range merge a few hundred counters
+# instead of reading raw rows. Bucket 0 holds durations under 1 ms.
+
+HIST_SUB_BUCKETS = 8
+HOUR_MS = 3_600_000
+
+_SQL_ADD_LATENCY = """
+    INSERT INTO latency_hist(tool_name, hour_ms, bucket, count) VALUES(?, ?, ?, ?)
+    ON CONFLICT(tool_name, hour_ms, bucket) DO UPDATE SET count=count + excluded.count
+"""
+
+
+def latency_bucket(duration_ms: int) -> int:
+    """Histogram bucket index for a duration."""
+    ms = int(duration_ms)
+    if ms < 1:
+        return 0
+    exp = ms.bit_length() - 1
+    sub = ((ms * HIST_SUB_BUCKETS) >> exp) - HIST_SUB_BUCKETS
+    return 1 + exp * HIST_SUB_BUCKETS + sub
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative duration (midpoint) of a bucket."""
+    if bucket <= 0:
+        return 0.0
+    exp, sub = divmod(bucket - 1, HIST_SUB_BUCKETS)
+    low = (1 + sub / HIST_SUB_BUCKETS) * 2 ** exp
+    high = (1 + (sub + 1) / HIST_SUB_BUCKETS) * 2 ** exp
+    return (low + high) / 2
+
+
+def _hist_key(tool_name: str, completed_at: Optional[str], duration_ms: int) -> tuple:
+    at = ts_ms(completed_at) or 0
+    return (tool_name, at - at % HOUR_MS, latency_bucket(max(duration_ms, 0)))
+
+
+def rebuild_latency_hist(conn: sqlite3.Connection) -> int:
+    """Recompute latency_hist from tool_calls. Returns the calls counted.
+
+    Hours up to the end of the one holding the tool_calls GC watermark are
+    kept as they are; only later hours, whose calls all survive (but for
+    ones running across that boundary), are recounted."""
+    watermark = gc_watermark(conn, "tool_calls")
+    keep_before = watermark - watermark % HOUR_MS + HOUR_MS if watermark is not None else None
+    counts: dict[tuple, int] = {}
+    total = 0
+    rows = conn.execute("""
+        SELECT tool_name, completed_at, duration_ms FROM tool_calls
+        WHERE duration_ms IS NOT NULL
+    """)
+    for tool_name, completed_at, duration_ms in rows:
+        key = _hist_key(tool_name, completed_at, duration_ms)
+        if keep_before is not None and key[1] < keep_before:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        total += 1
+    with transaction(conn):
+        conn.execute("DELETE FROM latency_hist WHERE hour_ms >= ?", (keep_before or 0,))
+        conn.executemany(_SQL_ADD_LATENCY, [(*k, n) for k, n in counts.items()])
+    return total
+
+
+def _percentiles(buckets: list[tuple[int, int]], quantiles) -> dict:
+    """Quantile values from sorted (bucket, count) pairs."""
+    total = sum(n for _, n in buckets)
+    out = {}
+    for q in quantiles:
+        target = q * total
+        seen = 0
+        value = None
+        for bucket, n in buckets:
+            seen += n
+            if seen >= target:
+                value = bucket_value(bucket)
+                break
+        out[q] = round(value, 1) if value is not None else None
+    return out
+
+
+def query_latency_percentiles(
+    conn: sqlite3.Connection,
+    tool: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    quantiles=(0.5, 0.95, 0.99),
+) -> list[dict]:
+    """
+    Per-tool latency percentiles from the histograms; `since`/`until` are
+    epoch ms, rounded to whole hours. Returns [{tool_name, count,
+    max_bucket_ms, quantiles: {q: ms}}] ordered by call count.
+
+    The histograms keep no exact values, so max_bucket_ms is the midpoint
+    of the highest occupied bucket, within ~6% of the real maximum.
+    """
+    clauses, params = [], []
+    if tool:
+        clauses.append("tool_name = ?")
+        params.append(tool)
+    if since is not None:
+        clauses.append("hour_ms >= ?")
+        params.append(since - since % HOUR_MS)
+    if until is not None:
+        clauses.append("hour_ms < ?")
+        params.append(until)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    rows = conn.execute(f"""
+        SELECT tool_name, bucket, SUM(count) FROM latency_hist {where}
+        GROUP BY tool_name, bucket ORDER BY tool_name, bucket
+    """, params).fetchall()
+
+    per_tool: dict[str, list[tuple[int, int]]] = {}
+    for tool_name, bucket, n in rows:
+        per_tool.setdefault(tool_name, []).append((bucket, n))
+    result = []
+    for tool_name, buckets in per_tool.items():
+        result.append({
+            "tool_name": tool_name,
+            "count": sum(n for _, n in buckets),
+            "max_bucket_ms": round(bucket_value(buckets[-1][0]), 1),
+            "quantiles": _percentiles(buckets, quantiles),
+        })
+    result.sort(key=lambda r: r["count"], reverse=True)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Full-text search
+# ---------------------------------------------------------------------------
+#
+# Each searchable table has an external-content FTS5 index (<table>_fts)
+# that stores only the inverted index and reads text back from the table
+# itself, or from its <table>_text view when a column is blob-backed.
+# Triggers keep it in step with every insert and delete, including backfill
+# merges, so the write path needs no changes.
+
+# kind -> (table, indexed columns, label expression for results)
+SEARCH_KINDS = {
+    "error":    ("errors", ("error_message", "stack_trace"),
+                 "(SELECT tool_name FROM tool_calls WHERE tool_use_id = t.tool_use_id)"),
+    "thinking": ("thinking_blocks", ("thinking_content",), "NULL"),
+    "message":  ("messages", ("text_preview",), "t.role"),
+    "system":   ("system_messages", ("content",), "t.message_type"),
+}
+
+
+def _create_search_index(conn: sqlite3.Connection, table: str, columns: tuple,
+                         blob_columns: tuple = ()) -> None:
+    """FTS5 index plus sync triggers; `blob_columns` are read through
+    <table>_text, which must already exist."""
+    def value(row: str, c: str) -> str:
+        return text_sql(c, row) if c in blob_columns else f"{row}.{c}"
+
+    cols = ", ".join(columns)
+    new = ", ".join(value("new", c) for c in columns)
+    old = ", ".join(value("old", c) for c in columns)
+    content = f"{table}_text" if blob_columns else table
+    conn.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            {cols}, content='{content}', content_rowid='id', tokenize='porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new});
+        END;
+    """)
+
+
+def _drop_search_triggers(conn: sqlite3.Connection, table: str) -> None:
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+
+
+def drop_search_triggers(conn: sqlite3.Connection) -> None:
+    """Stop maintaining the search indexes on this DB (backfill staging:
+    the rows are indexed when they are merged into the main DB)."""
+    for table, _, _ in SEARCH_KINDS.values():
+        _drop_search_triggers(conn, table)
     conn.commit()
 
 
+def rebuild_search_index(conn: sqlite3.Connection) -> None:
+    """Re-index every searchable table from scratch (repair)."""
+    with transaction(conn):
+        for table, _, _ in SEARCH_KINDS.values():
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, as a literal
+    (so `ENOENT: foo-bar` is not read as FTS syntax); a trailing * keeps
+    prefix matching.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*") if prefix else word
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    kinds: Optional[list[str]] = None,
+    session_id: Optional[str] = None,
+    since: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+    highlight: tuple[str, str] = ("[", "]"),
+    raw: bool = False,
+) -> list[dict]:
+    """
+    Ranked full-text search over errors, thinking blocks, messages and
+    system messages. `since` is epoch ms; `raw` passes `query` to FTS5
+    unchanged (phrases, OR/NOT, NEAR). Returns [{kind, id, session_id, slug,
+    ts, label, rank, snippet}], best match first.
+
+    bm25 scores depend on each index's own document lengths and term
+    frequencies, so they only order hits within one kind (lower rank is
+    better). Across kinds the results are interleaved: every kind's best
+    hit, then every kind's second best, and so on, ties going to the lower
+    rank.
+    """
+    kinds = kinds or list(SEARCH_KINDS)
+    match = query if raw else fts_query(query)
+    if not match:
+        return []
+    clauses, filters = [], []
+    if session_id:
+        clauses.append("t.session_id = ?")
+        filters.append(session_id)
+    if since is not None:
+        clauses.append("t.ts_ms >= ?")
+        filters.append(since)
+    extra = "".join(f" AND {c}" for c in clauses)
+
+    # Each kind yields at most offset + limit hits, numbered by their place
+    # within the kind, before the global merge
+    arms, params = [], []
+    for kind in kinds:
+        table, _, label = SEARCH_KINDS[kind]
+        arms.append(f"""
+            SELECT *, ROW_NUMBER() OVER (ORDER BY rank) AS place FROM (
+                SELECT '{kind}' AS kind, t.id, t.session_id, t.ts, {label} AS label,
+                       bm25({table}_fts) AS rank,
+                       snippet({table}_fts, -1, ?, ?, '…', 16) AS snippet
+                FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid
+                WHERE {table}_fts MATCH ?{extra}
+                ORDER BY rank LIMIT ?
+            )""")
+        params += [*highlight, match, *filters, offset + limit]
+    rows = conn.execute(f"""
+        SELECT h.*, s.slug FROM ({" UNION ALL ".join(arms)}) h
+        LEFT JOIN sessions s ON s.session_id = h.session_id
+        ORDER BY h.place, h.rank LIMIT ? OFFSET ?
+    """, params + [limit, offset]).fetchall()
+    return [{k: r[k] for k in r.keys() if k != "place"} for r in rows]
+
+
+# ---------------------------------------------------------------------------
+# Batched writes
+# ---------------------------------------------------------------------------
+
+# Flush thresholds for WriteBatch: queued rows, and seconds since the first
+# queued row.
+BATCH_MAX_ROWS = int(os.environ.get("CC_TELEMETRY_BATCH_ROWS", "1000"))
+BATCH_MAX_AGE = float(os.environ.get("CC_TELEMETRY_BATCH_SECONDS", "1.0"))
+
+
+# Errors caused by the data of a single row (a value that cannot be bound
+# or stored, a constraint violation): retrying the same batch cannot help
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.ProgrammingError, sqlite3.InterfaceError,
+              sqlite3.DataError, TypeError, ValueError, AttributeError)
+
+
+def is_transient(e: BaseException) -> bool:
+    """True for errors worth retrying as they are: the DB busy or locked."""
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    code = getattr(e, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (5, 6)  # SQLITE_BUSY, SQLITE_LOCKED
+    message = str(e)
+    return "locked" in message or "busy" in message
+
+
+class WriteBatch:
+    """
+    Unit of work for ingestion. Mirrors the single-row write functions above
+    but only queues rows in memory; flush() writes everything with
+    executemany inside one transaction.
+
+    Statements run in dependency order (sessions, tool calls, completions,
+    the rest, checkpoints last), so a tool call queued and completed in the
+    same batch is inserted before it is updated.
+
+    Session upserts are coalesced: each session gets one row per batch that
+    accumulates the fields seen so far and the latest last_seen_at, instead
+    of one statement per transcript line. The session_stats rollup is updated
+    in the same transaction.
+    """
+
+    def __init__(self, max_rows: Optional[int] = None, max_age: Optional[float] = None):
+        self.max_rows = max_rows if max_rows is not None else BATCH_MAX_ROWS
+        self.max_age = max_age if max_age is not None else BATCH_MAX_AGE
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop everything queued (e.g. after a failed flush)."""
+        self._rows: dict[str, list[tuple]] = {key: [] for key, _ in self._ORDER}
+        self._sessions: dict[str, list] = {}
+        self._checkpoints: dict[str, tuple] = {}
+        self._count = 0
+        self._first_queued: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _queue(self, key: str, params: tuple) -> None:
+        if self._first_queued is None:
+            self._first_queued = time.monotonic()
+        self._rows[key].append(params)
+        self._count += 1
+
+    def extend(self, other: "WriteBatch") -> None:
+        """Move everything queued on `other` onto this batch (other is cleared)."""
+        for key, rows in other._rows.items():
+            self._rows[key].extend(rows)
+        count = other._count
+        for session_id, row in other._sessions.items():
+            mine = self._sessions.get(session_id)
+            if mine is None:
+                self._sessions[session_id] = row
+            else:
+                _merge_session(mine, tuple(row))
+                count -= 1
+        self._checkpoints.update(other._checkpoints)
+        self._count += count
+        if other._first_queued is not None:
+            self._first_queued = min(self._first_queued or other._first_queued,
+                                     other._first_queued)
+        other.clear()
+
+    def due(self) -> bool:
+        """True once the size or age threshold has been reached."""
+        pending = self._count + len(self._checkpoints)
+        if not pending:
+            return False
+        return (pending >= self.max_rows
+                or time.monotonic() - self._first_queued >= self.max_age)
+
+    # --- queueing (same arguments as the module-level functions, minus conn) ---
+
+    def upsert_session(self, entry: dict) -> None:
+        params = _session_params(entry)
+        if params is None:
+            return
+        row = self._sessions.get(params[0])
+        if row is None:
+            if self._first_queued is None:
+                self._first_queued = time.monotonic()
+            self._sessions[params[0]] = list(params)
+            self._count += 1
+        else:
+            _merge_session(row, params)
+
+    def insert_tool_call(self, session_id, tool_use_id, tool_name, input_json, started_at) -> None:
+        self._queue("tool_calls", (session_id, tool_use_id, tool_name, input_json, started_at))
+
+    def complete_tool_call(self, tool_use_id, result_preview, is_error, completed_at, duration_ms) -> None:
+        self._queue("completions",
+                    (result_preview, 1 if is_error else 0, completed_at, duration_ms, tool_use_id))
+
+    def insert_hook_event(self, session_id, tool_use_id, hook_event, hook_name, command, ts) -> None:
+        self._queue("hook_events", (session_id, tool_use_id, hook_event, hook_name, command, ts))
+
+    def insert_message(self, session_id, uuid, role, content_type, text_preview, ts) -> None:
+        self._queue("messages", (session_id, uuid, role, content_type, text_preview, ts))
+
+    def insert_error(self, session_id, tool_use_id, error_message, stack_trace,
+                     tool_input_full, context_tool_calls, thinking_before,
+                     recovery_attempted, ts) -> None:
+        self._queue("errors", (
+            session_id, tool_use_id, error_message, stack_trace,
+            tool_input_full, context_tool_calls, thinking_before,
+            1 if recovery_attempted else 0, ts
+        ))
+
+    def insert_thinking_block(self, session_id, message_uuid, thinking_content,
+                              tokens, led_to_error, ts) -> None:
+        self._queue("thinking_blocks",
+                    (session_id, message_uuid, thinking_content, tokens, 1 if led_to_error else 0, ts))
+
+    def insert_system_message(self, session_id, message_uuid, message_type, content, ts) -> None:
+        self._queue("system_messages", (session_id, message_uuid, message_type, content, ts))
+
+    def insert_api_metadata(self, session_id, message_uuid, request_id, model,
+                            input_tokens, output_tokens, cache_read_tokens,
+                            cache_write_tokens, ts) -> None:
+        self._queue("api_metadata", (
+            session_id, message_uuid, request_id, model,
+            input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, ts
+        ))
+
+    def save_checkpoint(self, transcript_path, inode, offset, parser_state, origin=0) -> None:
+        """Queue a checkpoint; only the latest one per transcript is written."""
+        if self._first_queued is None:
+            self._first_queued = time.monotonic()
+        self._checkpoints[transcript_path] = (
+            transcript_path, inode, offset, origin, parser_state,
+            datetime.now(timezone.utc).isoformat(),
+        )
+
+    # --- flushing ---
+
+    _ORDER = (
+        ("tool_calls", _SQL_INSERT_TOOL_CALL),
+        ("completions", _SQL_COMPLETE_TOOL_CALL),
+        ("api_metadata", _SQL_INSERT_API_METADATA),
+        ("thinking_blocks", _SQL_INSERT_THINKING_BLOCK),
+        ("messages", _SQL_INSERT_MESSAGE),
+        ("system_messages", _SQL_INSERT_SYSTEM_MESSAGE),
+        ("hook_events", _SQL_INSERT_HOOK_EVENT),
+        ("errors", _SQL_INSERT_ERROR),
+    )
+
+    def flush(self, conn: sqlite3.Connection) -> int:
+        """Write all queued rows in one transaction. Returns the row count.
+
+        If a row cannot be written (ROW_ERRORS), the batch is written again
+        row by row and the offending rows are logged and skipped, so one bad
+        transcript line never stalls its file. Other errors (busy, disk full)
+        roll everything back and propagate, and the batch stays queued."""
+        if not self._count and not self._checkpoints:
+            return 0
+        written = self._count
+        try:
+            with transaction(conn):
+                self._write(conn, self._sessions, self._rows)
+                self._write_checkpoints(conn)
+        except ROW_ERRORS as e:
+            logger.warning("Batch write failed (%s); writing row by row", e)
+            written -= self._write_row_by_row(conn)
+        self.clear()
+        return written
+
+    def _write(self, conn: sqlite3.Connection, sessions: dict, rows_by_key: dict) -> None:
+        rollup = _RollupDelta()
+        if sessions:
+            conn.executemany(_SQL_UPSERT_SESSION, list(sessions.values()))
+            rollup.add_sessions(sessions.values())
+        for key, sql in self._ORDER:
+            rows = rows_by_key.get(key) or []
+            if key == "tool_calls":
+                rollup.add_tool_calls(conn, rows)
+            elif key == "completions":
+                rollup.add_completions(conn, rows)
+            elif key == "api_metadata":
+                rollup.add_api_metadata(rows)
+            if rows and key in _BLOB_PARAMS:
+                rows = _stash_blobs(conn, key, rows)
+            if rows:
+                conn.executemany(sql, rows)
+        rollup.write(conn)
+
+    def _write_checkpoints(self, conn: sqlite3.Connection) -> None:
+        if self._checkpoints:
+            conn.executemany(_SQL_SAVE_CHECKPOINT, list(self._checkpoints.values()))
+
+    def _write_row_by_row(self, conn: sqlite3.Connection) -> int:
+        """Write each queued row (in dependency order) under its own
+        savepoint, skipping those that fail. Returns the number skipped."""
+        items = [(None, row) for row in self._sessions.values()]
+        items += [(key, row) for key, _ in self._ORDER for row in self._rows[key]]
+        skipped = 0
+        with transaction(conn):
+            # A SAVEPOINT outside a transaction starts one of its own that
+            # RELEASE commits: begin first, so the rows and the checkpoints
+            # still commit together
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for key, row in items:
+                conn.execute("SAVEPOINT write_row")
+                try:
+                    if key is None:
+                        self._write(conn, {row[0]: row}, {})
+                    else:
+                        self._write(conn, {}, {key: [row]})
+                except ROW_ERRORS as e:
+                    conn.execute("ROLLBACK TO write_row")
+                    skipped += 1
+                    logger.warning("Skipping %s row that cannot be written (%s): %.200r",
+                                   key or "sessions", e, row)
+                conn.execute("RELEASE write_row")
+            self._write_checkpoints(conn)
+        return skipped
+
+
+# ---------------------------------------------------------------------------
+# Hook log
+# ---------------------------------------------------------------------------
+#
+# Events written by the plugin's hooks (hooks/logger.py make_event dicts),
+# received by the daemon (hook_socket.py) or tailed from the hooks' JSONL
+# logs (hook_tail.py). event_id is set by the hook, so the same event
+# arriving both ways is stored once.
+#
+# Each new PostToolUse, or one still unpaired when a PreToolUse arrives
+# after it, is paired with its PreToolUse into a tool_spans row:
+# by tool_use_id when the hooks recorded it, else with the latest unpaired
+# PreToolUse of the same session and tool before it. That is exact for
+# sequential calls, never lets a PreToolUse whose tool was interrupted
+# shift every later pair, and is one short backwards index scan.
+
+_SQL_INSERT_HOOK_LOG = """
+    INSERT OR IGNORE INTO hook_log(
+        event_id, session_id, event, tool, skill, status, duration_ms,
+        agent_name, span_id, parent_span_id, meta, ts, ts_ms, source, tool_use_id
+    ) VALUES(?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, iso_ms(?12), ?13, ?14)
+"""
+
+# A PreToolUse this much older than its PostToolUse is not paired with it
+SPAN_MAX_MS = 24 * 3600 * 1000
+
+# Spans without a tool_use_id are compared with the transcript's tool call
+# of the same session and tool that started closest to them, within this
+SPAN_MATCH_MS = 10_000
+
+
+def _hook_text(value) -> Optional[str]:
+    """A hook event field as TEXT. Events come from any hook script, so a
+    field of the wrong type is stored as its JSON rather than failing the
+    batch it arrived in."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def insert_hook_log(conn: sqlite3.Connection, events: list[dict], source: str) -> int:
+    """Store hook events in one transaction and pair new PostToolUse events
+    into tool_spans; `source` records how they arrived. Returns the number
+    of new rows."""
+    rows = []
+    for ev in events:
+        meta = ev.get("meta")
+        duration = ev.get("duration_ms")
+        ts = ev.get("ts")
+        rows.append((
+            _hook_text(ev.get("event_id")), _hook_text(ev.get("session_id")),
+            _hook_text(ev.get("event")) or "", _hook_text(ev.get("tool")),
+            _hook_text(ev.get("skill")), _hook_text(ev.get("status")),
+            duration if type(duration) is int else None,
+            _hook_text(ev.get("agent_name")), _hook_text(ev.get("span_id")),
+            _hook_text(ev.get("parent_span_id")),
+            json.dumps(meta, ensure_ascii=False, default=str) if meta else None,
+            ts if isinstance(ts, str) else None, source, _hook_text(ev.get("tool_use_id")),
+        ))
+    with transaction(conn):
+        (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM hook_log").fetchone()
+        before = conn.total_changes
+        conn.executemany(_SQL_INSERT_HOOK_LOG, rows)
+        added = conn.total_changes - before
+        if added:
+            # A PreToolUse can arrive after its PostToolUse (one went to the
+            # JSONL fallback, or the tailer is catching up): retry the
+            # unpaired posts from the earliest new one on, too
+            (first_pre,) = conn.execute("""
+                SELECT MIN(ts_ms) FROM hook_log WHERE id > ? AND event = 'PreToolUse'
+            """, (last_id,)).fetchone()
+            pair_tool_spans(conn, after_id=last_id, since_ms=first_pre)
+        return added
+
+
+def pair_tool_spans(conn: sqlite3.Connection, after_id: int = 0,
+                    since_ms: Optional[int] = None) -> int:
+    """Pair the unpaired PostToolUse rows of hook_log with id > after_id,
+    or with ts_ms >= since_ms, into tool_spans. Returns the number of spans
+    added."""
+    # Two arms, so each is one range scan (rowid, idx_hl_ts_ms)
+    posts = conn.execute("""
+        SELECT * FROM (
+            SELECT id, session_id, tool, tool_use_id, status, ts_ms FROM hook_log
+            WHERE id > ? AND event = 'PostToolUse' AND +ts_ms IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM tool_spans WHERE post_id = hook_log.id)
+            UNION
+            SELECT id, session_id, tool, tool_use_id, status, ts_ms FROM hook_log
+            WHERE ts_ms >= ? AND event = 'PostToolUse'
+              AND NOT EXISTS (SELECT 1 FROM tool_spans WHERE post_id = hook_log.id)
+        ) ORDER BY ts_ms, id
+    """, (after_id, since_ms)).fetchall()
+    added = 0
+    for post_id, session_id, tool, tool_use_id, status, end in posts:
+        pre = None
+        if tool_use_id:
+            pre = conn.execute("""
+                SELECT id, ts_ms FROM hook_log
+                WHERE tool_use_id = ? AND event = 'PreToolUse' LIMIT 1
+            """, (tool_use_id,)).fetchone()
+        if pre is None:
+            pre = conn.execute("""
+                SELECT id, ts_ms FROM hook_log
+                WHERE session_id IS ? AND ts_ms BETWEEN ? AND ?
+                  AND event = 'PreToolUse' AND tool IS ?
+                  AND (tool_use_id IS NULL OR ? IS NULL)
+                  AND NOT EXISTS (SELECT 1 FROM tool_spans WHERE pre_id = hook_log.id)
+                ORDER BY ts_ms DESC, id DESC LIMIT 1
+            """, (session_id, end - SPAN_MAX_MS, end, tool, tool_use_id)).fetchone()
+        if pre is None:
+            continue
+        conn.execute("""
+            INSERT OR IGNORE INTO tool_spans(session_id, tool, tool_use_id, pre_id, post_id,
+                                             started_ms, ended_ms, duration_ms, status)
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (session_id, tool, tool_use_id, pre[0], post_id, pre[1], end, end - pre[1], status))
+        added += 1
+    return added
+
+
+# ---------------------------------------------------------------------------
+# Backfill merge
+# ---------------------------------------------------------------------------
+
+# Tables copied from a staging DB, in the same dependency order as
+# WriteBatch. Rows with a natural key are skipped if already present.
+_MERGE_TABLES = (
+    ("tool_calls", "INSERT OR IGNORE"),
+    ("api_metadata", "INSERT"),
+    ("thinking_blocks", "INSERT"),
+    ("messages", "INSERT OR IGNORE"),
+    ("system_messages", "INSERT"),
+    ("hook_events", "INSERT"),
+    ("errors", "INSERT"),
+)
+
+_SQL_MERGE_SESSIONS = """
+    INSERT INTO main.sessions(session_id, slug, project_hash, transcript_path, cwd,
+                              started_at, last_seen_at, version,
+                              started_at_ms, last_seen_at_ms)
+    SELECT session_id, slug, project_hash, transcript_path, cwd,
+           started_at, last_seen_at, version, started_at_ms, last_seen_at_ms
+    FROM staging.sessions WHERE true
+    ON CONFLICT(session_id) DO UPDATE SET
+        slug=COALESCE(sessions.slug, excluded.slug),
+        project_hash=COALESCE(sessions.project_hash, excluded.project_hash),
+        transcript_path=COALESCE(sessions.transcript_path, excluded.transcript_path),
+        cwd=COALESCE(sessions.cwd, excluded.cwd),
+        version=COALESCE(sessions.version, excluded.version),
+        started_at=CASE WHEN excluded.started_at_ms < COALESCE(sessions.started_at_ms, excluded.started_at_ms + 1)
+                        THEN excluded.started_at ELSE COALESCE(sessions.started_at, excluded.started_at) END,
+        started_at_ms=MIN(COALESCE(sessions.started_at_ms, excluded.started_at_ms),
+                          COALESCE(excluded.started_at_ms, sessions.started_at_ms)),
+        last_seen_at=CASE WHEN excluded.last_seen_at_ms > COALESCE(sessions.last_seen_at_ms, -1)
+                          THEN excluded.last_seen_at ELSE sessions.last_seen_at END,
+        last_seen_at_ms=MAX(COALESCE(sessions.last_seen_at_ms, excluded.last_seen_at_ms),
+                            COALESCE(excluded.last_seen_at_ms, sessions.last_seen_at_ms))
+"""
+
+# Histograms are additive, unlike the per-session rollups which are
+# recomputed for the sessions a merge touched
+_SQL_MERGE_LATENCY = """
+    INSERT INTO main.latency_hist(tool_name, hour_ms, bucket, count)
+    SELECT tool_name, hour_ms, bucket, count FROM staging.latency_hist WHERE true
+    ON CONFLICT(tool_name, hour_ms, bucket) DO UPDATE SET count=count + excluded.count
+"""
+
+_SQL_RECORD_BACKFILL = """
+    INSERT INTO backfill_files(transcript_path, inode, offset, lines, imported_at)
+    VALUES(?, ?, ?, ?, ?)
+    ON CONFLICT(transcript_path) DO UPDATE SET
+        inode=excluded.inode, offset=excluded.offset,
+        lines=CASE WHEN backfill_files.inode = excluded.inode
+                   THEN backfill_files.lines + excluded.lines ELSE excluded.lines END,
+        imported_at=excluded.imported_at
+"""
+
+
+def merge_staging(
+    conn: sqlite3.Connection,
+    staging_path: Path,
+    files: list[tuple[str, int, int, int]],
+) -> int:
+    """
+    Copy every row of a backfill staging DB into the main DB and record
+    `files` ((path, inode, offset, lines) tuples) as imported, in one
+    transaction. Returns the number of rows copied.
+
+    The rollups of the sessions touched are rebuilt, except for sessions
+    rebuild_rollups() keeps because retention already pruned some of their
+    rows; those keep their totals.
+    """
+    conn.execute("ATTACH DATABASE ? AS staging", (str(staging_path),))
+    try:
+        copied = 0
+        imported_at = datetime.now(timezone.utc).isoformat()
+        with transaction(conn):
+            copied += conn.execute(_SQL_MERGE_SESSIONS).rowcount
+            # Before the rows that reference them (the search triggers read them)
+            conn.execute("INSERT OR IGNORE INTO main.blobs SELECT * FROM staging.blobs")
+            for table, verb in _MERGE_TABLES:
+                cols = ", ".join(
+                    r["name"] for r in conn.execute(f"PRAGMA main.table_info({table})")
+                    if r["name"] != "id"
+                )
+                copied += conn.execute(
+                    f"{verb} INTO main.{table}({cols}) "
+                    f"SELECT {cols} FROM staging.{table} ORDER BY id"
+                ).rowcount
+            conn.executemany(_SQL_RECORD_BACKFILL,
+                             [(*f, imported_at) for f in files])
+            touched = [r[0] for r in conn.execute("SELECT session_id FROM staging.sessions")]
+            rebuild_rollups(conn, touched)
+            conn.execute(_SQL_MERGE_LATENCY)
+    finally:
+        conn.execute("DETACH DATABASE staging")
+    return copied
+
+
 # ---------------------------------------------------------------------------
 # Query operations
 # ---------------------------------------------------------------------------
 
-def query_sessions(conn: sqlite3.Connection, limit: int = 20):
-    rows = conn.execute("""
-        SELECT s.session_id, s.slug, s.cwd, s.started_at, s.last_seen_at,
-               COUNT(tc.id) as tool_call_count,
-               SUM(tc.result_is_error) as error_count
+# The row lists below are newest first, ordered by (timestamp, id). `since`
+# and `until` (epoch ms, until exclusive) bound the window; `cursor` is the
+# next_cursor() of the previous page and continues strictly after its last
+# row. Each page is one index range scan (see _KEYSET_INDEXES) costing
+# O(limit + rows sharing the boundary timestamp), however deep it is, where
+# LIMIT/OFFSET re-reads every skipped row. Rows without a timestamp sort
+# last and are not reachable by cursor.
+
+def encode_cursor(ts: Optional[int], row_id: int) -> str:
+    return f"{ts}:{row_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        ts, row_id = cursor.split(":")
+        return int(ts), int(row_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+
+
+def next_cursor(rows: list[dict], limit: int, ts_column: str = "ts_ms") -> Optional[str]:
+    """Cursor for the page after `rows`, or None when it was the last one."""
+    if not rows or len(rows) < limit or rows[-1][ts_column] is None:
+        return None
+    return encode_cursor(rows[-1][ts_column], rows[-1]["id"])
+
+
+def _keyset(clauses: list, params: list, ts: str, row_id: str,
+            since: Optional[int], until: Optional[int], cursor: Optional[str]) -> None:
+    """Append the time-window and cursor conditions to clauses/params."""
+    if since is not None:
+        clauses.append(f"{ts} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{ts} < ?")
+        params.append(until)
+    if cursor:
+        clauses.append(f"({ts}, {row_id}) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+
+# Rows per chunk when a query_* function is called with stream=True
+STREAM_CHUNK_ROWS = 500
+
+
+def _rows(conn: sqlite3.Connection, table: str, cur: sqlite3.Cursor, stream: bool):
+    """All rows of `cur` as dicts with their text filled in, or with stream
+    an iterator of such lists of up to STREAM_CHUNK_ROWS, so a large limit
+    never has to fit in memory at once."""
+    if not stream:
+        return with_text(conn, table, cur.fetchall())
+    return (with_text(conn, table, rows)
+            for rows in iter(lambda: cur.fetchmany(STREAM_CHUNK_ROWS), []))
+
+
+def query_sessions(conn: sqlite3.Connection, limit: int = 20,
+                   session_ids: Optional[list[str]] = None):
+    where = ""
+    params: list = []
+    if session_ids is not None:
+        where = f"WHERE s.session_id IN ({','.join('?' * len(session_ids))})"
+        params.extend(session_ids)
+    params.append(limit)
+    rows = conn.execute(f"""
+        SELECT s.session_id, s.slug, s.cwd, s.started_at, s.last_seen_at, s.last_seen_at_ms,
+               COALESCE(st.tool_calls, 0) as tool_call_count,
+               st.errors as error_count
         FROM sessions s
-        LEFT JOIN tool_calls tc ON tc.session_id = s.session_id
-        GROUP BY s.session_id
-        ORDER BY s.last_seen_at DESC
+        LEFT JOIN session_stats st ON st.session_id = s.session_id
+        {where}
+        ORDER BY s.last_seen_at_ms DESC
         LIMIT ?
-    """, (limit,)).fetchall()
+    """, params).fetchall()
     return [dict(r) for r in rows]
 
 
+def query_session_detail(conn: sqlite3.Connection, session_id: str) -> Optional[dict]:
+    """One session row plus its rollup (counts, durations, tokens, models)."""
+    row = conn.execute("""
+        SELECT s.*,
+               COALESCE(st.tool_calls, 0) as tool_call_count,
+               COALESCE(st.errors, 0) as error_count,
+               st.total_duration_ms, st.max_duration_ms,
+               COALESCE(st.input_tokens, 0) as input_tokens,
+               COALESCE(st.output_tokens, 0) as output_tokens,
+               COALESCE(st.cache_read_tokens, 0) as cache_read_tokens,
+               COALESCE(st.cache_write_tokens, 0) as cache_write_tokens,
+               st.first_ts_ms, st.last_ts_ms, st.models
+        FROM sessions s
+        LEFT JOIN session_stats st ON st.session_id = s.session_id
+        WHERE s.session_id = ?
+    """, (session_id,)).fetchone()
+    if not row:
+        return None
+    session = dict(row)
+    session["tokens"] = {k: session.pop(k) for k in (
+        "input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")}
+    session["models"] = json.loads(session["models"] or "[]")
+    return session
+
+
 def query_tool_calls(
     conn: sqlite3.Connection,
     session_id: Optional[str] = None,
     tool_name: Optional[str] = None,
     errors_only: bool = False,
     limit: int = 50,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
 ):
+    """Tool calls, newest first; paged by (started_at_ms, id)."""
     clauses = []
     params = []
     if session_id:
@@ -352,67 +2243,100 @@ def query_tool_calls(
         params.append(tool_name)
     if errors_only:
         clauses.append("tc.result_is_error = 1")
+    _keyset(clauses, params, "tc.started_at_ms", "tc.id", since, until, cursor)
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
     params.append(limit)
 
-    rows = conn.execute(f"""
+    cur = conn.execute(f"""
         SELECT tc.*, s.slug, s.cwd
         FROM tool_calls tc
         LEFT JOIN sessions s ON s.session_id = tc.session_id
         {where}
-        ORDER BY tc.started_at DESC
+        ORDER BY tc.started_at_ms DESC, tc.id DESC
         LIMIT ?
-    """, params).fetchall()
-    return [dict(r) for r in rows]
+    """, params)
+    return _rows(conn, "tool_calls", cur, stream)
 
 
+@memoized
 def query_stats(conn: sqlite3.Connection, session_id: Optional[str] = None):
+    """Totals and the 20 most used tools, in one pass over tool_calls."""
     params = []
     where = ""
     if session_id:
         where = "WHERE session_id = ?"
         params.append(session_id)
 
-    total = conn.execute(
-        f"SELECT COUNT(*) FROM tool_calls {where}", params
-    ).fetchone()[0]
-
-    errors = conn.execute(
-        f"SELECT COUNT(*) FROM tool_calls {where} {'AND' if where else 'WHERE'} result_is_error=1",
-        params + ([] if not where else [])
-    ).fetchone()[0] if not where else conn.execute(
-        "SELECT COUNT(*) FROM tool_calls WHERE session_id=? AND result_is_error=1", params
-    ).fetchone()[0]
-
-    avg_dur = conn.execute(
-        f"SELECT AVG(duration_ms) FROM tool_calls {where} {'AND' if where else 'WHERE'} duration_ms IS NOT NULL",
-        params + ([] if not where else [])
-    ).fetchone()[0] if not where else conn.execute(
-        "SELECT AVG(duration_ms) FROM tool_calls WHERE session_id=? AND duration_ms IS NOT NULL", params
-    ).fetchone()[0]
-
-    by_tool = conn.execute(f"""
-        SELECT tool_name, COUNT(*) as cnt, AVG(duration_ms) as avg_ms, SUM(result_is_error) as errors
+    per_tool = conn.execute(f"""
+        SELECT tool_name, COUNT(*) as cnt, SUM(result_is_error) as errors,
+               SUM(duration_ms) as dur_sum, COUNT(duration_ms) as dur_n
         FROM tool_calls {where}
-        GROUP BY tool_name ORDER BY cnt DESC LIMIT 20
+        GROUP BY tool_name
     """, params).fetchall()
 
+    dur_sum = sum(r["dur_sum"] or 0 for r in per_tool)
+    dur_n = sum(r["dur_n"] for r in per_tool)
+    by_tool = sorted(per_tool, key=lambda r: r["cnt"], reverse=True)[:20]
+    return {
+        "total_tool_calls": sum(r["cnt"] for r in per_tool),
+        "error_count": sum(r["errors"] or 0 for r in per_tool),
+        "avg_duration_ms": round(dur_sum / dur_n, 1) if dur_n else None,
+        "by_tool": [{"tool_name": r["tool_name"], "cnt": r["cnt"],
+                     "avg_ms": r["dur_sum"] / r["dur_n"] if r["dur_n"] else None,
+                     "errors": r["errors"]} for r in by_tool],
+    }
+
+
+@memoized
+def query_overview(conn: sqlite3.Connection) -> dict:
+    """Dashboard headline numbers: session count plus query_stats totals."""
+    stats = query_stats(conn)
+    (sessions,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+    total = stats["total_tool_calls"]
     return {
-        "total_tool_calls": total,
-        "error_count": errors,
-        "avg_duration_ms": round(avg_dur, 1) if avg_dur else None,
-        "by_tool": [dict(r) for r in by_tool],
+        "sessions": sessions,
+        "tool_calls": total,
+        "error_count": stats["error_count"],
+        "error_rate": round(stats["error_count"] / total * 100, 1) if total else 0,
+        "avg_duration_ms": stats["avg_duration_ms"] or 0,
     }
 
 
+@memoized
+def query_tool_breakdown(conn: sqlite3.Connection, session_id: Optional[str] = None,
+                         limit: int = 30) -> list[dict]:
+    """Per-tool call count, mean duration and errors, most used first."""
+    params = []
+    where = ""
+    if session_id:
+        where = "WHERE session_id = ?"
+        params.append(session_id)
+    params.append(limit)
+    rows = conn.execute(f"""
+        SELECT tool_name,
+               COUNT(*) as count,
+               COALESCE(AVG(duration_ms), 0) as avg_ms,
+               SUM(result_is_error) as errors
+        FROM tool_calls {where}
+        GROUP BY tool_name
+        ORDER BY count DESC
+        LIMIT ?
+    """, params).fetchall()
+    return [dict(r) for r in rows]
+
+
 def query_errors(
     conn: sqlite3.Connection,
     session_id: Optional[str] = None,
     tool_use_id: Optional[str] = None,
     limit: int = 50,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
 ):
-    """Query errors with full context."""
+    """Query errors with full context, newest first."""
     clauses = []
     params = []
     if session_id:
@@ -421,20 +2345,21 @@ def query_errors(
     if tool_use_id:
         clauses.append("e.tool_use_id = ?")
         params.append(tool_use_id)
+    _keyset(clauses, params, "e.ts_ms", "e.id", since, until, cursor)
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
     params.append(limit)
 
-    rows = conn.execute(f"""
+    cur = conn.execute(f"""
         SELECT e.*, s.slug, tc.tool_name
         FROM errors e
         LEFT JOIN sessions s ON s.session_id = e.session_id
         LEFT JOIN tool_calls tc ON tc.tool_use_id = e.tool_use_id
         {where}
-        ORDER BY e.ts DESC
+        ORDER BY e.ts_ms DESC, e.id DESC
         LIMIT ?
-    """, params).fetchall()
-    return [dict(r) for r in rows]
+    """, params)
+    return _rows(conn, "errors", cur, stream)
 
 
 def query_thinking_blocks(
@@ -442,8 +2367,12 @@ def query_thinking_blocks(
     session_id: Optional[str] = None,
     led_to_error: Optional[bool] = None,
     limit: int = 50,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
 ):
-    """Query thinking blocks."""
+    """Query thinking blocks, newest first."""
     clauses = []
     params = []
     if session_id:
@@ -452,15 +2381,16 @@ def query_thinking_blocks(
     if led_to_error is not None:
         clauses.append("led_to_error = ?")
         params.append(1 if led_to_error else 0)
+    _keyset(clauses, params, "ts_ms", "id", since, until, cursor)
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
     params.append(limit)
 
-    rows = conn.execute(f"""
+    cur = conn.execute(f"""
         SELECT * FROM thinking_blocks {where}
-        ORDER BY ts DESC LIMIT ?
-    """, params).fetchall()
-    return [dict(r) for r in rows]
+        ORDER BY ts_ms DESC, id DESC LIMIT ?
+    """, params)
+    return _rows(conn, "thinking_blocks", cur, stream)
 
 
 def query_system_messages(
@@ -468,8 +2398,12 @@ def query_system_messages(
     session_id: Optional[str] = None,
     message_type: Optional[str] = None,
     limit: int = 100,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
 ):
-    """Query system messages."""
+    """Query system messages, newest first."""
     clauses = []
     params = []
     if session_id:
@@ -478,15 +2412,16 @@ def query_system_messages(
     if message_type:
         clauses.append("message_type = ?")
         params.append(message_type)
+    _keyset(clauses, params, "ts_ms", "id", since, until, cursor)
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
     params.append(limit)
 
-    rows = conn.execute(f"""
+    cur = conn.execute(f"""
         SELECT * FROM system_messages {where}
-        ORDER BY ts DESC LIMIT ?
-    """, params).fetchall()
-    return [dict(r) for r in rows]
+        ORDER BY ts_ms DESC, id DESC LIMIT ?
+    """, params)
+    return _rows(conn, "system_messages", cur, stream)
 
 
 def query_api_metadata(
@@ -494,8 +2429,12 @@ def query_api_metadata(
     session_id: Optional[str] = None,
     request_id: Optional[str] = None,
     limit: int = 100,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
 ):
-    """Query API metadata."""
+    """Query API metadata, newest first."""
     clauses = []
     params = []
     if session_id:
@@ -504,13 +2443,155 @@ def query_api_metadata(
     if request_id:
         clauses.append("request_id = ?")
         params.append(request_id)
+    _keyset(clauses, params, "ts_ms", "id", since, until, cursor)
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
     params.append(limit)
 
-    rows = conn.execute(f"""
+    cur = conn.execute(f"""
         SELECT * FROM api_metadata {where}
-        ORDER BY ts DESC LIMIT ?
+        ORDER BY ts_ms DESC, id DESC LIMIT ?
+    """, params)
+    return _rows(conn, "api_metadata", cur, stream)
+
+
+def query_hook_events(
+    conn: sqlite3.Connection,
+    session_id: Optional[str] = None,
+    limit: int = 100,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+):
+    """Hook executions, newest first."""
+    clauses = []
+    params = []
+    if session_id:
+        clauses.append("session_id = ?")
+        params.append(session_id)
+    _keyset(clauses, params, "ts_ms", "id", since, until, cursor)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    params.append(limit)
+
+    cur = conn.execute(f"""
+        SELECT * FROM hook_events {where}
+        ORDER BY ts_ms DESC, id DESC LIMIT ?
+    """, params)
+    return _rows(conn, "hook_events", cur, stream)
+
+
+def query_hook_log(
+    conn: sqlite3.Connection,
+    session_id: Optional[str] = None,
+    event: Optional[str] = None,
+    limit: int = 100,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+):
+    """Events reported by the plugin's hooks, newest first."""
+    clauses = []
+    params = []
+    if session_id:
+        clauses.append("session_id = ?")
+        params.append(session_id)
+    if event:
+        clauses.append("event = ?")
+        params.append(event)
+    _keyset(clauses, params, "ts_ms", "id", since, until, cursor)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    params.append(limit)
+
+    cur = conn.execute(f"""
+        SELECT * FROM hook_log {where}
+        ORDER BY ts_ms DESC, id DESC LIMIT ?
+    """, params)
+    return _rows(conn, "hook_log", cur, stream)
+
+
+# The transcript's tool call for span s: by tool_use_id, else the nearest
+# start of the same session and tool within SPAN_MATCH_MS (a bare column
+# next to MIN() comes from the minimal row; SQLite rejects the outer
+# reference in an ORDER BY here)
+_SQL_SPAN_CALL = f"""
+    COALESCE(
+        (SELECT id FROM tool_calls WHERE tool_use_id = s.tool_use_id),
+        (SELECT id FROM (
+            SELECT id, MIN(ABS(started_at_ms - s.started_ms)) FROM tool_calls
+            WHERE s.tool_use_id IS NULL AND session_id = s.session_id AND tool_name = s.tool
+              AND started_at_ms BETWEEN s.started_ms - {SPAN_MATCH_MS}
+                                    AND s.started_ms + {SPAN_MATCH_MS})))
+"""
+
+
+def query_tool_spans(
+    conn: sqlite3.Connection,
+    session_id: Optional[str] = None,
+    tool: Optional[str] = None,
+    limit: int = 100,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+):
+    """
+    Hook-measured tool spans, newest first, next to the transcript's view of
+    the same call: transcript_ms (tool_calls.duration_ms), gap_ms (transcript
+    minus hook duration) and start_skew_ms (hook start minus transcript
+    start). The transcript columns are NULL until the call is matched.
+    """
+    clauses = []
+    params = []
+    if session_id:
+        clauses.append("s.session_id = ?")
+        params.append(session_id)
+    if tool:
+        clauses.append("s.tool = ?")
+        params.append(tool)
+    _keyset(clauses, params, "s.started_ms", "s.id", since, until, cursor)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    params.append(limit)
+
+    cur = conn.execute(f"""
+        SELECT s.*, c.tool_use_id AS call_id, c.duration_ms AS transcript_ms,
+               c.duration_ms - s.duration_ms AS gap_ms,
+               s.started_ms - c.started_at_ms AS start_skew_ms
+        FROM (SELECT s.*, {_SQL_SPAN_CALL} AS call_rowid FROM tool_spans s
+              {where} ORDER BY s.started_ms DESC, s.id DESC LIMIT ?) s
+        LEFT JOIN tool_calls c ON c.id = s.call_rowid
+        ORDER BY s.started_ms DESC, s.id DESC
+    """, params)
+    return _rows(conn, "tool_spans", cur, stream)
+
+
+def query_span_summary(
+    conn: sqlite3.Connection,
+    session_id: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> list[dict]:
+    """Per tool: span count, how many matched a transcript call, average
+    hook duration, and average transcript duration and gap (over the matched)."""
+    clauses, params = [], []
+    if session_id:
+        clauses.append("s.session_id = ?")
+        params.append(session_id)
+    _keyset(clauses, params, "s.started_ms", "s.id", since, until, None)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    rows = conn.execute(f"""
+        SELECT s.tool, COUNT(*) AS spans, COUNT(c.id) AS matched,
+               AVG(s.duration_ms) AS avg_hook_ms,
+               AVG(c.duration_ms) AS avg_transcript_ms,
+               AVG(c.duration_ms - s.duration_ms) AS avg_gap_ms,
+               MAX(ABS(c.duration_ms - s.duration_ms)) AS max_abs_gap_ms
+        FROM (SELECT s.*, {_SQL_SPAN_CALL} AS call_rowid FROM tool_spans s {where}) s
+        LEFT JOIN tool_calls c ON c.id = s.call_rowid
+        GROUP BY s.tool ORDER BY spans DESC
     """, params).fetchall()
     return [dict(r) for r in rows]
 
@@ -525,3 +2606,19 @@ def query_request_by_id(conn: sqlite3.Connection, request_id: str):
         LIMIT 1
     """, (request_id,)).fetchone()
     return dict(row) if row else None
+
+
+def load_checkpoints(conn: sqlite3.Connection) -> dict[str, dict]:
+    """Return {transcript_path: {inode, offset, origin, parser_state}} for all transcripts."""
+    rows = conn.execute(
+        "SELECT transcript_path, inode, offset, origin, parser_state FROM ingest_checkpoints"
+    ).fetchall()
+    return {r["transcript_path"]: dict(r) for r in rows}
+
+
+def load_backfilled(conn: sqlite3.Connection) -> dict[str, tuple[int, int]]:
+    """Return {transcript_path: (inode, offset)} imported so far by backfill."""
+    rows = conn.execute(
+        "SELECT transcript_path, inode, offset FROM backfill_files"
+    ).fetchall()
+    return {r["transcript_path"]: (r["inode"], r["offset"]) for r in rows}
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Hook event ingest for the cc-telemetry daemon.
+
+The plugin's hooks (hooks/logger.py write_event) send each event as one
+JSON datagram to a Unix socket the daemon listens on
+
+    ~/.claude/telemetry/hooks.sock      (CC_TELEMETRY_HOOK_SOCKET)
+
+so a hook costs a single sendto. The listener thread collects datagrams and,
+every HOOK_BATCH_ROWS events or HOOK_BATCH_SECONDS, appends them to the
+daily JSONL log the hooks used to write themselves (the same file and
+flock, so `logger.py --query` still sees everything) and inserts them into
+the hook_log table in one transaction. When the daemon is not running the
+send fails at once and the hook appends to the JSONL file directly.
+"""
+
+import os
+import json
+import time
+import fcntl
+import socket
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import db
+
+logger = logging.getLogger("cc_telemetry.hooks")
+
+TELEMETRY_DIR = Path(os.environ.get(
+    "CLAUDE_TELEMETRY_DIR", os.path.expanduser("~/.claude/telemetry")))
+
+# Socket path; set CC_TELEMETRY_HOOK_SOCKET= (empty) to disable the listener
+SOCKET_PATH = os.environ.get("CC_TELEMETRY_HOOK_SOCKET", str(TELEMETRY_DIR / "hooks.sock"))
+
+# Write received events once this many are pending, or the oldest is this old
+HOOK_BATCH_ROWS = 200
+HOOK_BATCH_SECONDS = 0.5
+
+# Largest datagram accepted, and the kernel receive buffer that absorbs bursts
+MAX_DATAGRAM = 256 * 1024
+RECV_BUFFER = 4 * 1024 * 1024
+
+
+def append_jsonl(log_dir: Path, lines: list[tuple[str, bytes]]) -> None:
+    """Append (date, JSON line) pairs to log_dir/<date>.jsonl, one locked
+    write per file, as hooks/logger.py does for a single event."""
+    by_date: dict[str, list[bytes]] = {}
+    for date, line in lines:
+        by_date.setdefault(date, []).append(line.rstrip(b"\n") + b"\n")
+    log_dir.mkdir(parents=True, exist_ok=True)
+    for date, chunk in by_date.items():
+        with open(log_dir / f"{date}.jsonl", "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(b"".join(chunk))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _event_date(event: dict) -> str:
+    ts = event.get("ts")
+    if isinstance(ts, str) and len(ts) >= 10 and ts[4] == "-" and ts[7] == "-":
+        return ts[:10]
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class HookListener:
+    """Receives hook events on a Unix datagram socket and writes them in
+    batches on its own thread and DB connection."""
+
+    def __init__(self, path: str = SOCKET_PATH, log_dir: Path = TELEMETRY_DIR):
+        self.path = path
+        self.log_dir = log_dir
+        self.received = self.stored = self.rejected = 0
+        self._sock: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="cc-hooks", daemon=True)
+
+    def start(self) -> bool:
+        """Bind the socket and start listening. False (hooks keep writing
+        the JSONL file themselves) when disabled or the socket is taken."""
+        if not self.path:
+            logger.info("Hook socket disabled (CC_TELEMETRY_HOOK_SOCKET is empty)")
+            return False
+        try:
+            self._sock = self._bind()
+        except OSError as e:
+            logger.warning("Hook socket %s unavailable: %s", self.path, e)
+            return False
+        if self._sock is None:
+            logger.warning("Hook socket %s is served by another process", self.path)
+            return False
+        self._thread.start()
+        logger.info("Listening for hook events on %s", self.path)
+        return True
+
+    def _bind(self) -> Optional[socket.socket]:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                probe.connect(self.path)
+                return None  # someone is listening
+            except OSError:
+                os.unlink(self.path)  # left behind by a daemon that died
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+        except OSError:
+            pass
+        old_umask = os.umask(0o177)  # owner-only, from the moment it exists
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.settimeout(HOOK_BATCH_SECONDS / 2)
+        return sock
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self._sock is not None:
+            self._sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self._sock = None
+
+    def _loop(self) -> None:
+        conn = db.open_db()
+        pending: list[tuple[dict, bytes]] = []
+        oldest = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    data = self._sock.recv(MAX_DATAGRAM)
+                except socket.timeout:
+                    data = None
+                except OSError as e:
+                    logger.warning("Hook socket receive failed: %s", e)
+                    data = None
+                if data:
+                    self.received += 1
+                    try:
+                        event = json.loads(data)
+                        if not isinstance(event, dict):
+                            raise ValueError("not an object")
+                    except ValueError:
+                        self.rejected += 1
+                    else:
+                        if not pending:
+                            oldest = time.monotonic()
+                        pending.append((event, data))
+                if pending and (len(pending) >= HOOK_BATCH_ROWS
+                                or time.monotonic() - oldest >= HOOK_BATCH_SECONDS):
+                    self._flush(conn, pending)
+                    pending = []
+            self._drain(conn, pending)
+        finally:
+            conn.close()
+
+    def _drain(self, conn: sqlite3.Connection, pending: list) -> None:
+        """Write what is pending plus whatever is still queued on the socket."""
+        self._sock.setblocking(False)
+        while True:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM)
+            except OSError:
+                break
+            try:
+                event = json.loads(data)
+            except ValueError:
+                self.rejected += 1
+                continue
+            if isinstance(event, dict):
+                pending.append((event, data))
+        if pending:
+            self._flush(conn, pending)
+
+    def _flush(self, conn: sqlite3.Connection, pending: list[tuple[dict, bytes]]) -> None:
+        # The table first, so hook_tail.py finds these rows already stored
+        # when it reads the lines; if the insert fails, it stores them from
+        # the log instead (event_id makes that safe)
+        try:
+            self.stored += db.insert_hook_log(conn, [ev for ev, _ in pending], "socket")
+        except sqlite3.Error as e:
+            logger.warning("Could not store %d hook event(s): %s", len(pending), e)
+        try:
+            append_jsonl(self.log_dir, [(_event_date(ev), raw) for ev, raw in pending])
+        except OSError as e:
+            logger.warning("Could not append %d hook event(s) to the log: %s", len(pending), e)
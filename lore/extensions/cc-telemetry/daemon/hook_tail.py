@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tail the plugin hooks' daily JSONL logs into hook_log.
+
+    ~/.claude/telemetry/<YYYY-MM-DD>.jsonl
+
+Every hook event ends up in these files: hooks append to them when the
+daemon's socket is not there, and the socket listener (hook_socket.py)
+appends what it receives. The tailer reuses TranscriptWatcher on the log
+directory, so reads are incremental and their positions are checkpointed
+in ingest_checkpoints with the rows they produced. Rows are keyed by the
+hook's event_id, so events the socket listener already stored are skipped;
+lines without one (written before hooks set it) get an id derived from
+their content. Inserting a PostToolUse pairs it with its PreToolUse in
+tool_spans (see db.pair_tool_spans).
+
+On first start, existing logs within hook_log's retention period are read
+from the beginning; older ones are left alone.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import db
+import retention
+from watcher import TranscriptWatcher, CheckpointStore
+from hook_socket import TELEMETRY_DIR
+
+logger = logging.getLogger("cc_telemetry.hook_tail")
+
+
+def _line_event_id(line: str) -> str:
+    return hashlib.sha1(line.encode("utf-8")).hexdigest()[:16]
+
+
+class HookLogTailer(CheckpointStore):
+    """Loads new hook log lines into hook_log on its own thread and DB
+    connection, committing each chunk with its checkpoint."""
+
+    def __init__(self, log_dir: Path = TELEMETRY_DIR):
+        self.log_dir = log_dir
+        self.conn: Optional[sqlite3.Connection] = None
+        self.stored = self.rejected = 0
+        self._pending: list[dict] = []
+        self._checkpoints: dict[str, dict] = {}
+        days = retention.load_policy().get("hook_log")
+        self.watcher = TranscriptWatcher(
+            self._on_line, checkpoints=self, root=log_dir, pattern="*.jsonl",
+            backlog_since=time.time() - days * 86400 if days else 0.0)
+        self._thread = threading.Thread(target=self._run, name="cc-hook-tail", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.watcher.stop()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def run_once(self) -> None:
+        """Read everything new and return (daemon.py --once)."""
+        self._open()
+        try:
+            self.watcher.scan_existing()
+            self.watcher.catch_up()
+        finally:
+            self._close()
+
+    def _run(self) -> None:
+        self._open()
+        try:
+            self.watcher.run_forever()
+        except Exception as e:
+            logger.error("Hook log tailer stopped: %s", e)
+        finally:
+            self._close()
+
+    def _open(self) -> None:
+        self.conn = db.open_db()
+        self._checkpoints = db.load_checkpoints(self.conn)
+
+    def _close(self) -> None:
+        self.conn.close()
+        self.conn = None
+        logger.info("Hook log tailer: %d new row(s), %d unreadable line(s)",
+                    self.stored, self.rejected)
+
+    def _on_line(self, path: str, line: str) -> None:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict) or not event.get("event"):
+            self.rejected += 1
+            return
+        if not event.get("event_id"):
+            event["event_id"] = _line_event_id(line)
+        self._pending.append(event)
+
+    # --- CheckpointStore ---
+
+    def load(self, path: str) -> Optional[tuple[int, int]]:
+        saved = self._checkpoints.get(path)
+        return (saved["inode"], saved["offset"]) if saved else None
+
+    def save(self, path: str, inode: int, offset: int, origin: int = 0) -> None:
+        # Called after each chunk of a file: its lines and the new read
+        # position are committed together
+        pending, self._pending = self._pending, []
+        try:
+            with db.transaction(self.conn):
+                if pending:
+                    self.stored += db.insert_hook_log(self.conn, pending, "jsonl")
+                db.save_checkpoint(self.conn, path, inode, offset, None, origin)
+        except Exception:
+            self._checkpoints = db.load_checkpoints(self.conn)  # the watcher rewinds to these
+            raise
+        self._checkpoints[path] = {"inode": inode, "offset": offset, "origin": origin}
+
+    def discard(self, path: str) -> None:
+        self._checkpoints.pop(path, None)
@@ -8,11 +8,14 @@ Transcript format (one JSON object per line):
                       and text blocks (user messages)
   - type="progress":  data.type="hook_progress", data.hookEvent, data.hookName, data.command
   - type="file-history-snapshot": ignore
+
+Lines that would be ignored anyway (snapshots, non-hook progress) are
+recognised from their first bytes and never decoded; see needs_decode().
 """
 
+import re
 import json
 import logging
-from datetime import datetime, timezone
 from typing import Optional
 
 import db
@@ -20,14 +23,66 @@ import db
 logger = logging.getLogger("cc_telemetry.parser")
 
 
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+# Use a faster JSON decoder when one is installed
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS: tuple = (orjson.JSONDecodeError,)
+    DECODER = "orjson"
+except ImportError:
+    try:
+        import msgspec
+        _loads = msgspec.json.Decoder().decode
+        _DECODE_ERRORS = (msgspec.DecodeError,)
+        DECODER = "msgspec"
+    except ImportError:
+        _loads = json.loads
+        _DECODE_ERRORS = (json.JSONDecodeError,)
+        DECODER = "json"
+
+# Only this much of a line is inspected before deciding to decode it
+CLASSIFY_HEAD = 1024
+
+# Entry types that carry nothing we store
+_SKIP_TYPES = {"file-history-snapshot"}
+
+# Top-level "type" when it is the first key (snapshots, queue operations, ...)
+_RE_LEADING_TYPE = re.compile(r'^\{\s*"type"\s*:\s*"([^"\\]+)"')
+
+# Otherwise a progress entry is recognised by "type":"progress" immediately
+# followed by its data object, a shape that does not occur nested in
+# assistant/user entries.
+_RE_PROGRESS = re.compile(r'"type"\s*:\s*"progress"\s*,\s*"data"\s*:')
+_RE_DATA_KIND = re.compile(r'"data"\s*:\s*\{\s*"type"\s*:\s*"([^"\\]+)"')
+
+
+def needs_decode(line: str) -> bool:
+    """
+    Cheap pre-decode check on the head of a raw line. Returns False only for
+    lines positively identified as ignorable; anything ambiguous is decoded.
+    """
+    head = line[:CLASSIFY_HEAD]
+    m = _RE_LEADING_TYPE.match(head)
+    entry_type = m.group(1) if m else None
+    if entry_type in _SKIP_TYPES:
+        return False
+    if entry_type == "progress" or _RE_PROGRESS.search(head):
+        m = _RE_DATA_KIND.search(head)
+        if m and m.group(1) != "hook_progress":
+            return False
+    return True
+
+
 def _ts_diff_ms(start_ts: str, end_ts: str) -> Optional[int]:
     """Compute millisecond difference between two ISO timestamps."""
-    try:
-        t1 = datetime.fromisoformat(start_ts.replace("Z", "+00:00"))
-        t2 = datetime.fromisoformat(end_ts.replace("Z", "+00:00"))
-        return int((t2 - t1).total_seconds() * 1000)
-    except Exception:
+    t1, t2 = db.ts_ms(start_ts), db.ts_ms(end_ts)
+    if t1 is None or t2 is None:
         return None
+    return t2 - t1
 
 
 def _truncate(text: str, max_len: int = 500) -> Optional[str]:
@@ -58,27 +113,53 @@ class TranscriptParser:
     """
     Stateful parser for a single transcript file.
     Maintains pending_tool_calls so we can match tool_use → tool_result.
+    Rows are queued on a db.WriteBatch; the owner decides when to flush.
     """
 
-    def __init__(self, conn, transcript_path: str):
-        self.conn = conn
+    def __init__(self, batch: db.WriteBatch, transcript_path: str):
+        self.batch = batch
         self.transcript_path = transcript_path
         # Maps tool_use_id -> started_at timestamp
         self.pending: dict[str, str] = {}
+        # Maps tool_use_id -> input_json, kept for error context
+        self.pending_inputs: dict[str, str] = {}
         # Track recent tool calls for error context (last 5)
         self.recent_tool_calls: list[str] = []
         # Track last thinking block to correlate with errors
         self.last_thinking: Optional[str] = None
 
+    def dump_state(self) -> str:
+        """Serialize the in-flight state so a restart can resume mid-session."""
+        return json.dumps({
+            "pending": self.pending,
+            "pending_inputs": self.pending_inputs,
+            "recent_tool_calls": self.recent_tool_calls,
+            "last_thinking": self.last_thinking[:2000] if self.last_thinking else None,
+        })
+
+    def load_state(self, raw: str) -> None:
+        """Restore state produced by dump_state(); ignores unreadable payloads."""
+        try:
+            state = json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            logger.debug("Unreadable parser state for %s", self.transcript_path)
+            return
+        self.pending = dict(state.get("pending") or {})
+        self.pending_inputs = dict(state.get("pending_inputs") or {})
+        self.recent_tool_calls = list(state.get("recent_tool_calls") or [])[-5:]
+        self.last_thinking = state.get("last_thinking")
+
     def process_line(self, raw_line: str) -> None:
         raw_line = raw_line.strip()
-        if not raw_line:
+        if not raw_line or not needs_decode(raw_line):
             return
         try:
-            entry = json.loads(raw_line)
-        except json.JSONDecodeError:
+            entry = _loads(raw_line)
+        except _DECODE_ERRORS:
             logger.debug("Bad JSON line: %s", raw_line[:80])
             return
+        if not isinstance(entry, dict):
+            return
 
         entry_type = entry.get("type")
         session_id = entry.get("sessionId")
@@ -91,7 +172,7 @@ class TranscriptParser:
         entry["_transcript_path"] = self.transcript_path
 
         # Always upsert session (idempotent)
-        db.upsert_session(self.conn, entry)
+        self.batch.upsert_session(entry)
 
         if entry_type == "assistant":
             self._handle_assistant(entry, session_id, ts)
@@ -112,8 +193,8 @@ class TranscriptParser:
         model = msg.get("model")
 
         if usage or request_id or model:
-            db.insert_api_metadata(
-                self.conn, session_id, uuid, request_id, model,
+            self.batch.insert_api_metadata(
+                session_id, uuid, request_id, model,
                 usage.get("input_tokens") if usage else None,
                 usage.get("output_tokens") if usage else None,
                 usage.get("cache_read_input_tokens") if usage else None,
@@ -134,8 +215,8 @@ class TranscriptParser:
                     self.last_thinking = thinking_text
                     # Estimate tokens (rough: 4 chars per token)
                     tokens = len(thinking_text) // 4
-                    db.insert_thinking_block(
-                        self.conn, session_id, uuid, thinking_text,
+                    self.batch.insert_thinking_block(
+                        session_id, uuid, thinking_text,
                         tokens, False, ts  # led_to_error updated later if error follows
                     )
 
@@ -147,20 +228,21 @@ class TranscriptParser:
 
                 if tool_use_id:
                     self.pending[tool_use_id] = ts
+                    self.pending_inputs[tool_use_id] = input_json
                     self.recent_tool_calls.append(tool_use_id)
                     if len(self.recent_tool_calls) > 5:
                         self.recent_tool_calls.pop(0)
 
-                    db.insert_tool_call(
-                        self.conn, session_id, tool_use_id, tool_name, input_json, ts
+                    self.batch.insert_tool_call(
+                        session_id, tool_use_id, tool_name, input_json, ts
                     )
                     logger.debug("tool_use: %s %s", tool_name, tool_use_id)
 
             elif btype == "text":
                 text = block.get("text", "")
                 if text.strip():
-                    db.insert_message(
-                        self.conn, session_id, uuid,
+                    self.batch.insert_message(
+                        session_id, uuid,
                         "assistant", "text", _truncate(text, 300), ts
                     )
 
@@ -190,16 +272,16 @@ class TranscriptParser:
                             elif "launching" in text.lower() or "base directory" in text.lower():
                                 msg_type = "skill_load"
 
-                            db.insert_system_message(
-                                self.conn, session_id, uuid, msg_type, text, ts
+                            self.batch.insert_system_message(
+                                session_id, uuid, msg_type, text, ts
                             )
             return
 
         # content can be a list of blocks or a plain string
         if isinstance(content, str):
             if content.strip():
-                db.insert_message(self.conn, session_id, uuid, "user", "text",
-                                  _truncate(content, 300), ts)
+                self.batch.insert_message(session_id, uuid, "user", "text",
+                                          _truncate(content, 300), ts)
             return
 
         for block in content:
@@ -221,11 +303,12 @@ class TranscriptParser:
                 )
 
                 start_ts = self.pending.pop(tool_use_id, None) if tool_use_id else None
+                tool_input_full = self.pending_inputs.pop(tool_use_id, None) if tool_use_id else None
                 duration_ms = _ts_diff_ms(start_ts, ts) if start_ts else None
 
                 if tool_use_id:
-                    db.complete_tool_call(
-                        self.conn, tool_use_id, result_preview,
+                    self.batch.complete_tool_call(
+                        tool_use_id, result_preview,
                         is_error, ts, duration_ms
                     )
                     logger.debug(
@@ -246,23 +329,11 @@ class TranscriptParser:
                             if stack_lines:
                                 stack_trace = "\n".join(stack_lines[:20])  # Limit stack trace size
 
-                        # Get tool input from database
-                        tool_input_full = None
-                        try:
-                            row = self.conn.execute(
-                                "SELECT input_json FROM tool_calls WHERE tool_use_id=?",
-                                (tool_use_id,)
-                            ).fetchone()
-                            if row:
-                                tool_input_full = row[0]
-                        except Exception:
-                            pass
-
                         # Get context: last 5 tool calls
                         context_json = json.dumps(self.recent_tool_calls[-5:]) if self.recent_tool_calls else None
 
-                        db.insert_error(
-                            self.conn, session_id, tool_use_id,
+                        self.batch.insert_error(
+                            session_id, tool_use_id,
                             result_text[:5000],  # Full error message (limited)
                             stack_trace,
                             tool_input_full,
@@ -278,16 +349,15 @@ class TranscriptParser:
             elif btype == "text":
                 text = block.get("text", "")
                 if text.strip():
-                    db.insert_message(self.conn, session_id, uuid, "user", "text",
-                                      _truncate(text, 300), ts)
+                    self.batch.insert_message(session_id, uuid, "user", "text",
+                                              _truncate(text, 300), ts)
 
     def _handle_progress(self, entry: dict, session_id: str, ts: str) -> None:
         data = entry.get("data", {})
         if data.get("type") != "hook_progress":
             return
 
-        db.insert_hook_event(
-            conn=self.conn,
+        self.batch.insert_hook_event(
             session_id=session_id,
             tool_use_id=entry.get("toolUseID"),
             hook_event=data.get("hookEvent"),
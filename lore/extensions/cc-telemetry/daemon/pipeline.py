@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Threaded ingestion pipeline for the cc-telemetry daemon (`daemon.py --pipeline`).
+
+    watcher ──lines──▶ parser worker(s) ──WriteBatch──▶ bounded queue ──▶ writer ──▶ SQLite
+
+The watcher thread keeps reading files while parser workers turn lines into
+row batches. Files are sharded across workers by path, so each transcript's
+pending state lives in exactly one worker. A single writer thread owns the
+SQLite connection. When SQLite stalls (a reader holding a lock, a slow WAL
+checkpoint), the bounded queues fill up and block the watcher rather than
+buffering without limit. Flushes that fail on a busy or locked DB are
+retried; rows that cannot be written are skipped by WriteBatch.flush; a
+batch failing any other way is dropped with an error, and its lines are
+read again after a restart (their checkpoints were in that batch).
+
+Queue depth, put wait times and flush timings are written periodically to a
+JSON status file that `daemon.py --status` prints.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import db
+from parser import TranscriptParser
+from watcher import CheckpointStore, peak_rss_mb
+
+logger = logging.getLogger("cc_telemetry.pipeline")
+
+# Capacity of each bounded queue (items, i.e. per-file line chunks / batches)
+QUEUE_SIZE = int(os.environ.get("CC_TELEMETRY_QUEUE_SIZE", "64"))
+
+# Seconds between status snapshots
+STATUS_INTERVAL = 2.0
+
+# Seconds between retries of a failed flush
+RETRY_DELAY = 1.0
+
+# Flush attempts on shutdown before giving up (checkpoints stay behind, so
+# the unwritten lines are simply re-read on the next start)
+SHUTDOWN_RETRIES = 3
+
+_STOP = object()
+
+
+class PipelineStats:
+    """Counters shared by the watcher, parser and writer threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lines_parsed = 0
+        self.puts = 0
+        self.puts_blocked = 0
+        self.put_wait_total_ms = 0.0
+        self.put_wait_max_ms = 0.0
+        self.write_queue_max = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.flush_ms_total = 0.0
+        self.flush_ms_max = 0.0
+
+    def record_put(self, waited_ms: float, write_depth: Optional[int] = None) -> None:
+        with self._lock:
+            self.puts += 1
+            if waited_ms >= 1.0:
+                self.puts_blocked += 1
+            self.put_wait_total_ms += waited_ms
+            self.put_wait_max_ms = max(self.put_wait_max_ms, waited_ms)
+            if write_depth is not None:
+                self.write_queue_max = max(self.write_queue_max, write_depth)
+
+    def record_lines(self, n: int) -> None:
+        with self._lock:
+            self.lines_parsed += n
+
+    def record_flush(self, rows: int, ms: float) -> None:
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += rows
+            self.flush_ms_total += ms
+            self.flush_ms_max = max(self.flush_ms_max, ms)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.flush_failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "lines_parsed": self.lines_parsed,
+                "puts": self.puts,
+                "puts_blocked": self.puts_blocked,
+                "put_wait_total_ms": round(self.put_wait_total_ms, 1),
+                "put_wait_max_ms": round(self.put_wait_max_ms, 1),
+                "write_queue_max": self.write_queue_max,
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "rows_written": self.rows_written,
+                "flush_ms_avg": round(self.flush_ms_total / self.flushes, 1) if self.flushes else None,
+                "flush_ms_max": round(self.flush_ms_max, 1),
+            }
+
+
+class Pipeline(CheckpointStore):
+    """
+    Drop-in replacement for DaemonState: exposes process_line() as the
+    watcher's line callback and acts as its CheckpointStore. Lines for a file
+    are collected until the watcher saves that file's checkpoint, then handed
+    to the file's parser worker as one chunk.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, workers: int = 1,
+                 queue_size: int = QUEUE_SIZE, status_path: Optional[Path] = None):
+        self.conn = conn
+        self.stats = PipelineStats()
+        self.status_path = status_path
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+
+        saved = db.load_checkpoints(conn)
+        # Watcher-thread view of committed/queued positions
+        self._positions = {p: (c["inode"], c["offset"]) for p, c in saved.items()}
+        # Parser state to restore, consumed by the owning worker
+        self._initial_states = {p: c["parser_state"] for p, c in saved.items() if c["parser_state"]}
+        self._pending_lines: dict[str, list[str]] = {}
+
+        self._parse_queues = [queue.Queue(maxsize=queue_size) for _ in range(self.workers)]
+        self._write_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._parse_loop, args=(q,), name=f"cc-parse-{i}", daemon=True)
+            for i, q in enumerate(self._parse_queues)
+        ]
+        self._writer = threading.Thread(target=self._write_loop, name="cc-writer", daemon=True)
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        for t in self._threads:
+            t.start()
+        self._writer.start()
+        logger.info("Pipeline started (%d parser worker(s), queue size %d)",
+                    self.workers, self.queue_size)
+
+    def close(self) -> None:
+        """Drain the queues, flush what is left and stop all threads."""
+        for q in self._parse_queues:
+            q.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._write_queue.put(_STOP)
+        self._writer.join()
+        self._write_status()
+
+    # --- watcher side ---
+
+    def process_line(self, transcript_path: str, line: str) -> None:
+        self._pending_lines.setdefault(transcript_path, []).append(line)
+
+    def _shard(self, path: str) -> queue.Queue:
+        return self._parse_queues[zlib.crc32(path.encode()) % self.workers]
+
+    def _put(self, q: queue.Queue, item, track_depth: bool = False) -> None:
+        t0 = time.monotonic()
+        q.put(item)  # blocks when full: this is the backpressure
+        waited_ms = (time.monotonic() - t0) * 1000
+        self.stats.record_put(waited_ms, q.qsize() if track_depth else None)
+
+    def load(self, path: str) -> Optional[tuple[int, int]]:
+        return self._positions.get(path)
+
+    def save(self, path: str, inode: int, offset: int, origin: int = 0) -> None:
+        self._positions[path] = (inode, offset)
+        lines = self._pending_lines.pop(path, [])
+        self._put(self._shard(path), ("lines", path, lines, inode, offset, origin))
+
+    def discard(self, path: str) -> None:
+        self._pending_lines.pop(path, None)
+        self._put(self._shard(path), ("discard", path))
+
+    # --- parser workers ---
+
+    def _parse_loop(self, inbox: queue.Queue) -> None:
+        parsers: dict[str, TranscriptParser] = {}
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            if item[0] == "discard":
+                parsers.pop(item[1], None)
+                self._initial_states.pop(item[1], None)
+                continue
+
+            _, path, lines, inode, offset, origin = item
+            batch = db.WriteBatch()
+            if not lines and path not in parsers:
+                # Position-only update (e.g. startup scan): no parser needed
+                batch.save_checkpoint(path, inode, offset, self._initial_states.get(path), origin)
+                self._put(self._write_queue, batch, track_depth=True)
+                continue
+            parser = parsers.get(path)
+            if parser is None:
+                parser = TranscriptParser(batch, path)
+                initial = self._initial_states.pop(path, None)
+                if initial:
+                    parser.load_state(initial)
+                parsers[path] = parser
+            parser.batch = batch
+
+            for line in lines:
+                try:
+                    parser.process_line(line)
+                except Exception as e:
+                    logger.error("parse error in %s: %s", path, e)
+            batch.save_checkpoint(path, inode, offset, parser.dump_state(), origin)
+            self.stats.record_lines(len(lines))
+            self._put(self._write_queue, batch, track_depth=True)
+
+    # --- writer ---
+
+    def _flush(self, pending: db.WriteBatch, stopping: bool) -> None:
+        """Flush `pending`, retrying while the DB is busy. Never raises: the
+        writer thread must outlive any one batch, or the watcher blocks on
+        the full queue for good."""
+        attempts = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                rows = pending.flush(self.conn)
+            except Exception as e:
+                attempts += 1
+                self.stats.record_failure()
+                if not db.is_transient(e):
+                    logger.error("Flush failed (%s: %s); dropping %d row(s), which will be "
+                                 "re-read on restart", type(e).__name__, e, len(pending))
+                    pending.clear()
+                    return
+                if stopping and attempts >= SHUTDOWN_RETRIES:
+                    logger.error("Giving up on final flush (%s); lines will be re-read on restart", e)
+                    pending.clear()
+                    return
+                logger.warning("Flush failed (%s); retrying in %.1fs", e, RETRY_DELAY)
+                time.sleep(RETRY_DELAY)
+                continue
+            self.stats.record_flush(rows, (time.monotonic() - t0) * 1000)
+            return
+
+    def _write_loop(self) -> None:
+        pending = db.WriteBatch()
+        last_status = 0.0
+        stopping = False
+        while not stopping:
+            try:
+                item = self._write_queue.get(timeout=min(pending.max_age, STATUS_INTERVAL))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                pending.extend(item)
+
+            if pending.due() or stopping:
+                self._flush(pending, stopping)
+
+            if time.monotonic() - last_status >= STATUS_INTERVAL:
+                self._write_status()
+                last_status = time.monotonic()
+
+    # --- status ---
+
+    def status(self) -> dict:
+        return {
+            "mode": "pipeline",
+            "pid": os.getpid(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "parse_queue_depth": sum(q.qsize() for q in self._parse_queues),
+            "write_queue_depth": self._write_queue.qsize(),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            **self.stats.snapshot(),
+        }
+
+    def _write_status(self) -> None:
+        if self.status_path is None:
+            return
+        try:
+            tmp = self.status_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.status(), indent=2))
+            os.replace(tmp, self.status_path)
+        except OSError as e:
+            logger.debug("Could not write status file: %s", e)
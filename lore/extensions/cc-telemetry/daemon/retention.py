@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Retention for the cc-telemetry DB (`cc-telemetry gc`, and periodically in
+the daemon).
+
+Raw rows older than their table's retention period are appended to
+gzip-compressed monthly NDJSON archives next to the DB
+
+    ~/.claude/telemetry/archive/<table>/<YYYY-MM>.ndjson.gz
+
+and then deleted, a small chunk per transaction so the live writer is never
+blocked for long. Blobs no longer referenced by any row go with them, and
+the freed pages are handed back to the filesystem with
+PRAGMA incremental_vacuum.
+
+sessions, session_stats and latency_hist are never pruned: session
+listings, totals and latency percentiles keep covering the full history.
+The newest timestamp deleted from each table is kept as its GC watermark,
+so rebuilding those rollups leaves what predates it alone (see
+db.gc_watermark).
+Archiving is at-least-once: a crash between writing a chunk and deleting it
+archives that chunk again on the next run.
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import db
+
+logger = logging.getLogger("cc_telemetry.retention")
+
+# Days of raw rows kept per table; None keeps a table forever.
+# CC_TELEMETRY_RETENTION overrides entries, e.g. "thinking_blocks=7,tool_calls=0"
+# (0 also means forever).
+RETENTION_DAYS: dict[str, Optional[int]] = {
+    "thinking_blocks": 30,
+    "hook_events": 30,
+    "hook_log": 30,
+    "tool_spans": 365,
+    "messages": 90,
+    "system_messages": 90,
+    "api_metadata": 180,
+    "errors": 365,
+    "tool_calls": 365,
+}
+
+# Seconds between runs in the daemon (0 disables), and before the first one
+GC_INTERVAL = float(os.environ.get("CC_TELEMETRY_GC_INTERVAL", str(6 * 3600)))
+GC_START_DELAY = 300.0
+
+# Rows archived and deleted per transaction, and the pause between chunks
+GC_CHUNK_ROWS = 2000
+GC_CHUNK_PAUSE = 0.05
+
+# gzip level for archives (9, gzip's default, is ~5x slower for ~3% smaller files)
+ARCHIVE_COMPRESS_LEVEL = 6
+
+# Pages released per PRAGMA incremental_vacuum step
+VACUUM_STEP_PAGES = 2048
+
+# Timestamp each table expires by (the rest use ts_ms)
+_TS_COLUMN = {"tool_calls": "started_at_ms", "tool_spans": "started_ms"}
+
+DAY_MS = 86_400_000
+
+
+def archive_dir() -> Path:
+    return db.get_db_path().parent / "archive"
+
+
+def load_policy(spec: Optional[str] = None) -> dict[str, Optional[int]]:
+    """RETENTION_DAYS with the overrides in `spec` (default: the env var)."""
+    policy = dict(RETENTION_DAYS)
+    spec = spec if spec is not None else os.environ.get("CC_TELEMETRY_RETENTION", "")
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        table, _, days = item.partition("=")
+        table = table.strip()
+        if table not in policy:
+            raise ValueError(f"unknown table in retention policy: {table!r}")
+        try:
+            policy[table] = int(days) or None
+        except ValueError:
+            raise ValueError(f"bad retention for {table}: {days!r} (expected days)")
+    return policy
+
+
+# ---------------------------------------------------------------------------
+# Archive + delete
+# ---------------------------------------------------------------------------
+
+def _month(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _append_archive(table: str, month: str, records: list[dict]) -> None:
+    path = archive_dir() / table / f"{month}.ndjson.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Appending adds a gzip member; zcat and gzip.open read them as one stream
+    data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="ab", compresslevel=ARCHIVE_COMPRESS_LEVEL) as f:
+            f.write(data.encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def expired_summary(conn: sqlite3.Connection, table: str, cutoff: int) -> dict:
+    """Count and timestamp range of the rows older than `cutoff` (epoch ms)."""
+    col = _TS_COLUMN.get(table, "ts_ms")
+    n, first, last = conn.execute(
+        f"SELECT COUNT(*), MIN({col}), MAX({col}) FROM {table} WHERE {col} < ?", (cutoff,)
+    ).fetchone()
+    return {
+        "expired": n,
+        "months": sorted({_month(first), _month(last)}) if n else [],
+    }
+
+
+def prune_table(conn: sqlite3.Connection, table: str, cutoff: int,
+                stop: Callable[[], bool] = lambda: False) -> dict:
+    """Archive and delete rows of `table` older than `cutoff`, chunk by chunk."""
+    col = _TS_COLUMN.get(table, "ts_ms")
+    hash_cols = [f"{c}_hash" for c in db.BLOB_COLUMNS.get(table, ())]
+    deleted = blobs = 0
+    while not stop():
+        rows = conn.execute(
+            f"SELECT * FROM {table} WHERE {col} < ? ORDER BY {col} LIMIT ?",
+            (cutoff, GC_CHUNK_ROWS),
+        ).fetchall()
+        if not rows:
+            break
+        ids = [(r["id"],) for r in rows]
+        hashes = {r[h] for r in rows for h in hash_cols if r[h] is not None}
+
+        by_month: dict[str, list[dict]] = {}
+        for r in db.with_text(conn, table, rows):
+            by_month.setdefault(_month(r[col]), []).append(r)
+        for month, records in by_month.items():
+            _append_archive(table, month, records)
+
+        with db.transaction(conn):
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", ids)
+            db.record_gc_watermark(conn, table, rows[-1][col])
+            if hashes:
+                blobs += db.drop_unreferenced_blobs(conn, hashes)
+        deleted += len(ids)
+        time.sleep(GC_CHUNK_PAUSE)
+    return {"deleted": deleted, "blobs": blobs}
+
+
+def incremental_vacuum(conn: sqlite3.Connection,
+                       stop: Callable[[], bool] = lambda: False) -> int:
+    """Release free pages in small steps. Returns pages released (0 when
+    the DB is not in auto_vacuum=INCREMENTAL mode)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    released = 0
+    while not stop():
+        (free,) = conn.execute("PRAGMA freelist_count").fetchone()
+        if not free:
+            break
+        # execute() steps the pragma once, which frees a single page;
+        # executescript() runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+        (left,) = conn.execute("PRAGMA freelist_count").fetchone()
+        released += free - left
+        if left >= free:
+            break
+        time.sleep(GC_CHUNK_PAUSE)
+    return released
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def run_gc(conn: sqlite3.Connection, policy: Optional[dict] = None, dry_run: bool = False,
+           now_ms: Optional[int] = None, stop: Callable[[], bool] = lambda: False) -> dict:
+    """
+    Apply the retention policy. With dry_run only counts what would go.
+    Returns {"tables": {table: {days, cutoff, expired, months, deleted,
+    blobs}}, "pages_released", "seconds"}.
+    """
+    policy = policy if policy is not None else load_policy()
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    t0 = time.monotonic()
+    summary = {"tables": {}, "pages_released": 0, "dry_run": dry_run}
+
+    for table, days in policy.items():
+        if not days:
+            continue
+        cutoff = now_ms - days * DAY_MS
+        info = {"days": days, "cutoff": cutoff, **expired_summary(conn, table, cutoff),
+                "deleted": 0, "blobs": 0}
+        summary["tables"][table] = info
+        if dry_run or not info["expired"] or stop():
+            continue
+        info.update(prune_table(conn, table, cutoff, stop))
+        logger.info("GC %s: archived and deleted %d row(s) older than %d days (%d blob(s) freed)",
+                    table, info["deleted"], days, info["blobs"])
+
+    if not dry_run:
+        summary["pages_released"] = incremental_vacuum(conn, stop)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logger.info("GC: DB is not in incremental auto-vacuum mode; run "
+                        "`cc-telemetry storage --vacuum` once to shrink the file")
+    summary["seconds"] = time.monotonic() - t0
+    deleted = sum(t["deleted"] for t in summary["tables"].values())
+    if deleted or summary["pages_released"]:
+        logger.info("GC done in %.1fs: %d row(s) deleted, %.1f MB released",
+                    summary["seconds"], deleted, summary["pages_released"] * conn.execute("PRAGMA page_size").fetchone()[0] / 1e6)
+    return summary
+
+
+class RetentionScheduler:
+    """Runs run_gc every GC_INTERVAL seconds on its own thread and
+    connection, so pruning never happens on the ingestion thread."""
+
+    def __init__(self, interval: float = GC_INTERVAL, delay: float = GC_START_DELAY):
+        self.interval = interval
+        self.delay = delay
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="cc-gc", daemon=True)
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            logger.info("Retention GC disabled (CC_TELEMETRY_GC_INTERVAL=0)")
+            return
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _loop(self) -> None:
+        conn = db.open_db()
+        try:
+            wait = self.delay
+            while not self._stop.wait(wait):
+                try:
+                    run_gc(conn, stop=self._stop.is_set)
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    logger.warning("Retention GC failed: %s", e)
+                wait = self.interval
+        finally:
+            conn.close()
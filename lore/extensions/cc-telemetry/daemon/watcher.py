@@ -3,17 +3,29 @@
 File system watcher for Claude Code transcript JSONL files.
 
 Watches ~/.claude/projects/**/*.jsonl and tails new lines as CC writes them.
-Uses polling (no external dependencies required). Handles:
+No external dependencies required. Handles:
   - New session files appearing
   - Existing files growing (new lines appended)
   - Symlinks and nested project dirs
+
+Change detection is pluggable (CC_TELEMETRY_WATCHER):
+  - "inotify": Linux inotify via ctypes; only touched files are re-read
+  - "poll":    rescan the whole tree every POLL_INTERVAL seconds
+  - "auto":    inotify when available, polling otherwise (default)
 """
 
 import os
+import sys
 import time
+import errno
+import select
+import struct
 import logging
+import ctypes
+import ctypes.util
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 
 logger = logging.getLogger("cc_telemetry.watcher")
 
@@ -23,6 +35,26 @@ CC_PROJECTS_DIR = Path(os.path.expanduser("~/.claude/projects"))
 # Poll interval (seconds)
 POLL_INTERVAL = float(os.environ.get("CC_TELEMETRY_POLL_INTERVAL", "1.0"))
 
+# Change-detection backend: auto | inotify | poll
+WATCHER_BACKEND = os.environ.get("CC_TELEMETRY_WATCHER", "auto").lower()
+
+# Full rescan interval on event-driven backends (safety net for missed events)
+RESCAN_INTERVAL = float(os.environ.get("CC_TELEMETRY_RESCAN_INTERVAL", "300"))
+
+# Bytes read per chunk when tailing; bounds memory on large appends
+READ_CHUNK = int(os.environ.get("CC_TELEMETRY_READ_CHUNK", str(1 << 20)))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0.0 where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
 
 class FileState:
     """Track read state for a single transcript file."""
@@ -30,119 +62,459 @@ class FileState:
     def __init__(self, path: Path):
         self.path = path
         self.inode: int = 0
-        self.offset: int = 0  # byte offset of last read
+        self.offset: int = 0  # byte offset of last committed read
+        # Position tracking started from; the rewind target when no
+        # checkpoint has been committed yet
+        self.initial: tuple[int, int] = (0, 0)
+
+
+class CheckpointStore:
+    """
+    Persistence hooks for read positions. The default keeps nothing, so a
+    restart tails from EOF again; the daemon supplies a DB-backed store.
+
+    The watcher wraps each round of reads in `batch()` and calls `save()` after
+    delivering each chunk of a file's lines, inside that batch. Stores may
+    commit from `save()` to bound memory on large reads. Offsets only advance
+    in memory once the batch exits cleanly; if it raises, every file is
+    rewound to `load()`.
+
+    `origin` is the offset live tailing of this inode started from: the EOF
+    position for files that existed at startup, 0 for new or replaced files.
+    Everything before it is left to `daemon.py --backfill`.
+    """
+
+    def load(self, path: str) -> Optional[tuple[int, int]]:
+        """Return the saved (inode, offset) for `path`, if any."""
+        return None
+
+    @contextmanager
+    def batch(self):
+        yield
+
+    def save(self, path: str, inode: int, offset: int, origin: int = 0) -> None:
+        pass
+
+    def discard(self, path: str) -> None:
+        """Forget per-file state after the file was replaced or truncated."""
+
+
+# ---------------------------------------------------------------------------
+# Change-detection backends
+# ---------------------------------------------------------------------------
+
+class WatchLimitReached(OSError):
+    """Raised when the kernel refuses more inotify watches (ENOSPC)."""
+
+
+class PollingBackend:
+    """
+    Fallback backend: sleep for the interval, then report that anything may
+    have changed (`None`), which makes the watcher rescan the whole tree.
+    """
+
+    name = "poll"
+
+    def wait(self, timeout: float) -> Optional[set[str]]:
+        time.sleep(timeout)
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    """
+    Event-driven backend using Linux inotify through ctypes.
+
+    Watches every directory under `root` and reports the set of *.jsonl paths
+    that were created, modified or moved in. Returns `None` (full rescan) when
+    the kernel queue overflows or RESCAN_INTERVAL has elapsed.
+    """
+
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o00004000
+    IN_CLOEXEC = 0o02000000
+
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                  | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    _EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, root: Path):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1.argtypes = [ctypes.c_int]
+            self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError) as e:
+            raise OSError(errno.ENOSYS, f"inotify unavailable: {e}")
+
+        fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._fd = fd
+        self._root = root
+        self._wd_to_dir: dict[int, str] = {}
+        self._last_rescan = time.monotonic()
+        try:
+            self._add_tree(str(root))
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, dir_path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise WatchLimitReached(err, "inotify watch limit reached "
+                                             "(fs.inotify.max_user_watches)")
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return  # Directory vanished before we could watch it
+            raise OSError(err, f"inotify_add_watch({dir_path}) failed: {os.strerror(err)}")
+        self._wd_to_dir[wd] = dir_path
 
-    def update_inode(self, inode: int) -> bool:
-        """Returns True if file was rotated (new inode)."""
-        if inode != self.inode:
-            self.inode = inode
-            self.offset = 0
-            return True
-        return False
+    def _add_tree(self, top: str) -> list[str]:
+        """Watch `top` and every directory below it. Returns *.jsonl files found."""
+        found = []
+        for dirpath, _dirnames, filenames in os.walk(top, followlinks=True):
+            self._add_watch(dirpath)
+            found.extend(os.path.join(dirpath, n) for n in filenames if n.endswith(".jsonl"))
+        return found
 
+    def wait(self, timeout: float) -> Optional[set[str]]:
+        if time.monotonic() - self._last_rescan >= RESCAN_INTERVAL:
+            self._last_rescan = time.monotonic()
+            return None
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed: set[str] = set()
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        pos = 0
+        while pos + self._EVENT.size <= len(buf):
+            wd, mask, _cookie, name_len = self._EVENT.unpack_from(buf, pos)
+            pos += self._EVENT.size
+            name = buf[pos:pos + name_len].rstrip(b"\0")
+            pos += name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow; falling back to a full rescan")
+                self._last_rescan = time.monotonic()
+                return None
+            if mask & self.IN_IGNORED:
+                self._wd_to_dir.pop(wd, None)
+                continue
+
+            parent = self._wd_to_dir.get(wd)
+            if parent is None or not name:
+                continue
+            full = os.path.join(parent, os.fsdecode(name))
+
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Files may land before the new watch exists; pick them up now
+                    changed.update(self._add_tree(full))
+                continue
+
+            if full.endswith(".jsonl") and mask & (self.IN_MODIFY | self.IN_CLOSE_WRITE
+                                                   | self.IN_CREATE | self.IN_MOVED_TO):
+                changed.add(full)
+
+        return changed
+
+    def close(self) -> None:
+        if getattr(self, "_fd", -1) >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_backend(root: Path, kind: str = None):
+    """Build the configured change-detection backend, falling back to polling."""
+    kind = (kind or WATCHER_BACKEND).lower()
+    if kind == "poll":
+        return PollingBackend()
+    if not root.exists():
+        logger.info("%s does not exist yet; using polling", root)
+        return PollingBackend()
+    try:
+        return InotifyBackend(root)
+    except OSError as e:
+        if kind == "inotify":
+            logger.warning("inotify backend requested but unavailable (%s); using polling", e)
+        else:
+            logger.info("inotify unavailable (%s); using polling", e)
+        return PollingBackend()
+
+
+# ---------------------------------------------------------------------------
+# Watcher
+# ---------------------------------------------------------------------------
 
 class TranscriptWatcher:
     """
-    Polls ~/.claude/projects/ for JSONL transcript files.
+    Tails JSONL transcript files under ~/.claude/projects/ (or the files
+    matching `pattern` under another `root`, such as the hooks' daily logs).
     Calls `line_callback(path, line)` for each new line encountered.
+
+    Existing files without a checkpoint are tailed from EOF, except those
+    modified at or after `backlog_since` (epoch seconds), which are read
+    from the start.
     """
 
-    def __init__(self, line_callback: Callable[[str, str], None]):
+    def __init__(self, line_callback: Callable[[str, str], None],
+                 checkpoints: Optional[CheckpointStore] = None,
+                 root: Optional[Path] = None, pattern: str = "**/*.jsonl",
+                 backlog_since: Optional[float] = None):
         self.line_callback = line_callback
+        self.checkpoints = checkpoints or CheckpointStore()
+        self.root = root or CC_PROJECTS_DIR
+        self.pattern = pattern
+        self.backlog_since = backlog_since
         self._files: dict[str, FileState] = {}  # path_str -> FileState
         self._running = False
+        self._backend = None
+        self.bytes_read = 0
 
     def scan_existing(self) -> None:
-        """On startup, find all existing transcript files but only tail from EOF
+        """On startup, find all existing transcript files. Files with a saved
+        checkpoint resume where they stopped; the rest are tailed from EOF
         (skip historical content to avoid re-importing old sessions)."""
-        if not CC_PROJECTS_DIR.exists():
-            logger.warning("CC projects dir not found: %s", CC_PROJECTS_DIR)
+        if not self.root.exists():
+            logger.warning("Watch dir not found: %s", self.root)
             return
 
-        for jsonl_path in CC_PROJECTS_DIR.rglob("*.jsonl"):
-            path_str = str(jsonl_path)
-            if path_str not in self._files:
+        with self.checkpoints.batch():
+            for jsonl_path in self.root.glob(self.pattern):
+                path_str = str(jsonl_path)
+                if path_str in self._files:
+                    continue
                 state = FileState(jsonl_path)
                 try:
                     stat = jsonl_path.stat()
-                    state.inode = stat.st_ino
-                    state.offset = stat.st_size  # start from end
                 except OSError:
-                    pass
+                    self._files[path_str] = state
+                    continue
+                saved = self.checkpoints.load(path_str)
+                if saved is None and self.backlog_since is not None \
+                        and stat.st_mtime >= self.backlog_since:
+                    state.inode, state.offset = stat.st_ino, 0  # read the backlog
+                    self.checkpoints.save(path_str, state.inode, 0, 0)
+                    logger.info("Tracking (existing, from start) %s", jsonl_path.name)
+                elif saved is None:
+                    state.inode, state.offset = stat.st_ino, stat.st_size  # start from end
+                    self.checkpoints.save(path_str, state.inode, state.offset, state.offset)
+                    logger.info("Tracking (existing) %s", jsonl_path.name)
+                else:
+                    # Resume from the checkpoint; _read_new_lines handles a
+                    # replaced (new inode) or truncated file.
+                    state.inode, state.offset = saved
+                    logger.info("Resuming %s at byte %d", jsonl_path.name, state.offset)
+                state.initial = (state.inode, state.offset)
                 self._files[path_str] = state
-                logger.info("Tracking (existing) %s", jsonl_path.name)
+
+    def _track_new(self, jsonl_path: Path) -> Optional[FileState]:
+        """Start tracking a newly discovered transcript from its beginning."""
+        state = FileState(jsonl_path)
+        try:
+            stat = jsonl_path.stat()
+            state.inode = stat.st_ino
+            # New file: read from beginning to catch session start
+            state.offset = 0
+        except OSError:
+            return None
+        state.initial = (state.inode, state.offset)
+        self._files[str(jsonl_path)] = state
+        logger.info("New transcript: %s", jsonl_path.name)
+        return state
 
     def _poll_once(self) -> None:
         """Check all known files for new lines, and discover new files."""
-        if not CC_PROJECTS_DIR.exists():
+        if not self.root.exists():
             return
 
         # Discover new JSONL files
         try:
-            for jsonl_path in CC_PROJECTS_DIR.rglob("*.jsonl"):
-                path_str = str(jsonl_path)
-                if path_str not in self._files:
-                    state = FileState(jsonl_path)
-                    try:
-                        stat = jsonl_path.stat()
-                        state.inode = stat.st_ino
-                        # New file: read from beginning to catch session start
-                        state.offset = 0
-                    except OSError:
-                        continue
-                    self._files[path_str] = state
-                    logger.info("New transcript: %s", jsonl_path.name)
+            for jsonl_path in self.root.glob(self.pattern):
+                if str(jsonl_path) not in self._files:
+                    self._track_new(jsonl_path)
         except OSError as e:
             logger.debug("Scan error: %s", e)
 
         # Read new lines from all tracked files
-        for path_str, state in list(self._files.items()):
-            try:
-                self._read_new_lines(state)
-            except Exception as e:
-                logger.debug("Error reading %s: %s", path_str, e)
+        self._read_files(list(self._files.values()))
+
+    def _poll_paths(self, paths: set[str]) -> None:
+        """Read new lines from just the files a backend reported as changed."""
+        states = []
+        for path_str in sorted(paths):
+            state = self._files.get(path_str) or self._track_new(Path(path_str))
+            if state is not None:
+                states.append(state)
+        self._read_files(states)
+
+    def _read_files(self, states: list[FileState]) -> None:
+        """Read `states` in one checkpoint batch; commit offsets only on success."""
+        advanced = []
+        try:
+            with self.checkpoints.batch():
+                for state in states:
+                    # Only a file's own read errors are skipped here: a failed
+                    # save() may have dropped rows of files read before this
+                    # one, so it must fail the batch and rewind them all.
+                    try:
+                        position = self._read_new_lines(state)
+                    except OSError as e:
+                        logger.warning("Error reading %s: %s", state.path, e)
+                        continue
+                    if position is not None:
+                        advanced.append((state, position))
+        except Exception as e:
+            logger.error("Checkpoint batch failed; will re-read next poll: %s", e)
+            self._rewind()
+            return
+        for state, (inode, offset) in advanced:
+            state.inode, state.offset = inode, offset
 
-    def _read_new_lines(self, state: FileState) -> None:
+    def _rewind(self) -> None:
+        """Reset every file to its last committed checkpoint after a failed batch.
+        (Stores may hold reads from earlier rounds until their batch commits.)"""
+        for path_str, state in self._files.items():
+            state.inode, state.offset = self.checkpoints.load(path_str) or state.initial
+
+    def _read_new_lines(self, state: FileState) -> Optional[tuple[int, int]]:
+        """Deliver lines past the committed offset. Returns the new (inode, offset)."""
         path = state.path
+        path_str = str(path)
         try:
             stat = path.stat()
         except OSError:
-            return  # File deleted; keep state in case it reappears
+            return None  # File deleted; keep state in case it reappears
 
-        current_inode = stat.st_ino
-        state.update_inode(current_inode)  # resets offset if rotated
+        inode, offset = state.inode, state.offset
+        if stat.st_ino != inode:
+            logger.info("Transcript replaced (new inode): %s", path.name)
+            inode, offset = stat.st_ino, 0
+            state.initial = (inode, 0)
+            self.checkpoints.discard(path_str)
+        elif stat.st_size < offset:
+            logger.info("Transcript truncated (%d < %d): %s", stat.st_size, offset, path.name)
+            offset = 0
+            state.initial = (inode, 0)
+            self.checkpoints.discard(path_str)
+        origin = state.initial[1]
 
-        if stat.st_size <= state.offset:
-            return  # No new data
+        if stat.st_size <= offset:
+            if (inode, offset) == (state.inode, state.offset):
+                return None  # No new data
+            self.checkpoints.save(path_str, inode, offset, origin)
+            return inode, offset
 
+        # Stream the delta in READ_CHUNK pieces. Only complete lines are
+        # delivered; a half-written last line stays behind the offset and is
+        # read again, whole, once CC finishes it.
+        carry = b""
+        start = offset
         with open(path, "rb") as f:
-            f.seek(state.offset)
-            chunk = f.read(stat.st_size - state.offset)
-            state.offset = f.tell()
+            f.seek(offset)
+            remaining = stat.st_size - offset
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                self.bytes_read += len(chunk)
+                buf = carry + chunk if carry else chunk
+                end = buf.rfind(b"\n") + 1
+                if not end:
+                    carry = buf  # no line break yet: keep reading
+                    continue
+                carry = buf[end:]
+                for raw in buf[:end].split(b"\n"):
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if line:
+                        try:
+                            self.line_callback(path_str, line)
+                        except Exception as e:
+                            logger.error("line_callback error: %s", e)
+                offset += end
+                self.checkpoints.save(path_str, inode, offset, origin)
 
-        # Decode and split on newlines
-        text = chunk.decode("utf-8", errors="replace")
-        lines = text.splitlines()
+        if (inode, offset) == (state.inode, state.offset):
+            return None  # Only a partial line so far
+        if offset == start:
+            # Replaced/truncated file with no complete line yet
+            self.checkpoints.save(path_str, inode, offset, origin)
+        return inode, offset
 
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    self.line_callback(str(path), line)
-                except Exception as e:
-                    logger.error("line_callback error: %s", e)
+    def catch_up(self) -> None:
+        """Read everything written past the checkpoints while we were down,
+        logging throughput and peak RSS."""
+        t0 = time.monotonic()
+        before = self.bytes_read
+        self._poll_once()
+        read = self.bytes_read - before
+        logger.info("Catch-up read %.1f MB in %.1fs (%.1f MB chunks); peak RSS %.1f MB",
+                    read / 1e6, time.monotonic() - t0, READ_CHUNK / 1e6, peak_rss_mb())
+
+    def _wait_for_changes(self) -> Optional[set[str]]:
+        """Block until the backend reports changes; degrade to polling on limits."""
+        try:
+            return self._backend.wait(POLL_INTERVAL)
+        except WatchLimitReached as e:
+            logger.warning("%s; switching to polling", e)
+        except OSError as e:
+            logger.warning("%s backend failed (%s); switching to polling", self._backend.name, e)
+        self._backend.close()
+        self._backend = PollingBackend()
+        return None
 
     def run_forever(self) -> None:
-        """Block and poll indefinitely."""
+        """Block and tail indefinitely."""
         self._running = True
+        # Arm the backend before the initial scan so no write falls in between
+        self._backend = make_backend(self.root)
         self.scan_existing()
-        logger.info("Watching %s (poll interval: %ss)", CC_PROJECTS_DIR, POLL_INTERVAL)
-        while self._running:
-            try:
-                self._poll_once()
-            except Exception as e:
-                logger.error("Poll error: %s", e)
-            time.sleep(POLL_INTERVAL)
+        logger.info("Watching %s (backend: %s, poll interval: %ss)",
+                    self.root, self._backend.name, POLL_INTERVAL)
+        try:
+            self.catch_up()
+        except Exception as e:
+            logger.error("Poll error: %s", e)
+        try:
+            while self._running:
+                changed = self._wait_for_changes()
+                try:
+                    if changed is None:
+                        self._poll_once()
+                    else:
+                        # Even with nothing changed, give the store a chance
+                        # to flush time-based batches
+                        self._poll_paths(changed)
+                except Exception as e:
+                    logger.error("Poll error: %s", e)
+        finally:
+            self._backend.close()
 
     def stop(self) -> None:
         self._running = False
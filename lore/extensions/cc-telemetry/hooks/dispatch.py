@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Hook dispatcher: one process per hook event instead of one per handler.
+
+    python3 dispatch.py <HookEvent>   (payload JSON on stdin)
+
+Reads the payload once and runs every handler registered for the event in
+order, in-process. A handler is a hook module's handle(ctx), which returns
+a message to print or None; the modules still run standalone as well.
+Each handler is timed and isolated: an exception in one is recorded and
+the rest still run, and the dispatcher always exits 0.
+
+Each handler also gets the time budget its script had as a hook of its
+own (HANDLER_BUDGET_S); one that overruns it is interrupted and recorded
+as failed, so the others still run inside the event's timeout in
+hooks.json, which covers the sum.
+
+Handlers that fail, or take longer than CC_TELEMETRY_HOOK_SLOW_MS, are
+logged as a "HookDispatch" event with every handler's timing.
+CC_TELEMETRY_HOOK_TIMING=1 prints the timings to stderr on every run.
+"""
+
+import os
+import sys
+import time
+import signal
+import importlib
+
+sys.path.insert(0, os.path.dirname(__file__))
+from logger import make_event, write_event, read_stdin_json
+
+# Handler modules per hook event, run in this order
+HANDLERS = {
+    "SessionStart": ["session_start"],
+    "PreToolUse": ["pre_tool_use"],
+    "PostToolUse": ["post_tool_use", "telemetry_alert", "session_cost_tracker"],
+    "UserPromptSubmit": ["user_prompt"],
+    "Stop": ["stop", "skill_usage_analytics"],
+}
+
+# Seconds each handler may run before it is interrupted, per hook event
+# (default 3). hooks.json gives each event at least the sum over its handlers.
+HANDLER_BUDGET_S = {"SessionStart": 5.0, "Stop": 5.0}
+DEFAULT_BUDGET_S = 3.0
+
+# A handler slower than this (ms) gets the run logged
+HANDLER_SLOW_MS = float(os.environ.get("CC_TELEMETRY_HOOK_SLOW_MS", "500"))
+
+
+class HandlerTimeout(Exception):
+    pass
+
+
+def _interrupt(signum, frame):
+    raise HandlerTimeout("over its time budget")
+
+
+def run_handlers(hook_event: str, ctx: dict) -> tuple[list[str], dict, dict]:
+    """Run the handlers for `hook_event`. Returns (messages, {handler: ms},
+    {handler: error})."""
+    messages, timings, failures = [], {}, {}
+    budget = HANDLER_BUDGET_S.get(hook_event, DEFAULT_BUDGET_S)
+    # SIGALRM is Unix-only; elsewhere only the hook's own timeout applies
+    timed = hasattr(signal, "setitimer")
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _interrupt)
+    try:
+        for name in HANDLERS.get(hook_event, ()):
+            t0 = time.perf_counter()
+            try:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, budget)
+                try:
+                    message = importlib.import_module(name).handle(ctx)
+                finally:
+                    if timed:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                if message:
+                    messages.append(message)
+            except BaseException as e:  # SystemExit included: one handler never ends the run
+                failures[name] = f"{type(e).__name__}: {e}"
+            timings[name] = round((time.perf_counter() - t0) * 1000, 1)
+    finally:
+        if timed:
+            signal.signal(signal.SIGALRM, previous)
+    return messages, timings, failures
+
+
+def main():
+    hook_event = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        ctx = read_stdin_json()
+        hook_event = hook_event or ctx.get("hook_event_name")
+        if ctx.get("session_id"):
+            # make_event and the session counters read it from the environment
+            os.environ.setdefault("CLAUDE_SESSION_ID", ctx["session_id"])
+        messages, timings, failures = run_handlers(hook_event, ctx)
+        for message in messages:
+            print(message)
+        if os.environ.get("CC_TELEMETRY_HOOK_TIMING") == "1":
+            print(f"{hook_event}: " + ", ".join(f"{k} {v}ms" for k, v in timings.items()),
+                  file=sys.stderr)
+        if failures or any(ms > HANDLER_SLOW_MS for ms in timings.values()):
+            write_event(make_event(
+                event_type="HookDispatch",
+                status="warn",
+                meta={"hook_event": hook_event, "timings_ms": timings, "failures": failures},
+            ))
+    except Exception:
+        pass  # Never block on telemetry errors
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 """
 Shared telemetry logging utility for cc-telemetry plugin.
-Writes JSON Lines to ~/.claude/telemetry/YYYY-MM-DD.jsonl
-Thread-safe via file locking.
+Sends each event to the daemon's socket (~/.claude/telemetry/hooks.sock),
+which stores it in telemetry.db and appends it to
+~/.claude/telemetry/YYYY-MM-DD.jsonl; when the daemon is not running the
+line is appended here instead. Thread-safe via file locking.
+
+Every event written also bumps its session's counters in
+~/.claude/telemetry/sessions/<session_id>.json, so hooks that need session
+totals read one small file instead of rescanning the day's log.
 """
 
 import os
+import re
 import sys
 import json
+import time
 import fcntl
+import socket
 import hashlib
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 
@@ -31,6 +40,15 @@ def get_log_path(dt: datetime = None) -> Path:
     return telemetry_dir / f"{date_str}.jsonl"
 
 
+def get_socket_path() -> str:
+    """The daemon's hook socket (empty when disabled)."""
+    return os.environ.get("CC_TELEMETRY_HOOK_SOCKET", str(get_telemetry_dir() / "hooks.sock"))
+
+
+# Seconds a send may wait on a full socket queue before falling back to the file
+SEND_TIMEOUT = 0.05
+
+
 def truncate_value(value, max_len: int = 500) -> str:
     """Truncate large values and convert to string."""
     if value is None:
@@ -44,16 +62,140 @@ def truncate_value(value, max_len: int = 500) -> str:
     return s
 
 
+def send_event(line: bytes) -> bool:
+    """Hand one JSON line to the daemon. False when nobody is listening (or
+    the queue stayed full for SEND_TIMEOUT), leaving the write to the caller."""
+    path = get_socket_path()
+    if not path:
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.settimeout(SEND_TIMEOUT)
+        sock.sendto(line, path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
 def write_event(event: dict) -> None:
-    """Write a single event as a JSON line. Thread-safe via flock."""
-    log_path = get_log_path()
+    """Log a single event (to the daemon, else as a JSON line in today's
+    file) and count it in its session's state. Thread-safe via flock."""
     line = json.dumps(event, ensure_ascii=False) + "\n"
-    with open(log_path, "a", encoding="utf-8") as f:
+    if not send_event(line.encode("utf-8")):
+        with open(get_log_path(), "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    try:
+        update_session_state(event.get("session_id"), lambda state: count_event(state, event))
+    except (OSError, ValueError):
+        pass  # the log line is what matters; counters are a cache of it
+
+
+# ---------------------------------------------------------------------------
+# Per-session counters
+# ---------------------------------------------------------------------------
+
+# State files untouched for this long are removed by prune_session_state()
+SESSION_STATE_MAX_AGE_DAYS = 30
+
+
+def _empty_state() -> dict:
+    return {
+        "events": 0,          # events logged
+        "event_counts": {},   # per event type
+        "tools": {},          # PreToolUse events per tool
+        "errors": 0,          # events with status "error"
+        "skills": {},         # events per skill
+        "first_ts": None,
+        "last_ts": None,
+    }
+
+
+def get_session_state_path(session_id: str = None) -> Path:
+    sid = session_id or "unknown"
+    if not re.fullmatch(r"[A-Za-z0-9_.-]{1,128}", sid) or sid.startswith("."):
+        sid = hashlib.sha256(sid.encode()).hexdigest()[:32]
+    state_dir = get_telemetry_dir() / "sessions"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir / f"{sid}.json"
+
+
+def count_event(state: dict, event: dict) -> None:
+    """Add `event` to a session's counters (what write_event does)."""
+    ev_type = event.get("event") or ""
+    state["events"] += 1
+    state["event_counts"][ev_type] = state["event_counts"].get(ev_type, 0) + 1
+    if ev_type == "PreToolUse" and event.get("tool"):
+        state["tools"][event["tool"]] = state["tools"].get(event["tool"], 0) + 1
+    if event.get("status") == "error":
+        state["errors"] += 1
+    if event.get("skill"):
+        state["skills"][event["skill"]] = state["skills"].get(event["skill"], 0) + 1
+    state["first_ts"] = state["first_ts"] or event.get("ts")
+    state["last_ts"] = event.get("ts") or state["last_ts"]
+
+
+def _load_state(f) -> dict:
+    f.seek(0)
+    raw = f.read()
+    state = _empty_state()
+    if raw.strip():
+        try:
+            state.update(json.loads(raw))
+        except json.JSONDecodeError:
+            pass  # torn by a crash mid-write; start over
+    return state
+
+
+def update_session_state(session_id: str, update) -> dict:
+    """Apply `update(state)` to a session's counters under an exclusive
+    flock and write them back in place. Returns the new state."""
+    with open(get_session_state_path(session_id), "a+", encoding="utf-8") as f:
         fcntl.flock(f, fcntl.LOCK_EX)
         try:
-            f.write(line)
+            state = _load_state(f)
+            update(state)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state, ensure_ascii=False))
+            f.flush()  # before the lock is released
         finally:
             fcntl.flock(f, fcntl.LOCK_UN)
+    return state
+
+
+def read_session_state(session_id: str = None) -> dict:
+    """A session's counters (zeros when it has logged nothing). Costs the
+    same however many events the session or the day has."""
+    path = get_session_state_path(session_id)
+    if not path.exists():
+        return _empty_state()
+    with open(path, encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            return _load_state(f)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def prune_session_state(max_age_days: int = SESSION_STATE_MAX_AGE_DAYS) -> int:
+    """Remove state files of sessions idle for `max_age_days`. Returns how many."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in (get_telemetry_dir() / "sessions").glob("*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            pass
+    return removed
 
 
 def make_event(
@@ -66,10 +208,12 @@ def make_event(
     span_id: str = None,
     parent_span_id: str = None,
     agent_name: str = None,
+    tool_use_id: str = None,
 ) -> dict:
     """Build a standardized telemetry event dict."""
     session_id = os.environ.get("CLAUDE_SESSION_ID", None)
     event = {
+        "event_id": os.urandom(8).hex(),  # lets the daemon store a resent event once
         "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
         "session_id": session_id,
         "event": event_type,
@@ -85,6 +229,8 @@ def make_event(
         event["parent_span_id"] = parent_span_id
     if agent_name is not None:
         event["agent_name"] = agent_name
+    if tool_use_id is not None:
+        event["tool_use_id"] = tool_use_id  # pairs Pre/PostToolUse into a span
     return event
 
 
@@ -107,99 +253,234 @@ def hash_text(text: str, length: int = 8) -> str:
 # ---------------------------------------------------------------------------
 # Query mode: called as "python3 logger.py --query <args>"
 # ---------------------------------------------------------------------------
+#
+# The daily files are scanned as streams: forwards line by line for a time
+# range, or backwards from EOF a block at a time for --tail, so neither the
+# whole file nor the whole range is ever held in memory and a tail costs
+# about N lines however large the day's log is.
+
+# Bytes read per step when scanning a log backwards
+READ_BLOCK = 64 * 1024
+
+EVENT_TYPES = ("PreToolUse", "PostToolUse", "SessionStart", "Stop", "UserPromptSubmit",
+               "HookDispatch")
+
+QUERY_FORMATS = ("text", "table", "ndjson")
+
+QUERY_USAGE = ("Usage: logger.py --query [date] [event-type] [--tail N] [--since WHEN] "
+               "[--until WHEN] [--session ID] [--format text|table|ndjson]")
+
+
+def _parse_when(value: str) -> datetime:
+    """'24h' / '7d' / '30m' ago, or an ISO date/time (naive means UTC)."""
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return datetime.fromtimestamp(time.time() - int(value[:-1]) * units[value[-1]], timezone.utc)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _iso(dt: datetime) -> str:
+    """The form make_event writes "ts" in, so bounds compare as strings."""
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def log_files(since: str = None, until: str = None) -> list[Path]:
+    """Daily logs that can hold events in [since, until), oldest first.
+    Events are filed by their UTC date, so the bounds' dates pick the files."""
+    telemetry_dir = get_telemetry_dir()
+    if not telemetry_dir.exists():
+        return []
+    last_day = until[:10] if until else None
+    if until and until[10:] == "T00:00:00.000Z":
+        last_day = (datetime.fromisoformat(until[:10]) - timedelta(days=1)).strftime("%Y-%m-%d")
+    files = []
+    for path in sorted(telemetry_dir.glob("*.jsonl")):
+        day = path.stem
+        if not re.match(r"^\d{4}-\d{2}-\d{2}$", day):
+            continue
+        if (since and day < since[:10]) or (last_day and day > last_day):
+            continue
+        files.append(path)
+    return files
+
+
+def _forward_lines(path: Path):
+    with open(path, "rb") as f:
+        yield from f
+
+
+def _reverse_lines(path: Path, block_size: int = READ_BLOCK):
+    """Lines of `path` from last to first, reading one block at a time."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        partial = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + partial).split(b"\n")
+            partial = lines[0]  # may continue in the block before
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if partial.strip():
+            yield partial
+
+
+def _matches(ev: dict, since: str, until: str, session: str, event: str) -> bool:
+    if event and ev.get("event") != event:
+        return False
+    if session and not (ev.get("session_id") or "").startswith(session):
+        return False
+    ts = ev.get("ts") or ""
+    return (not since or ts >= since) and (not until or ts < until)
 
-def cmd_query(args_str: str) -> None:
-    """Simple query interface for the /cc-telemetry skill."""
-    import argparse
-    import re
 
+def iter_events(since: str = None, until: str = None, session: str = None,
+                event: str = None, reverse: bool = False):
+    """Yield the logged events matching the filters across the daily files,
+    oldest first (newest first with reverse). `since`/`until` are ISO
+    strings as written by make_event; `session` may be a prefix."""
+    files = log_files(since, until)
+    for path in (reversed(files) if reverse else files):
+        try:
+            for line in (_reverse_lines(path) if reverse else _forward_lines(path)):
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    continue  # a line still being written, or damaged
+                if isinstance(ev, dict) and _matches(ev, since, until, session, event):
+                    yield ev
+        except OSError:
+            continue  # removed since it was listed
+
+
+def format_event(ev: dict) -> str:
+    """One event as the "text" format's line."""
+    parts_out = [f"[{ev.get('ts', '?')}] {ev.get('event', '?')}"]
+    if ev.get("agent_name"):
+        parts_out.append(f"agent={ev['agent_name']}")
+    if ev.get("span_id"):
+        parts_out.append(f"span={ev['span_id']}")
+    if ev.get("tool"):
+        parts_out.append(f"tool={ev['tool']}")
+    if ev.get("skill"):
+        parts_out.append(f"skill={ev['skill']}")
+    status = ev.get("status")
+    if status and status != "ok":
+        parts_out.append(f"status={status}")
+    if ev.get("duration_ms") is not None:
+        parts_out.append(f"{ev['duration_ms']}ms")
+    for k, v in (ev.get("meta") or {}).items():
+        if v:
+            parts_out.append(f"{k}={v}")
+    return "  ".join(parts_out)
+
+
+TABLE_HEADER = f"{'TS':<24} {'EVENT':<17} {'SESSION':<9} {'TOOL / SKILL':<20} {'STATUS':<6} {'DUR':>7}  META"
+
+
+def format_row(ev: dict) -> str:
+    """One event as a "table" format row."""
+    duration = ev.get("duration_ms")
+    meta = json.dumps(ev.get("meta") or {}, ensure_ascii=False, separators=(",", ":"))
+    return (f"{(ev.get('ts') or '?'):<24} {(ev.get('event') or '?'):<17} "
+            f"{(ev.get('session_id') or '')[:8]:<9} "
+            f"{(ev.get('tool') or ev.get('skill') or '')[:20]:<20} {(ev.get('status') or ''):<6} "
+            f"{(f'{duration}ms' if duration is not None else ''):>7}  {truncate_value(meta, 80)}")
+
+
+def cmd_query(args_str: str) -> None:
+    """Query interface for the /cc-telemetry skill: a day, a time range
+    across days, or the last N events, as text, a table or NDJSON."""
     parts = args_str.strip().split() if args_str.strip() else []
 
-    date_str = None
-    event_filter = None
+    date_str = since = until = session = event_filter = None
     tail_n = None
+    fmt = "text"
     i = 0
     while i < len(parts):
         part = parts[i]
+        value = parts[i + 1] if i + 1 < len(parts) else None
         if re.match(r"^\d{4}-\d{2}-\d{2}$", part):
             date_str = part
-        elif part == "--tail" and i + 1 < len(parts):
-            try:
-                tail_n = int(parts[i + 1])
-                i += 1
-            except ValueError:
-                pass
-        elif part in ("PreToolUse", "PostToolUse", "SessionStart", "Stop", "UserPromptSubmit"):
+        elif part in ("--tail", "--since", "--until", "--session", "--format") and value:
+            i += 1
+            if part == "--tail":
+                try:
+                    tail_n = int(value)
+                except ValueError:
+                    pass
+            elif part == "--session":
+                session = value
+            elif part == "--format":
+                if value not in QUERY_FORMATS:
+                    print(f"Unknown format {value!r}; use one of {', '.join(QUERY_FORMATS)}")
+                    return
+                fmt = value
+            else:
+                try:
+                    bound = _iso(_parse_when(value))
+                except ValueError:
+                    print(f"Unrecognised time: {value!r} (use e.g. 24h, 7d or 2025-01-31)")
+                    return
+                if part == "--since":
+                    since = bound
+                else:
+                    until = bound
+        elif part in EVENT_TYPES:
             event_filter = part
         i += 1
 
-    # Determine which log file to read
-    if date_str:
-        log_path = get_telemetry_dir() / f"{date_str}.jsonl"
+    # One day (the given date, else today) unless a range was asked for
+    if since is None and until is None:
+        day = date_str or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        try:
+            start = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+        except ValueError:
+            print(f"Not a date: {day!r}")
+            return
+        since, until = _iso(start), _iso(start + timedelta(days=1))
+        scope = f"{day}.jsonl"
     else:
-        log_path = get_log_path()
+        scope = f"{since or 'start'} .. {until or 'now'}"
 
-    if not log_path.exists():
-        print(f"No telemetry log found at {log_path}")
+    if not log_files(since, until):
+        print(f"No telemetry log found for {scope}")
         print(f"Telemetry directory: {get_telemetry_dir()}")
-        available = sorted(get_telemetry_dir().glob("*.jsonl")) if get_telemetry_dir().exists() else []
+        available = log_files()
         if available:
             print(f"Available logs: {', '.join(p.name for p in available)}")
         return
 
-    events = []
-    with open(log_path, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                ev = json.loads(line)
-                if event_filter is None or ev.get("event") == event_filter:
-                    events.append(ev)
-            except json.JSONDecodeError:
-                pass
-
+    events = iter_events(since, until, session, event_filter, reverse=tail_n is not None)
     if tail_n is not None:
-        events = events[-tail_n:]
-
-    if not events:
-        print(f"No events found in {log_path.name}" + (f" for event type '{event_filter}'" if event_filter else ""))
-        return
+        # Newest first from the end of the range; N events kept, then reversed
+        last = []
+        for ev in events:
+            if len(last) >= tail_n:
+                break
+            last.append(ev)
+        events = reversed(last)
 
-    print(f"=== Telemetry: {log_path.name} ({len(events)} events) ===")
-    print()
+    count = 0
     for ev in events:
-        ts = ev.get("ts", "?")
-        event_type = ev.get("event", "?")
-        tool = ev.get("tool") or ""
-        skill = ev.get("skill") or ""
-        status = ev.get("status") or ""
-        duration = ev.get("duration_ms")
-        meta = ev.get("meta", {})
-
-        agent_name = ev.get("agent_name") or ""
-        span = ev.get("span_id") or ""
-
-        parts_out = [f"[{ts}] {event_type}"]
-        if agent_name:
-            parts_out.append(f"agent={agent_name}")
-        if span:
-            parts_out.append(f"span={span}")
-        if tool:
-            parts_out.append(f"tool={tool}")
-        if skill:
-            parts_out.append(f"skill={skill}")
-        if status and status != "ok":
-            parts_out.append(f"status={status}")
-        if duration is not None:
-            parts_out.append(f"{duration}ms")
-        if meta:
-            for k, v in meta.items():
-                if v:
-                    parts_out.append(f"{k}={v}")
-
-        print("  ".join(parts_out))
+        if fmt == "ndjson":
+            sys.stdout.write(json.dumps(ev, ensure_ascii=False) + "\n")
+        else:
+            if count == 0:
+                print(f"=== Telemetry: {scope} ===")
+                print()
+                if fmt == "table":
+                    print(TABLE_HEADER)
+            print(format_event(ev) if fmt == "text" else format_row(ev))
+        count += 1
+
+    if count == 0 and fmt != "ndjson":
+        print(f"No events found for {scope}" + (f" of type '{event_filter}'" if event_filter else ""))
+    elif fmt != "ndjson":
+        print(f"\n({count} events)")
 
 
 if __name__ == "__main__":
@@ -207,4 +488,4 @@ if __name__ == "__main__":
         query_args = " ".join(sys.argv[2:]) if len(sys.argv) > 2 else ""
         cmd_query(query_args)
     else:
-        print("Usage: logger.py --query [date] [event-type] [--tail N]")
+        print(QUERY_USAGE)
@@ -5,12 +5,10 @@ import json
 import os
 from datetime import datetime
 
-def main():
-    try:
-        data = json.loads(sys.stdin.read())
-    except (json.JSONDecodeError, ValueError):
-        return
+sys.path.insert(0, os.path.dirname(__file__))
+from logger import update_session_state
 
+def handle(data: dict):
     tool_name = data.get('tool_name', '')
     tool_result = str(data.get('tool_result', ''))
     session_id = os.environ.get('CLAUDE_SESSION_ID', 'unknown')
@@ -32,20 +30,26 @@ def main():
     with open(cost_file, 'a') as f:
         f.write(json.dumps(entry) + '\n')
 
-    # Warn at thresholds
-    total_tokens = 0
-    with open(cost_file) as f:
-        for line in f:
-            try:
-                e = json.loads(line)
-                if e.get('session_id') == session_id:
-                    total_tokens += e.get('est_tokens', 0)
-            except (json.JSONDecodeError, ValueError):
-                continue
+    # Running total in the session's counters, rather than re-reading cost_file
+    state = update_session_state(session_id, lambda state: state.update(
+        est_tokens=state.get('est_tokens', 0) + result_tokens))
+    total_tokens = state['est_tokens']
 
+    # Warn at thresholds
     threshold = int(os.environ.get('LORE_TOKEN_THRESHOLD', '500000'))
     if total_tokens > threshold:
-        print(f'Cost tracker: ~{total_tokens} estimated tokens in session (threshold: {threshold})')
+        return f'Cost tracker: ~{total_tokens} estimated tokens in session (threshold: {threshold})'
+    return None
+
+def main():
+    try:
+        data = json.loads(sys.stdin.read())
+    except (json.JSONDecodeError, ValueError):
+        return
+
+    message = handle(data)
+    if message:
+        print(message)
 
 if __name__ == '__main__':
     main()
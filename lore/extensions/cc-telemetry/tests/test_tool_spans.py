@@ -0,0 +1,49 @@
+"""Pairing hook_log PreToolUse/PostToolUse rows into tool_spans."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "daemon"))
+import db  # noqa: E402
+
+
+def _event(event_id, event, ts, tool_use_id=None):
+    return {"event_id": event_id, "event": event, "session_id": "s1", "tool": "Bash",
+            "ts": ts, "tool_use_id": tool_use_id}
+
+
+class PairToolSpansTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = db.open_db(Path(self.tmp.name) / "telemetry.db")
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def _spans(self):
+        return [tuple(r) for r in self.conn.execute(
+            "SELECT pre_id, post_id, duration_ms FROM tool_spans ORDER BY id")]
+
+    def test_pre_arriving_after_its_post(self):
+        db.insert_hook_log(self.conn, [_event("post", "PostToolUse", "2026-01-01T00:00:02Z")],
+                           "socket")
+        self.assertEqual(self._spans(), [])
+        db.insert_hook_log(self.conn, [_event("pre", "PreToolUse", "2026-01-01T00:00:00Z")],
+                           "jsonl")
+        self.assertEqual(self._spans(), [(2, 1, 2000)])
+
+    def test_pre_arriving_after_its_post_by_tool_use_id(self):
+        db.insert_hook_log(self.conn, [
+            _event("post", "PostToolUse", "2026-01-01T00:00:05Z", "toolu_1"),
+        ], "socket")
+        db.insert_hook_log(self.conn, [
+            _event("pre", "PreToolUse", "2026-01-01T00:00:01Z", "toolu_1"),
+        ], "jsonl")
+        self.assertEqual(self._spans(), [(2, 1, 4000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
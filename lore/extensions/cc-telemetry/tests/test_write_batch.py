@@ -0,0 +1,62 @@
+"""WriteBatch.flush: the row-by-row fallback stays one transaction."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "daemon"))
+import db  # noqa: E402
+
+
+class RowByRowFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = db.open_db(Path(self.tmp.name) / "telemetry.db")
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def _batch(self) -> db.WriteBatch:
+        batch = db.WriteBatch()
+        batch.insert_hook_event("s1", "t1", "PreToolUse", "ok-1", "cmd", "2026-01-01T00:00:01Z")
+        # A dict cannot be bound: this row makes the batch fall back
+        batch.insert_hook_event("s1", "t2", "PreToolUse", {"bad": 1}, "cmd", "2026-01-01T00:00:02Z")
+        batch.insert_hook_event("s1", "t3", "PreToolUse", "ok-2", "cmd", "2026-01-01T00:00:03Z")
+        batch.save_checkpoint("/t/s1.jsonl", 7, 300, None)
+        return batch
+
+    def test_skips_bad_row_and_keeps_the_rest(self):
+        self.assertEqual(self._batch().flush(self.conn), 2)
+        names = [r[0] for r in self.conn.execute("SELECT hook_name FROM hook_events ORDER BY id")]
+        self.assertEqual(names, ["ok-1", "ok-2"])
+        self.assertEqual(db.load_checkpoints(self.conn)["/t/s1.jsonl"]["offset"], 300)
+
+    def test_rows_commit_with_the_checkpoint(self):
+        statements = []
+        seen = []
+
+        def trace(sql):
+            statements.append(sql.strip().split()[0].upper())
+            if sql.lstrip().upper().startswith("SAVEPOINT"):
+                seen.append(self.conn.in_transaction)
+
+        self.conn.set_trace_callback(trace)
+        self._batch().flush(self.conn)
+        self.conn.set_trace_callback(None)
+
+        # Every per-row savepoint nests in an open transaction ...
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
+        # ... and nothing commits between the first savepoint and the
+        # checkpoint write: one COMMIT covers rows and checkpoint
+        fallback = statements[statements.index("SAVEPOINT"):]
+        self.assertEqual(fallback.count("COMMIT"), 1)
+        self.assertEqual(fallback[-1], "COMMIT")
+        self.assertLess(max(i for i, s in enumerate(fallback) if s == "INSERT"),
+                        fallback.index("COMMIT"))
+
+
+if __name__ == "__main__":
+    unittest.main()